@@ -0,0 +1,127 @@
+"""Benchmark of the startup of the app: import time and time to first response.
+
+Run with `nox -s startup_benchmark` or `python benchmarks/startup.py [workers]`.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import re
+import socket
+import subprocess  # noqa: S404
+import sys
+import time
+from typing import Dict, List, Tuple
+from urllib.error import URLError
+from urllib.request import urlopen
+
+MODULE = "dataservice_publisher.app"
+TOP = 15
+TIMEOUT = 60.0
+FIRST_RESPONSE = re.compile(r"Worker (\d+) sent its first response ([0-9.]+)s")
+
+
+def import_times(module: str = MODULE) -> List[Tuple[int, int, str]]:
+    """Return the cumulative and self import times in µs of the modules imported."""
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        times.append((int(cumulative_us), int(self_us), name.strip()))
+    return times
+
+
+def time_to_first_response(
+    preload: bool, workers: int
+) -> Tuple[float, Dict[int, float]]:
+    """Return the seconds until gunicorn answers, and the first response of every worker."""
+    port = _free_port()
+    env = dict(os.environ, PRELOAD_APP=str(preload).lower(), LOGGING_LEVEL="INFO")
+    started = time.perf_counter()
+    process = subprocess.Popen(  # noqa: S603
+        [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            "dataservice_publisher:create_app",
+            "--config=dataservice_publisher/gunicorn_config.py",
+            "--worker-class=aiohttp.GunicornWebWorker",
+            f"--workers={workers}",
+            f"--bind=127.0.0.1:{port}",
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        env=env,
+    )
+    try:
+        elapsed = _wait_for_ping(port, started)
+        # Spread requests over the workers, so that every one of them answers:
+        with ThreadPoolExecutor(max_workers=8 * workers) as pool:
+            list(pool.map(lambda _: _ping(port), range(32 * workers)))
+    finally:
+        process.terminate()
+        output, _ = process.communicate(timeout=TIMEOUT)
+    first_responses = {}
+    for line in output.splitlines():
+        try:
+            message = json.loads(line).get("message", "")
+        except ValueError:
+            message = line
+        match = FIRST_RESPONSE.search(message)
+        if match:
+            first_responses[int(match.group(1))] = float(match.group(2))
+    return elapsed, first_responses
+
+
+def main() -> None:
+    """Print the slowest imports and the time to first response with and without preload."""
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    times = import_times()
+    total = max(cumulative for cumulative, _, _ in times)
+    print(f"Importing {MODULE} takes {total / 1000:.1f} ms, slowest imports:")
+    for cumulative, self_us, name in sorted(times, reverse=True)[:TOP]:
+        print(f"  {cumulative / 1000:8.1f} ms {self_us / 1000:8.1f} ms  {name}")
+
+    for preload in (False, True):
+        elapsed, first_responses = time_to_first_response(preload, workers)
+        print(
+            f"preload_app={preload}: first response after {elapsed:.3f}s, "
+            f"{len(first_responses)} of {workers} workers answered"
+        )
+        for pid, seconds in sorted(first_responses.items()):
+            print(f"  worker {pid}: first response {seconds:.3f}s after starting")
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _ping(port: int) -> bool:
+    try:
+        url = f"http://127.0.0.1:{port}/ping"
+        with urlopen(url, timeout=1) as response:  # noqa: S310
+            return response.status == 200
+    except (URLError, OSError):
+        return False
+
+
+def _wait_for_ping(port: int, started: float) -> float:
+    while time.perf_counter() - started < TIMEOUT:
+        if _ping(port):
+            return time.perf_counter() - started
+        time.sleep(0.01)
+    raise TimeoutError("The app did not answer in time")
+
+
+if __name__ == "__main__":
+    main()
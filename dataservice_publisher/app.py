@@ -9,11 +9,89 @@ from aiohttp_middlewares import cors_middleware, error_middleware
 from dotenv import load_dotenv
 import jwt
 from multidict import MultiDict
+from rdflib.graph import Graph
 
-from .resources.catalogs import Catalog, Catalogs
+from .resources.catalogs import (
+    Catalog,
+    CatalogChanges,
+    Catalogs,
+    CatalogsBatchDelete,
+)
+from .resources.changes import Changes
+from .resources.dump import CatalogsDump
+from .resources.jobs import Job
 from .resources.login import Login
+from .resources.metrics import Metrics
 from .resources.ping import Ping
+from .resources.profiles import Profile
 from .resources.ready import Ready
+from .resources.search import Search
+from .service.admission import ADMISSION, Admission, admission_middleware
+from .service.cache_warmup import (
+    start_cache_warmup,
+    stop_cache_warmup,
+    WARMUP_STATE,
+    WarmupState,
+)
+from .service.catalog_dump import CATALOG_DUMP, CatalogDump
+from .service.catalog_events import CATALOG_EVENTS, CatalogEvents
+from .service.catalog_registry import (
+    CATALOG_REGISTRY,
+    CatalogRegistry,
+    CatalogSummary,
+)
+from .service.catalog_service import catalog_id
+from .service.catalog_snapshots import (
+    CATALOG_SNAPSHOTS,
+    CatalogSnapshots,
+    flush_snapshots,
+)
+from .service.change_feed import (
+    CHANGE_FEED,
+    ChangeEvent,
+    ChangeFeed,
+    start_change_feed,
+    stop_change_feed,
+)
+from .service.loop_monitor import (
+    LOOP_MONITOR,
+    LoopMonitor,
+    start_loop_monitor,
+    stop_loop_monitor,
+)
+from .service.memory_accounting import (
+    MEMORY_ACCOUNTS,
+    memory_middleware,
+    MemoryAccounts,
+    start_memory_accounting,
+    stop_memory_accounting,
+)
+from .service.metrics import METRICS, MetricsRegistry
+from .service.oas_conversion import stop_conversion_pool
+from .service.profiling import (
+    add_profile_link,
+    PROFILE_HEADER,
+    profile_middleware,
+    PROFILES,
+    Profiles,
+    PROFILES_PATH,
+)
+from .service.publish_jobs import (
+    PUBLISH_JOBS,
+    PublishJobs,
+    start_publish_jobs,
+    stop_publish_jobs,
+)
+from .service.response_cache import RESPONSE_CACHE, ResponseCache
+from .service.search_index import (
+    SEARCH_INDEX,
+    SearchIndex,
+    start_search_index,
+    stop_search_index,
+)
+from .service.single_flight import SINGLE_FLIGHT, SingleFlight
+from .service.startup import STARTUP_TIMER, StartupTimer
+from .service.write_batcher import flush_writes, WRITE_BATCHER, WriteBatcher
 
 load_dotenv()
 LOGGING_LEVEL = os.getenv("LOGGING_LEVEL", "INFO")
@@ -24,20 +102,24 @@ JWT_ALGORITHM = "HS256"
 
 async def authenticated(request: web.Request) -> bool:
     """For relevant methods and paths, check if the user is authenticated."""
-    # All read methods are allowed without authentication.
-    if request.method in ["OPTIONS", "GET", "HEAD"] or request.path == "/login":
+    # All read methods are allowed without authentication, but profiling is not.
+    if request.path == "/login" or (
+        request.method in ["OPTIONS", "GET", "HEAD"]
+        and PROFILE_HEADER not in request.headers
+        and not request.path.startswith(PROFILES_PATH)
+    ):
         return True
     # Extract jwt_token from authorization header in request
     logging.debug("Verifying authorization token")
 
     authorization = request.headers.getone(hdrs.AUTHORIZATION, None)
     if authorization:
-        logging.debug(f"Got authorization header: {authorization}")
+        logging.debug("Got authorization header: %s", authorization)
         jwt_token = str.replace(str(authorization), "Bearer ", "")
         try:
             jwt.decode(jwt_token, SECRET_KEY, algorithms=[JWT_ALGORITHM])  # type: ignore
         except (jwt.DecodeError, jwt.ExpiredSignatureError) as e:
-            logging.debug(f"Got exception decoding jwt: {e}")
+            logging.debug("Got exception decoding jwt: %s", e)
             return False
         return True
     logging.debug("Got NO auhtorization header!")
@@ -65,10 +147,93 @@ async def create_app() -> web.Application:
         middlewares=[
             cors_middleware(allow_all=True),
             authenticate_middleware,
+            profile_middleware,
+            memory_middleware,
             error_middleware(),  # default error handler for whole application
+            admission_middleware,
         ]
     )
 
+    app[METRICS] = metrics = MetricsRegistry()
+    app[STARTUP_TIMER] = timer = StartupTimer()
+    timer.register(metrics)
+    app.on_response_prepare.append(timer.on_response_prepare)
+    app[LOOP_MONITOR] = LoopMonitor()
+    app[LOOP_MONITOR].register(metrics)
+    app.on_startup.append(start_loop_monitor)
+    app.on_cleanup.append(stop_loop_monitor)
+    app[MEMORY_ACCOUNTS] = MemoryAccounts()
+    app[MEMORY_ACCOUNTS].register(metrics)
+    app.on_startup.append(start_memory_accounting)
+    app.on_cleanup.append(stop_memory_accounting)
+    app[ADMISSION] = Admission()
+    app[ADMISSION].register(metrics)
+    app[PROFILES] = Profiles()
+    app.on_response_prepare.append(add_profile_link)
+
+    # State kept by the worker about the catalogs:
+    app[RESPONSE_CACHE] = cache = ResponseCache()
+    app[CATALOG_REGISTRY] = registry = CatalogRegistry()
+    app[SEARCH_INDEX] = index = SearchIndex()
+    app[CHANGE_FEED] = feed = ChangeFeed()
+    app[CATALOG_DUMP] = CatalogDump()
+    app[CATALOG_SNAPSHOTS] = snapshots = CatalogSnapshots()
+    app.on_cleanup.append(flush_snapshots)
+    app.on_startup.append(start_change_feed)
+    app.on_shutdown.append(stop_change_feed)
+    app.on_startup.append(start_search_index)
+    app.on_cleanup.append(stop_search_index)
+
+    def _created(summary: CatalogSummary, graph: Graph) -> None:
+        type = "created" if summary.version == 1 else "updated"
+        feed.publish(type, summary.identifier, summary.version, summary.etag)
+        registry.put(summary)
+        index.add_catalog(summary.identifier, graph)
+        cache.invalidate_catalog(catalog_id(summary.identifier))
+        snapshots.write(f"/catalogs/{catalog_id(summary.identifier)}", graph)
+
+    def _deleted(identifier: str) -> None:
+        summary = registry.get(identifier)
+        feed.publish("deleted", identifier, summary.version if summary else 0)
+        registry.remove(identifier)
+        index.remove_catalog(identifier)
+        cache.invalidate_catalog(catalog_id(identifier))
+        snapshots.remove(f"/catalogs/{catalog_id(identifier)}")
+
+    def _changed(event: ChangeEvent) -> None:
+        # Also the changes made by the other workers of the host:
+        registry.invalidate()
+        cache.forget(catalog_id(event.catalog))
+        if event.type == "deleted":
+            index.remove_catalog(event.catalog)
+        index.wake()
+
+    feed.listeners.append(_changed)
+
+    app[CATALOG_EVENTS] = events = CatalogEvents()
+    events.on_created.append(_created)
+    events.on_deleted.append(_deleted)
+
+    app[SINGLE_FLIGHT] = SingleFlight()
+    app[WARMUP_STATE] = WarmupState()
+    app.on_startup.append(start_cache_warmup)
+    app.on_cleanup.append(stop_cache_warmup)
+
+    # One per app, as its batches and locks belong to the event loop of the app:
+    app[WRITE_BATCHER] = batcher = WriteBatcher()
+    batcher.register(metrics)
+
+    app[PUBLISH_JOBS] = PublishJobs(
+        events=events,
+        fetches=app[ADMISSION].limiters["oas_fetches"],
+        batcher=batcher,
+    )
+    app.on_startup.append(start_publish_jobs)
+    app.on_cleanup.append(stop_publish_jobs)
+    app.on_cleanup.append(stop_conversion_pool)
+    # After the jobs, whose updates may still be waiting for their batch:
+    app.on_cleanup.append(flush_writes)
+
     # Routes
     app.add_routes(
         [
@@ -76,7 +241,15 @@ async def create_app() -> web.Application:
             web.view("/ping", Ping),
             web.view("/ready", Ready),
             web.view("/catalogs", Catalogs),
+            web.view("/catalogs/dump", CatalogsDump),
+            web.view("/catalogs/batch-delete", CatalogsBatchDelete),
             web.view("/catalogs/{id}", Catalog),
+            web.view("/catalogs/{id}/changes", CatalogChanges),
+            web.view("/changes", Changes),
+            web.view("/jobs/{id}", Job),
+            web.view("/search", Search),
+            web.view("/metrics", Metrics),
+            web.view("/profiles/{id}", Profile),
         ]
     )
     # logging configurataion:
@@ -10,3 +10,15 @@ class RequestBodyError(Exception):
         """Inits the exception."""
         Exception.__init__(self, msg)
         self.msg = msg
+
+
+class OASLoadError(RequestBodyError):
+    """Raised when the OpenAPI document of an api cannot be loaded."""
+
+
+class IdempotencyKeyError(RequestBodyError):
+    """Raised when an Idempotency-Key is used again for another request body."""
+
+
+class PublishConflictError(Exception):
+    """Raised when other publishes of a catalog keep writing it before a publish can."""
@@ -1,10 +1,15 @@
 """Gunicorn module for mapping a catalog to rdf."""
 
+import atexit
+import gc
 import logging
+from logging.handlers import QueueHandler, QueueListener
 import multiprocessing
 from os import environ as env
+from queue import SimpleQueue
+import random
 import sys
-from typing import Any
+from typing import Any, Optional
 
 from dotenv import load_dotenv
 from gunicorn import glogging
@@ -15,6 +20,12 @@ load_dotenv()
 DATASERVICE_PUBLISHER_PORT = int(env.get("DATASERVICE_PUBLISHER_PORT", 8080))
 DEBUG_MODE = env.get("DEBUG_MODE", False)
 LOGGING_LEVEL = env.get("LOGGING_LEVEL", "INFO")
+# Fraction of successful access log records to keep (1.0 keeps all of them):
+ACCESS_LOG_SAMPLE_RATE = float(env.get("ACCESS_LOG_SAMPLE_RATE", 1.0))
+# Import the app and its dependencies once in the master, shared copy-on-write by workers:
+PRELOAD_APP = env.get("PRELOAD_APP", "true").lower() == "true"
+# Routes that are never written to the access log:
+HEALTH_ROUTES = frozenset(["/ping", "/ready"])
 
 # Gunicorn config
 bind = ":" + str(DATASERVICE_PUBLISHER_PORT)
@@ -22,6 +33,7 @@ workers = multiprocessing.cpu_count() * 2 + 1
 threads = 2 * multiprocessing.cpu_count()
 loglevel = str(LOGGING_LEVEL)
 accesslog = "-"
+preload_app = PRELOAD_APP
 
 
 class StackdriverJsonFormatter(jsonlogger.JsonFormatter, object):
@@ -39,17 +51,36 @@ class StackdriverJsonFormatter(jsonlogger.JsonFormatter, object):
         return super(StackdriverJsonFormatter, self).process_log_record(log_record)
 
 
+class LocalQueueHandler(QueueHandler):
+    """Queue handler that hands records over to the listener thread untouched.
+
+    The records never leave the process, so there is no need to merge the
+    message and arguments before enqueuing them: all formatting is done by the
+    listener thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Return the record as is."""
+        return record
+
+
 # Override the logger to remove healthcheck (ping) from the access log and format logs as json
 class CustomGunicornLogger(glogging.Logger):
     """Custom Gunicorn Logger class."""
 
+    _queue_listener: Optional[QueueListener] = None
+    _stop_registered = False
+
     def setup(self, cfg: Any) -> None:
-        """Set up function."""
+        """Set up function, called again when gunicorn reloads its config."""
         super().setup(cfg)
 
         access_logger = logging.getLogger("gunicorn.access")
-        access_logger.addFilter(PingFilter())
-        access_logger.addFilter(ReadyFilter())
+        for log_filter in list(access_logger.filters):
+            if isinstance(log_filter, (HealthRouteFilter, SamplingFilter)):
+                access_logger.removeFilter(log_filter)
+        access_logger.addFilter(HealthRouteFilter())
+        access_logger.addFilter(SamplingFilter(ACCESS_LOG_SAMPLE_RATE))
 
         root_logger = logging.getLogger()
         root_logger.setLevel(loglevel)
@@ -64,29 +95,88 @@ class CustomGunicornLogger(glogging.Logger):
         loggers.append(root_logger)
         loggers.append(access_logger)
 
-        json_handler = logging.StreamHandler(sys.stdout)
-        json_handler.setFormatter(StackdriverJsonFormatter())
+        # Records are put on a queue, and formatted and written to stdout
+        # by a listener thread, keeping the event loop free of logging I/O:
+        self._json_handler = logging.StreamHandler(sys.stdout)
+        self._json_handler.setFormatter(StackdriverJsonFormatter())
+        self._queue_handler = LocalQueueHandler(SimpleQueue())
+        self.stop_queue_listener()
+        self.start_queue_listener()
+        if not self._stop_registered:
+            atexit.register(self.stop_queue_listener)
+            self._stop_registered = True
 
         for logger in loggers:
             for handler in logger.handlers:
                 logger.removeHandler(handler)
-            logger.addHandler(json_handler)
+            logger.addHandler(self._queue_handler)
+
+    def start_queue_listener(self) -> None:
+        """Start a listener thread writing the queued records to stdout.
+
+        Threads do not survive a fork, so every worker has to start its own
+        listener, see `post_fork`.
+        """
+        queue: SimpleQueue = SimpleQueue()
+        self._queue_handler.queue = queue
+        self._queue_listener = QueueListener(
+            queue, self._json_handler, respect_handler_level=True
+        )
+        self._queue_listener.start()
 
+    def stop_queue_listener(self) -> None:
+        """Flush the queue and stop the listener thread."""
+        if self._queue_listener is not None:
+            self._queue_listener.stop()
+            self._queue_listener = None
 
-class PingFilter(logging.Filter):
-    """Custom Ping Filter class."""
+
+class HealthRouteFilter(logging.Filter):
+    """Remove requests to the health routes from the access log."""
 
     def filter(self, record: logging.LogRecord) -> bool:
         """Filter function."""
-        return "GET /ping" not in record.getMessage()
+        # aiohttp adds the request line ("GET /ping HTTP/1.1") to the record:
+        request_line = getattr(record, "first_request_line", "")
+        parts = request_line.split(" ")
+        if len(parts) < 2:
+            return True
+        path = parts[1].split("?", 1)[0]
+        return path not in HEALTH_ROUTES
+
 
+class SamplingFilter(logging.Filter):
+    """Keep only a sample of the access log records of successful requests.
 
-class ReadyFilter(logging.Filter):
-    """Custom Ready Filter class."""
+    Records of requests that did not succeed are always kept.
+    """
+
+    def __init__(self, rate: float) -> None:
+        """Instantiate the filter."""
+        super().__init__()
+        self.rate = rate
 
     def filter(self, record: logging.LogRecord) -> bool:
         """Filter function."""
-        return "GET /ready" not in record.getMessage()
+        if self.rate >= 1.0:
+            return True
+        status = str(getattr(record, "response_status", ""))
+        if not status.startswith(("2", "3")):
+            return True
+        return random.random() < self.rate  # noqa: S311
+
+
+def when_ready(server: Any) -> None:
+    """Freeze the preloaded objects before the workers are forked."""
+    # Otherwise the garbage collector of every worker touches them, copying their pages:
+    if PRELOAD_APP:
+        gc.freeze()
+
+
+def post_fork(server: Any, worker: Any) -> None:
+    """Start the logging listener thread in the forked worker."""
+    if isinstance(worker.log, CustomGunicornLogger):
+        worker.log.start_queue_listener()
 
 
 logger_class = CustomGunicornLogger
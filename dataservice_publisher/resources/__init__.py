@@ -2,6 +2,14 @@
 
 Modules:
     ping
+    profiles
     ready
     catalogs
+    changes
+    dump
+    jobs
+    metrics
+    negotiation
+    serializers
+    search
 """
@@ -2,65 +2,170 @@
 
 import json
 import logging
-from typing import Any, Dict
+from os import environ as env
+from typing import Any, Dict, Optional, Tuple
 
 from aiohttp import hdrs, web
-from content_negotiation import decide_content_type, NoAgreeableContentTypeError
+from dotenv import load_dotenv
+from rdflib.graph import Graph
 
+from dataservice_publisher.resources.negotiation import (
+    negotiate,
+    serialize,
+    stream_variant,
+    Variant,
+    variant_headers,
+    variant_response,
+)
+from dataservice_publisher.service.admission import ADMISSION
+from dataservice_publisher.service.catalog_events import CATALOG_EVENTS
+from dataservice_publisher.service.catalog_registry import (
+    CATALOG_REGISTRY,
+    fetch_catalog_summary,
+    select_summaries,
+    summaries_graph,
+)
 from dataservice_publisher.service.catalog_service import (
-    create_catalog,
+    catalog_exists,
+    catalog_uri,
     delete_catalog,
-    fetch_catalogs,
+    delete_catalogs,
+    existing_catalogs,
     get_catalog_by_id,
+    IdempotencyKeyError,
+    publish_catalog,
+    PublishConflictError,
+    request_hash,
     RequestBodyError,
+    unchanged_catalog,
+    validate_catalog,
+)
+from dataservice_publisher.service.catalog_snapshots import (
+    CATALOG_SNAPSHOTS,
+    CircuitOpenError,
+    UNAVAILABLE_ERRORS,
 )
+from dataservice_publisher.service.catalog_versions import (
+    fetch_deltas,
+    RDF_PATCH_CONTENT_TYPE,
+    squash,
+)
+from dataservice_publisher.service.publish_jobs import JobQueueFullError, PUBLISH_JOBS
+from dataservice_publisher.service.response_cache import RESPONSE_CACHE, ResponseCache
+from dataservice_publisher.service.single_flight import SINGLE_FLIGHT
+from dataservice_publisher.service.write_batcher import WRITE_BATCHER
+
+load_dotenv()
+BATCH_DELETE_MAX_IDS = int(env.get("BATCH_DELETE_MAX_IDS", 1000))
 
-SUPPORTED_CONTENT_TYPES = [
-    "text/turtle",
-    "application/rdf+xml",
-    "application/ld+json",
-    "application/n-triples",
-]
+IDEMPOTENCY_KEY = "Idempotency-Key"
+# Tells whether a publish created, updated or left the catalog unchanged:
+PUBLISH_RESULT = "X-Publish-Result"
+PREFERENCE_APPLIED = "Preference-Applied"
 
 
 class Catalogs(web.View):
     """Class representing catalogs resoweb.urce."""
 
-    async def get(self) -> web.Response:
-        """Get all catalogs."""
-        try:
-            content_type = decide_content_type(
-                self.request.headers.getall(hdrs.ACCEPT), SUPPORTED_CONTENT_TYPES
+    async def get(self) -> web.StreamResponse:
+        """Get all catalogs, optionally filtered by publisher, sorted and paged."""
+        variant = negotiate(self.request)
+        registry = self.request.app[CATALOG_REGISTRY]
+
+        if self.request.query:
+            try:
+                summaries = select_summaries(
+                    await registry.summaries(),
+                    publisher=self.request.query.get("publisher"),
+                    sort=self.request.query.get("sort", "identifier"),
+                    descending=self.request.query.get("order") == "desc",
+                    offset=int(self.request.query.get("offset", 0)),
+                    limit=(
+                        int(self.request.query["limit"])
+                        if "limit" in self.request.query
+                        else None
+                    ),
+                )
+            except ValueError as e:
+                return web.Response(
+                    status=400,
+                    body=json.dumps({"msg": str(e)}),
+                    content_type="application/json",
+                )
+            return await stream_variant(
+                self.request, summaries_graph(summaries), variant, catalog_uri()
             )
-        except NoAgreeableContentTypeError as e:
-            raise web.HTTPNotAcceptable() from e
 
-        catalogs = await fetch_catalogs()
-        body = catalogs.serialize(format=content_type, encoding="utf-8")
+        cache = self.request.app[RESPONSE_CACHE]
+        body = cache.get("/catalogs", variant.key)
+        if body is None:
 
-        return web.Response(
-            body=body,
-            content_type=content_type,
-            charset="utf-8",
-        )
+            snapshots = self.request.app[CATALOG_SNAPSHOTS]
+
+            async def _load() -> bytes:
+                # Read first, so that a body loaded across an invalidation is not cached:
+                generation = cache.generation("/catalogs")
+                catalogs = summaries_graph(await registry.summaries(generation))
+                snapshots.refresh("/catalogs", catalogs)
+                body = serialize(catalogs, variant, catalog_uri())
+                cache.put("/catalogs", variant.key, body, generation=generation)
+                return body
 
-    async def post(self) -> web.Response:
+            body = cache.get_stale("/catalogs", variant.key)
+            if body is not None:
+                # Serve the expired body, while one task refreshes it:
+                self.request.app[SINGLE_FLIGHT].go(("/catalogs", variant.key), _load)
+                return _cacheable(variant_response(body, variant), cache)
+            try:
+                body = await snapshots.call(
+                    lambda: self.request.app[SINGLE_FLIGHT].do(
+                        ("/catalogs", variant.key), _load
+                    )
+                )
+            except UNAVAILABLE_ERRORS as e:
+                return await _stale_response(
+                    self.request, "/catalogs", variant, catalog_uri(), e
+                )
+
+        return _cacheable(variant_response(body, variant), cache)
+
+    async def post(self) -> web.StreamResponse:
         """Create a catalog and return the resulting graph."""
-        try:
-            content_type = decide_content_type(
-                self.request.headers.getall(hdrs.ACCEPT), SUPPORTED_CONTENT_TYPES
-            )
-        except NoAgreeableContentTypeError as e:
-            raise web.HTTPNotAcceptable() from e
+        variant = negotiate(self.request)
 
         new_catalog: Dict[str, Any] = await self.request.json()
         if new_catalog and "identifier" in new_catalog:
+            idempotency_key = self.request.headers.get(IDEMPOTENCY_KEY)
+            if "respond-async" in self.request.headers.get("Prefer", ""):
+                return await self._submit_publish_job(new_catalog, idempotency_key)
             try:
-                catalog = await create_catalog(new_catalog)
+                validate_catalog(new_catalog)
+                if idempotency_key:
+                    # Retries while the catalog is being published wait for its result:
+                    catalog, result = await self.request.app[SINGLE_FLIGHT].do(
+                        ("publish", idempotency_key, request_hash(new_catalog)),
+                        lambda: self._publish(new_catalog, idempotency_key),
+                    )
+                else:
+                    catalog, result = await self._publish(new_catalog, None)
+                return await stream_variant(
+                    self.request,
+                    catalog,
+                    variant,
+                    new_catalog["identifier"],
+                    headers={PUBLISH_RESULT: result},
+                )
+            except IdempotencyKeyError as e:
                 return web.Response(
-                    body=catalog.serialize(format=content_type, encoding="utf-8"),
-                    content_type=content_type,
-                    charset="utf-8",
+                    status=422,
+                    body=json.dumps({"msg": str(e)}),
+                    content_type="application/json",
+                )
+            except PublishConflictError as e:
+                return web.Response(
+                    status=409,
+                    body=json.dumps({"msg": str(e)}),
+                    content_type="application/json",
                 )
             except RequestBodyError as e:
                 return web.Response(
@@ -74,40 +179,231 @@ class Catalogs(web.View):
             content_type="application/json",
         )
 
+    async def _publish(
+        self, new_catalog: Dict[str, Any], idempotency_key: Optional[str]
+    ) -> Tuple[Graph, str]:
+        """Publish the catalog unless it is unchanged, and tell which it was."""
+        fetch_turn = self.request.app[ADMISSION].limiters["oas_fetches"].turn
+        unchanged = await unchanged_catalog(new_catalog, idempotency_key, fetch_turn)
+        if unchanged is not None:
+            return unchanged[0], "unchanged"
+        catalog, summary = await publish_catalog(
+            new_catalog,
+            idempotency_key=idempotency_key,
+            fetch_turn=fetch_turn,
+            batcher=self.request.app[WRITE_BATCHER],
+        )
+        self.request.app[CATALOG_EVENTS].created(summary, catalog)
+        return catalog, "created" if summary.version == 1 else "updated"
+
+    async def _submit_publish_job(
+        self, new_catalog: Dict[str, Any], idempotency_key: Optional[str] = None
+    ) -> web.Response:
+        """Validate the catalog and enqueue a job publishing it."""
+        try:
+            validate_catalog(new_catalog)
+            job = await self.request.app[PUBLISH_JOBS].submit(
+                new_catalog, idempotency_key
+            )
+        except RequestBodyError as e:
+            return web.Response(
+                status=400,
+                body=json.dumps({"msg": str(e)}),
+                content_type="application/json",
+            )
+        except JobQueueFullError:
+            return web.Response(
+                status=503,
+                headers={hdrs.RETRY_AFTER: "10"},
+                body=json.dumps({"msg": "The publish job queue is full"}),
+                content_type="application/json",
+            )
+        return web.Response(
+            status=202,
+            headers={
+                hdrs.LOCATION: f"/jobs/{job.id}",
+                PREFERENCE_APPLIED: "respond-async",
+            },
+            body=json.dumps(job.to_dict()),
+            content_type="application/json",
+        )
+
 
 class Catalog(web.View):
     """Class representing catalog resource."""
 
-    async def get(self) -> web.Response:
+    async def get(self) -> web.StreamResponse:
         """Get catalog by id."""
-        try:
-            content_type = decide_content_type(
-                self.request.headers.getall(hdrs.ACCEPT), SUPPORTED_CONTENT_TYPES
-            )
-        except NoAgreeableContentTypeError as e:
-            raise web.HTTPNotAcceptable() from e
+        variant = negotiate(self.request)
 
         id = self.request.match_info["id"]
-        logging.debug(f"Getting catalog with id {id}")
+        logging.debug("Getting catalog with id %s", id)
 
-        catalog = await get_catalog_by_id(id)
-        if len(catalog) == 0:
-            return web.Response(status=404)
-        return web.Response(
-            body=catalog.serialize(format=content_type, encoding="utf-8"),
-            content_type=content_type,
-            charset="utf-8",
-        )
+        cache = self.request.app[RESPONSE_CACHE]
+        body = cache.get(f"/catalogs/{id}", variant.key)
+        if body is None:
+            snapshots = self.request.app[CATALOG_SNAPSHOTS]
+
+            async def _load() -> Optional[bytes]:
+                # Read first, so that a body loaded across an invalidation is not cached:
+                generation = cache.generation(f"/catalogs/{id}")
+                catalog = await get_catalog_by_id(id)
+                if len(catalog) == 0:
+                    return None
+                snapshots.refresh(f"/catalogs/{id}", catalog)
+                body = serialize(catalog, variant, catalog_uri(id))
+                cache.put(f"/catalogs/{id}", variant.key, body, generation=generation)
+                return body
+
+            body = cache.get_stale(f"/catalogs/{id}", variant.key)
+            if body is not None:
+                # Serve the expired body, while one task refreshes it:
+                self.request.app[SINGLE_FLIGHT].go(
+                    (f"/catalogs/{id}", variant.key), _load
+                )
+                return _cacheable(variant_response(body, variant), cache)
+            try:
+                # Concurrent reads of the same representation share one load:
+                body = await snapshots.call(
+                    lambda: self.request.app[SINGLE_FLIGHT].do(
+                        (f"/catalogs/{id}", variant.key), _load
+                    )
+                )
+            except UNAVAILABLE_ERRORS as e:
+                return await _stale_response(
+                    self.request, f"/catalogs/{id}", variant, catalog_uri(id), e
+                )
+            if body is None:
+                return web.Response(status=404)
+        return _cacheable(variant_response(body, variant), cache)
 
     async def delete(self) -> web.Response:
         """Delete catalog given by id."""
         id = self.request.match_info["id"]
-        logging.debug(f"Delete catalog with id {id}")
+        logging.debug("Delete catalog with id %s", id)
 
-        catalog = await get_catalog_by_id(id)
-        if len(catalog) == 0:
+        if not await catalog_exists(id):
             return web.Response(status=404)
         result = await delete_catalog(id)
         if result:
+            self.request.app[CATALOG_EVENTS].deleted(catalog_uri(id))
             return web.Response(status=204)
         return web.Response(status=400)
+
+
+class CatalogsBatchDelete(web.View):
+    """Class representing the deletion of many catalogs at once."""
+
+    async def post(self) -> web.StreamResponse:
+        """Delete the catalogs given by ids, returning the result for each of them."""
+        body = await self.request.json()
+        ids = body.get("ids") if isinstance(body, dict) else None
+        if not isinstance(ids, list) or not all(isinstance(id, str) for id in ids):
+            return web.Response(
+                status=400,
+                body=json.dumps({"msg": "A list of ids must be provided"}),
+                content_type="application/json",
+            )
+        if len(ids) > BATCH_DELETE_MAX_IDS:
+            return web.Response(
+                status=400,
+                body=json.dumps(
+                    {
+                        "msg": f"At most {BATCH_DELETE_MAX_IDS} ids can be deleted at once"
+                    }
+                ),
+                content_type="application/json",
+            )
+        ids = list(dict.fromkeys(ids))
+        logging.debug("Batch delete of %s catalogs", len(ids))
+
+        existing = await existing_catalogs(ids)
+        deleted = [id for id in ids if id in existing]
+        if deleted and not await delete_catalogs(deleted):
+            return web.Response(status=400)
+        for id in deleted:
+            self.request.app[CATALOG_EVENTS].deleted(catalog_uri(id))
+        results = [{"id": id, "status": 204 if id in existing else 404} for id in ids]
+        return web.Response(
+            body=json.dumps({"results": results}), content_type="application/json"
+        )
+
+
+class CatalogChanges(web.View):
+    """Class representing the changes to a catalog since a version, as RDF Patch."""
+
+    async def get(self) -> web.Response:
+        """Get the net change to the catalog since the version given by since."""
+        id = self.request.match_info["id"]
+        try:
+            since = int(self.request.query["since"])
+            if since < 0:
+                raise ValueError(since)
+        except (KeyError, ValueError):
+            return web.Response(
+                status=400,
+                body=json.dumps({"msg": "Query parameter since must be a version"}),
+                content_type="application/json",
+            )
+
+        identifier = catalog_uri(id)
+        summary = await fetch_catalog_summary(identifier)
+        if summary is None:
+            return web.Response(status=404)
+        if since > summary.version:
+            return web.Response(
+                status=400,
+                body=json.dumps({"msg": f"Latest version is {summary.version}"}),
+                content_type="application/json",
+            )
+
+        delta = squash(await fetch_deltas(identifier, since), since)
+        if delta is None:
+            # The deltas since then are no longer kept, the catalog must be refetched:
+            return web.Response(
+                status=410,
+                body=json.dumps({"msg": f"Changes since version {since} are gone"}),
+                content_type="application/json",
+            )
+        patch = "H id <%s#version-%s> .\n" % (identifier, summary.version)
+        if since > 0:
+            patch += "H prev <%s#version-%s> .\n" % (identifier, since)
+        patch += "TX .\n" + delta.to_patch() + "TC .\n"
+        headers = {"X-Catalog-Version": str(summary.version)}
+        if summary.etag:
+            headers[hdrs.ETAG] = summary.etag
+        return web.Response(
+            text=patch, content_type=RDF_PATCH_CONTENT_TYPE, headers=headers
+        )
+
+
+def _cacheable(response: web.Response, cache: ResponseCache) -> web.Response:
+    """Tell downstream caches to keep the response as long as the worker does."""
+    if cache.ttl > 0:
+        response.headers[hdrs.CACHE_CONTROL] = (
+            "max-age=%d, stale-while-revalidate=%d"
+            % (
+                cache.ttl,
+                cache.stale_while_revalidate,
+            )
+        )
+    return response
+
+
+async def _stale_response(
+    request: web.Request, name: str, variant: Variant, identifier: str, error: Exception
+) -> web.StreamResponse:
+    """Respond with the snapshot of the resource, or fail as the backend did."""
+    path = await request.app[CATALOG_SNAPSHOTS].variant(
+        name, variant.key, lambda graph: serialize(graph, variant, identifier)
+    )
+    if path is None:
+        if isinstance(error, CircuitOpenError):
+            raise web.HTTPServiceUnavailable() from error
+        raise error
+    logging.warning("Serving %s from its snapshot: %s", name, error)
+    headers = variant_headers(variant)
+    headers[hdrs.AGE] = str(request.app[CATALOG_SNAPSHOTS].age(name))
+    headers[hdrs.WARNING] = '110 - "Response is Stale", 111 - "Revalidation Failed"'
+    # Sent from the file with sendfile, without reading it into the worker:
+    return web.FileResponse(path, headers=headers)
@@ -0,0 +1,89 @@
+"""Repository module for the feed of changes to catalogs."""
+
+import asyncio
+import json
+import logging
+from os import environ as env
+
+from aiohttp import hdrs, web
+from dotenv import load_dotenv
+
+from dataservice_publisher.service.change_feed import CHANGE_FEED, ChangeFeed
+
+load_dotenv()
+CHANGE_FEED_HEARTBEAT = float(env.get("CHANGE_FEED_HEARTBEAT", 15))
+LAST_EVENT_ID = "Last-Event-ID"
+
+
+class Changes(web.View):
+    """Class representing the change feed resource, as server-sent events."""
+
+    async def get(self) -> web.StreamResponse:
+        """Stream the created, updated and deleted events of catalogs."""
+        last_event_id = self.request.headers.get(
+            LAST_EVENT_ID, self.request.query.get("lastEventId")
+        )
+        try:
+            last_id = int(last_event_id) if last_event_id else None
+        except ValueError:
+            return web.Response(
+                status=400,
+                body=json.dumps({"msg": f"Invalid {LAST_EVENT_ID}"}),
+                content_type="application/json",
+            )
+
+        feed = self.request.app[CHANGE_FEED]
+        # Subscribe before replaying, so that no event is missed in between:
+        queue = feed.subscribe()
+        try:
+            response = web.StreamResponse(
+                headers={
+                    hdrs.CONTENT_TYPE: "text/event-stream",
+                    hdrs.CACHE_CONTROL: "no-cache",
+                    "X-Accel-Buffering": "no",
+                }
+            )
+            await response.prepare(self.request)
+            await response.write(b"retry: 5000\n\n")
+            if last_id is None:
+                last_id = feed.last_id
+            else:
+                last_id = await _replay(response, feed, last_id)
+            await _stream(response, queue, last_id)
+        except ConnectionResetError:
+            logging.debug("Change feed client went away")
+        finally:
+            feed.unsubscribe(queue)
+        return response
+
+
+async def _replay(response: web.StreamResponse, feed: ChangeFeed, last_id: int) -> int:
+    """Write the events after last_id from the log, returning the id of the last."""
+    first_id = await feed.first_id()
+    if first_id is not None and last_id < first_id - 1:
+        # Events have been dropped from the log since, the client must start over:
+        await response.write(b"event: reset\ndata: {}\n\n")
+    while True:
+        events = await feed.replay(last_id)
+        if not events:
+            return last_id
+        for event in events:
+            await response.write(event.to_sse())
+            last_id = event.id
+
+
+async def _stream(
+    response: web.StreamResponse, queue: asyncio.Queue, last_id: int
+) -> None:
+    """Write the events from the queue until the feed stops."""
+    while True:
+        try:
+            event = await asyncio.wait_for(queue.get(), CHANGE_FEED_HEARTBEAT)
+        except asyncio.TimeoutError:
+            await response.write(b": keepalive\n\n")
+            continue
+        if event is None:
+            return
+        if event.id > last_id:
+            await response.write(event.to_sse())
+            last_id = event.id
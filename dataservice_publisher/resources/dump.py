@@ -0,0 +1,32 @@
+"""Repository module for the dump of all catalogs."""
+
+import logging
+
+from aiohttp import hdrs, web
+
+from dataservice_publisher.resources.negotiation import negotiate_quads
+from dataservice_publisher.service.catalog_dump import (
+    CATALOG_DUMP,
+    DUMP_FORMATS,
+    fetch_generation,
+)
+
+
+class CatalogsDump(web.View):
+    """Class representing the dump of all catalogs, as N-Quads or TriG."""
+
+    async def get(self) -> web.StreamResponse:
+        """Get every catalog with its contents, each in its own named graph."""
+        media_type = negotiate_quads(self.request, list(DUMP_FORMATS))
+        # Asked of every dataset, so that a write through any host makes the dump stale:
+        generation = await fetch_generation()
+        path = await self.request.app[CATALOG_DUMP].get(generation, media_type)
+        logging.debug("Serving the dump %s", path)
+        # The file is sent as is, or its gzip-compressed sibling if that is accepted:
+        return web.FileResponse(
+            path,
+            headers={
+                hdrs.CONTENT_TYPE: f"{media_type}; charset=utf-8",
+                hdrs.VARY: f"{hdrs.ACCEPT}, {hdrs.ACCEPT_ENCODING}",
+            },
+        )
@@ -0,0 +1,21 @@
+"""Repository module for publish jobs."""
+
+import json
+
+from aiohttp import web
+
+from dataservice_publisher.service.publish_jobs import PUBLISH_JOBS
+
+
+class Job(web.View):
+    """Class representing publish job resource."""
+
+    async def get(self) -> web.Response:
+        """Get the status of the publish job given by id, submitted to any worker."""
+        job = await self.request.app[PUBLISH_JOBS].get(self.request.match_info["id"])
+        if job is None:
+            return web.Response(status=404)
+        return web.Response(
+            body=json.dumps(job.to_dict()),
+            content_type="application/json",
+        )
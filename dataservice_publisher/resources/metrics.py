@@ -0,0 +1,17 @@
+"""Repository module for metrics."""
+
+from aiohttp import web
+
+from dataservice_publisher.service.metrics import METRICS
+
+
+class Metrics(web.View):
+    """Class representing the metrics of the worker, in the Prometheus text format."""
+
+    async def get(self) -> web.Response:
+        """Metrics route function."""
+        return web.Response(
+            text=self.request.app[METRICS].expose(),
+            content_type="text/plain",
+            headers={"X-Content-Type-Options": "nosniff"},
+        )
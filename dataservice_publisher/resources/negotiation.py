@@ -0,0 +1,205 @@
+"""Module for negotiating the representation of catalog resources."""
+
+from dataclasses import dataclass
+from functools import lru_cache
+import gzip
+from os import environ as env
+from typing import Dict, List, Optional, Tuple, Union
+import zlib
+
+from aiohttp import hdrs, web
+from content_negotiation import decide_content_type, NoAgreeableContentTypeError
+from dotenv import load_dotenv
+from rdflib import Dataset, URIRef
+from rdflib.graph import Graph
+
+from dataservice_publisher.resources.serializers import (
+    JSON_LD_COMPACTED_CONTENT_TYPE,
+    SERIALIZERS,
+)
+from dataservice_publisher.service.memory_accounting import measure
+
+load_dotenv()
+NEGOTIATION_CACHE_SIZE = int(env.get("NEGOTIATION_CACHE_SIZE", 256))
+JSON_LD_COMPACTED = "http://www.w3.org/ns/json-ld#compacted"
+
+
+@dataclass(frozen=True)
+class RdfFormat:
+    """A supported RDF serialization."""
+
+    media_type: str
+    rdflib_format: str
+    quads: bool = False
+
+
+# The registry of supported formats, the first one is the default:
+RDF_FORMATS: Dict[str, RdfFormat] = {
+    rdf_format.media_type: rdf_format
+    for rdf_format in [
+        RdfFormat("text/turtle", "text/turtle"),
+        RdfFormat("application/rdf+xml", "application/rdf+xml"),
+        RdfFormat("application/ld+json", "json-ld"),
+        RdfFormat("application/n-triples", "application/n-triples"),
+        RdfFormat("application/n-quads", "nquads", quads=True),
+        RdfFormat("application/trig", "trig", quads=True),
+    ]
+}
+SUPPORTED_CONTENT_TYPES = list(RDF_FORMATS)
+
+
+@dataclass(frozen=True)
+class Variant:
+    """A negotiated representation: format, JSON-LD profile and encoding."""
+
+    rdf_format: RdfFormat
+    compacted: bool = False
+    gzip: bool = False
+
+    @property
+    def key(self) -> str:
+        """Return a key identifying the variant, e.g. in a cache."""
+        key = self.rdf_format.media_type
+        if self.compacted:
+            key += ";compacted"
+        if self.gzip:
+            key += ";gzip"
+        return key
+
+    @property
+    def content_type(self) -> str:
+        """Return the value of the Content-Type header."""
+        if self.compacted:
+            return JSON_LD_COMPACTED_CONTENT_TYPE
+        return self.rdf_format.media_type
+
+
+def negotiate(request: web.Request) -> Variant:
+    """Decide the variant to respond with, given the request headers."""
+    decision = _decide_format(", ".join(request.headers.getall(hdrs.ACCEPT, [])))
+    if decision is None:
+        raise web.HTTPNotAcceptable()
+    rdf_format, compacted = decision
+    return Variant(
+        rdf_format,
+        compacted=compacted,
+        gzip=_accepts_gzip(request.headers.get(hdrs.ACCEPT_ENCODING, "")),
+    )
+
+
+def negotiate_quads(request: web.Request, media_types: List[str]) -> str:
+    """Decide the quad format to respond with, the first one unless another is asked for."""
+    accept = ", ".join(request.headers.getall(hdrs.ACCEPT, [])) or "*/*"
+    media_ranges = [media_range.strip() for media_range in accept.split(",")]
+    try:
+        return decide_content_type(
+            [media_range for media_range in media_ranges if media_range], media_types
+        )
+    except NoAgreeableContentTypeError as e:
+        raise web.HTTPNotAcceptable() from e
+
+
+def serialize(graph: Graph, variant: Variant, identifier: str) -> bytes:
+    """Serialize the graph, named by identifier, as the variant."""
+    with measure("serialized"):
+        rdf_format = variant.rdf_format
+        if rdf_format.quads:
+            dataset = Dataset()
+            for prefix, namespace in graph.namespaces():
+                dataset.bind(prefix, namespace)
+            named_graph = dataset.graph(URIRef(identifier))
+            named_graph += graph
+            body = dataset.serialize(format=rdf_format.rdflib_format, encoding="utf-8")
+        elif variant.content_type in SERIALIZERS:
+            body = "".join(SERIALIZERS[variant.content_type](graph)).encode()
+        else:
+            body = graph.serialize(format=rdf_format.rdflib_format, encoding="utf-8")
+        if variant.gzip:
+            return gzip.compress(body, mtime=0)
+        return body
+
+
+def variant_response(body: Union[bytes, memoryview], variant: Variant) -> web.Response:
+    """Return a response with the body serialized as the variant."""
+    return web.Response(body=body, headers=variant_headers(variant))
+
+
+async def stream_variant(
+    request: web.Request,
+    graph: Graph,
+    variant: Variant,
+    identifier: str,
+    headers: Optional[Dict[str, str]] = None,
+) -> web.StreamResponse:
+    """Respond with the graph serialized as the variant, streamed in chunks."""
+    serializer = SERIALIZERS.get(variant.content_type)
+    if serializer is None:
+        body = serialize(graph, variant, identifier)
+        return web.Response(
+            body=body, headers={**variant_headers(variant), **(headers or {})}
+        )
+    response = web.StreamResponse(headers=variant_headers(variant))
+    response.headers.update(headers or {})
+    await response.prepare(request)
+    # A gzip stream, compressed as the chunks are written:
+    compressor = zlib.compressobj(wbits=31) if variant.gzip else None
+    for chunk in serializer(graph):
+        data = chunk.encode()
+        await response.write(compressor.compress(data) if compressor else data)
+    if compressor:
+        await response.write(compressor.flush())
+    await response.write_eof()
+    return response
+
+
+def variant_headers(variant: Variant) -> Dict[str, str]:
+    """Return the headers of a response with a body serialized as the variant."""
+    headers: Dict[str, str] = {
+        hdrs.CONTENT_TYPE: f"{variant.content_type}; charset=utf-8",
+        hdrs.VARY: f"{hdrs.ACCEPT}, {hdrs.ACCEPT_ENCODING}",
+    }
+    if variant.gzip:
+        headers[hdrs.CONTENT_ENCODING] = "gzip"
+    return headers
+
+
+@lru_cache(maxsize=NEGOTIATION_CACHE_SIZE)
+def _decide_format(accept: str) -> Optional[Tuple[RdfFormat, bool]]:
+    """Return the format and whether compacted JSON-LD is asked for, or None."""
+    media_ranges = [media_range.strip() for media_range in accept.split(",")]
+    media_ranges = [media_range for media_range in media_ranges if media_range]
+    try:
+        media_type = decide_content_type(media_ranges, SUPPORTED_CONTENT_TYPES)
+    except NoAgreeableContentTypeError:
+        return None
+    compacted = False
+    if media_type == "application/ld+json":
+        for media_range in media_ranges:
+            name, *params = [part.strip() for part in media_range.split(";")]
+            if name == media_type:
+                compacted = any(
+                    param.startswith("profile=") and JSON_LD_COMPACTED in param
+                    for param in params
+                )
+                break
+    return RDF_FORMATS[media_type], compacted
+
+
+@lru_cache(maxsize=NEGOTIATION_CACHE_SIZE)
+def _accepts_gzip(accept_encoding: str) -> bool:
+    weights: Dict[str, float] = {}
+    for coding in accept_encoding.split(","):
+        name, *params = [part.strip() for part in coding.split(";")]
+        if not name:
+            continue
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        weights[name.lower()] = q
+    gzip_q = weights.get("gzip", weights.get("*", 0.0))
+    identity_q = weights.get("identity", weights.get("*", 1.0))
+    return gzip_q > 0 and gzip_q >= identity_q
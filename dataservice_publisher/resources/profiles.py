@@ -0,0 +1,33 @@
+"""Repository module for profiles of requests."""
+
+import json
+
+from aiohttp import hdrs, web
+
+from dataservice_publisher.service.profiling import PROFILE_FORMATS, PROFILES
+
+
+class Profile(web.View):
+    """Class representing the profile of a request."""
+
+    async def get(self) -> web.StreamResponse:
+        """Download the profile given by id, as speedscope JSON or pstats."""
+        id = self.request.match_info["id"]
+        format = self.request.query.get("format", "speedscope")
+        if format not in PROFILE_FORMATS:
+            return web.Response(
+                status=400,
+                body=json.dumps({"msg": f"Unknown format {format}"}),
+                content_type="application/json",
+            )
+        path = self.request.app[PROFILES].path(id, format)
+        if path is None:
+            return web.Response(status=404)
+        extension = "json" if format == "speedscope" else "pstats"
+        return web.FileResponse(
+            path,
+            headers={
+                hdrs.CONTENT_TYPE: PROFILE_FORMATS[format],
+                hdrs.CONTENT_DISPOSITION: f'attachment; filename="{id}.{extension}"',
+            },
+        )
@@ -1,17 +1,13 @@
 """Repository module for ready."""
 
 import logging
-from os import environ as env
 from typing import Any
 
 from aiohttp import ClientConnectionError, ClientSession
 from aiohttp import web
-from dotenv import load_dotenv
 
-# Get environment
-load_dotenv()
-FUSEKI_HOST = env.get("FUSEKI_HOST", "http://fuseki")
-FUSEKI_PORT = int(env.get("FUSEKI_PORT", 8080))
+from dataservice_publisher.service.cache_warmup import WARMUP_STATE
+from dataservice_publisher.service.shards import ping_url, SHARDS
 
 
 class Ready(web.View):
@@ -19,14 +15,22 @@ class Ready(web.View):
 
     async def get(self) -> Any:
         """Ready route function."""
-        url = f"{FUSEKI_HOST}:{FUSEKI_PORT}/fuseki/$/ping"
-        try:
-            # Get ready status from fuseki
-            async with ClientSession() as session:
-                async with session.get(url) as response:
-                    if response.status == 200:
-                        return web.Response(text="OK")
-        except ClientConnectionError as e:
-            logging.critical(f"Got exception from {url}: {type(e)}\n{e}.")
-            pass
-        return web.Response(status=500)
+        # Do not route traffic to the worker until the cache is warm:
+        warmup = self.request.app[WARMUP_STATE]
+        if not warmup.done:
+            return web.Response(
+                status=503, text=f"Warming up cache: {warmup.loaded}/{warmup.total}"
+            )
+        # Every catalog is needed, so every Fuseki server must be ready:
+        urls = list(dict.fromkeys(ping_url(e) for e in SHARDS.endpoints))
+        async with ClientSession() as session:
+            for url in urls:
+                try:
+                    # Get ready status from fuseki
+                    async with session.get(url) as response:
+                        if response.status != 200:
+                            return web.Response(status=500)
+                except ClientConnectionError as e:
+                    logging.critical("Got exception from %s: %s\n%s.", url, type(e), e)
+                    return web.Response(status=500)
+        return web.Response(text="OK")
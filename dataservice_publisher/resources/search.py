@@ -0,0 +1,84 @@
+"""Repository module for searching catalogs and data services."""
+
+import json
+from os import environ as env
+
+from aiohttp import hdrs, web
+from dotenv import load_dotenv
+from rdflib.graph import URIRef
+
+from dataservice_publisher.resources.negotiation import (
+    negotiate,
+    stream_variant,
+)
+from dataservice_publisher.service.catalog_registry import CATALOG_REGISTRY
+from dataservice_publisher.service.catalog_service import DATASERVICE_PUBLISHER_URL
+from dataservice_publisher.service.search_index import SEARCH_INDEX, tokenize
+
+load_dotenv()
+SEARCH_PAGE_SIZE = int(env.get("SEARCH_PAGE_SIZE", 20))
+SEARCH_MAX_PAGE_SIZE = int(env.get("SEARCH_MAX_PAGE_SIZE", 100))
+# The seconds the first search of a worker waits for the index to be built:
+SEARCH_INDEX_BUILD_TIMEOUT = float(env.get("SEARCH_INDEX_BUILD_TIMEOUT", 10))
+
+
+class Search(web.View):
+    """Class representing search resource."""
+
+    async def get(self) -> web.StreamResponse:
+        """Search catalogs and data services by keyword and publisher."""
+        variant = negotiate(self.request)
+        query = self.request.query
+        q = query.get("q", "")
+        publisher = query.get("publisher")
+        try:
+            offset = int(query.get("offset", 0))
+            limit = int(query.get("limit", SEARCH_PAGE_SIZE))
+            if offset < 0 or not 0 < limit <= SEARCH_MAX_PAGE_SIZE:
+                raise ValueError("offset or limit out of range")
+        except ValueError as e:
+            return _bad_request(str(e))
+        if not q.strip() and publisher is None:
+            return _bad_request("q or publisher is required")
+        if q.strip() and not tokenize(q):
+            return _bad_request("q has no words to search for")
+
+        index = self.request.app[SEARCH_INDEX]
+        registry = self.request.app[CATALOG_REGISTRY]
+        if not await index.wait_ready(registry, SEARCH_INDEX_BUILD_TIMEOUT):
+            # The index goes on being built in the background:
+            return web.Response(
+                status=503,
+                headers={hdrs.RETRY_AFTER: "1"},
+                body=json.dumps({"msg": "The search index is being built"}),
+                content_type="application/json",
+            )
+        total, hits = index.search(q, publisher, offset, limit)
+
+        headers = {"X-Total-Count": str(total)}
+        links = []
+        if offset + limit < total:
+            links.append(self._link(offset + limit, limit, "next"))
+        if offset > 0:
+            links.append(self._link(max(0, offset - limit), limit, "prev"))
+        if links:
+            headers[hdrs.LINK] = ", ".join(links)
+        return await stream_variant(
+            self.request,
+            index.graph(hits),
+            variant,
+            URIRef(f"{DATASERVICE_PUBLISHER_URL}/search"),
+            headers,
+        )
+
+    def _link(self, offset: int, limit: int, rel: str) -> str:
+        url = self.request.rel_url.update_query(offset=offset, limit=limit)
+        return '<%s>; rel="%s"' % (url, rel)
+
+
+def _bad_request(msg: str) -> web.Response:
+    return web.Response(
+        status=400,
+        body=json.dumps({"msg": msg}),
+        content_type="application/json",
+    )
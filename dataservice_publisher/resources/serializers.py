@@ -0,0 +1,163 @@
+"""Module for streaming serializers of RDF graphs, yielding the output in chunks."""
+
+import json
+import re
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from rdflib import BNode, Literal, RDF, URIRef
+from rdflib.graph import Graph
+
+from dataservice_publisher.service.catalog_versions import nt_term
+
+CHUNK_SIZE = 64 * 1024
+JSON_LD_COMPACTED_CONTENT_TYPE = (
+    'application/ld+json; profile="http://www.w3.org/ns/json-ld#compacted"'
+)
+
+# The static context of the JSON-LD output, and the prefixes of the Turtle output:
+DCAT_CONTEXT: Dict[str, str] = {
+    "adms": "http://www.w3.org/ns/adms#",
+    "dcat": "http://www.w3.org/ns/dcat#",
+    "dct": "http://purl.org/dc/terms/",
+    "dsp": "urn:dataservice-publisher:",
+    "foaf": "http://xmlns.com/foaf/0.1/",
+    "owl": "http://www.w3.org/2002/07/owl#",
+    "rdf": "http://www.w3.org/1999/02/22-rdf-syntax-ns#",
+    "rdfs": "http://www.w3.org/2000/01/rdf-schema#",
+    "skos": "http://www.w3.org/2004/02/skos/core#",
+    "vcard": "http://www.w3.org/2006/vcard/ns#",
+    "xsd": "http://www.w3.org/2001/XMLSchema#",
+}
+# Longest namespaces first, so that the most specific one is used:
+_NAMESPACES: List[Tuple[str, str]] = sorted(
+    ((ns, prefix) for prefix, ns in DCAT_CONTEXT.items()), key=lambda n: -len(n[0])
+)
+_TURTLE_PREFIXES = "".join(f"@prefix {p}: <{ns}> .\n" for p, ns in DCAT_CONTEXT.items())
+_JSON_LD_HEAD = '{"@context": %s, "@graph": [' % json.dumps(DCAT_CONTEXT)
+# Local names that are safe in prefixed names, in Turtle and in JSON-LD alike:
+_LOCAL_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_-]*$")
+
+# A streaming serializer yields the serialization of a graph in chunks:
+StreamingSerializer = Callable[[Graph], Iterator[str]]
+
+
+def nt_chunks(graph: Graph) -> Iterator[str]:
+    """Yield the graph as N-Triples."""
+    return _chunked(
+        "%s %s %s .\n" % (nt_term(s), nt_term(p), nt_term(o)) for s, p, o in graph
+    )
+
+
+def turtle_chunks(graph: Graph) -> Iterator[str]:
+    """Yield the graph as Turtle, grouped by subject but not sorted."""
+
+    def _statements() -> Iterator[str]:
+        yield _TURTLE_PREFIXES
+        for subject in _subjects(graph):
+            predicates = []
+            for predicate, objects in _properties(graph, subject):
+                verb = "a" if predicate == RDF.type else _turtle_term(predicate)
+                predicates.append(
+                    "    %s %s" % (verb, ", ".join(_turtle_term(o) for o in objects))
+                )
+            yield "\n%s\n%s .\n" % (_turtle_term(subject), " ;\n".join(predicates))
+
+    return _chunked(_statements())
+
+
+def jsonld_chunks(graph: Graph) -> Iterator[str]:
+    """Yield the graph as flattened JSON-LD, compacted with the static DCAT context."""
+    return _chunked(_json_ld_nodes(graph, _JSON_LD_HEAD, "\n]}\n", _compact))
+
+
+def expanded_jsonld_chunks(graph: Graph) -> Iterator[str]:
+    """Yield the graph as flattened JSON-LD, expanded to full IRIs without a context."""
+    return _chunked(_json_ld_nodes(graph, "[", "\n]\n", str))
+
+
+# The registry of streaming serializers, by content type:
+SERIALIZERS: Dict[str, StreamingSerializer] = {
+    "application/n-triples": nt_chunks,
+    "text/turtle": turtle_chunks,
+    "application/ld+json": expanded_jsonld_chunks,
+    JSON_LD_COMPACTED_CONTENT_TYPE: jsonld_chunks,
+}
+
+
+def _chunked(parts: Iterable[str]) -> Iterator[str]:
+    """Join the parts into chunks of about CHUNK_SIZE characters."""
+    chunk: List[str] = []
+    size = 0
+    for part in parts:
+        chunk.append(part)
+        size += len(part)
+        if size >= CHUNK_SIZE:
+            yield "".join(chunk)
+            chunk, size = [], 0
+    if chunk:
+        yield "".join(chunk)
+
+
+def _json_ld_nodes(
+    graph: Graph, head: str, tail: str, name: Callable[[URIRef], str]
+) -> Iterator[str]:
+    """Yield the nodes of the graph as JSON-LD, naming the IRIs with name."""
+    yield head
+    separator = "\n"
+    for subject in _subjects(graph):
+        node: Dict[str, Any] = {"@id": _node_id(subject)}
+        for predicate, objects in _properties(graph, subject):
+            types = [o for o in objects if isinstance(o, URIRef)]
+            if predicate == RDF.type and len(types) == len(objects):
+                node["@type"] = [name(o) for o in types]
+            else:
+                node[name(predicate)] = [_json_ld_value(o) for o in objects]
+        yield separator + json.dumps(node, ensure_ascii=False)
+        separator = ",\n"
+    yield tail
+
+
+def _subjects(graph: Graph) -> Iterator[Any]:
+    """Yield every subject once, in the order of the store's index."""
+    return graph.subjects(unique=True)
+
+
+def _properties(graph: Graph, subject: Any) -> Iterator[Tuple[Any, List[Any]]]:
+    """Yield the predicates of the subject, each with its objects."""
+    objects: Dict[Any, List[Any]] = {}
+    for predicate, o in graph.predicate_objects(subject):
+        objects.setdefault(predicate, []).append(o)
+    return iter(objects.items())
+
+
+def _prefixed(iri: str) -> Optional[str]:
+    """Return the prefixed name of the IRI, if it has a safe one."""
+    for ns, prefix in _NAMESPACES:
+        if iri.startswith(ns) and _LOCAL_NAME.match(iri[len(ns) :]):
+            return f"{prefix}:{iri[len(ns):]}"
+    return None
+
+
+def _turtle_term(term: Any) -> str:
+    if isinstance(term, URIRef):
+        return _prefixed(term) or term.n3()
+    return term.n3()
+
+
+def _compact(iri: URIRef) -> str:
+    return _prefixed(iri) or str(iri)
+
+
+def _node_id(term: Any) -> str:
+    return term.n3() if isinstance(term, BNode) else str(term)
+
+
+def _json_ld_value(term: Any) -> Dict[str, str]:
+    if isinstance(term, Literal):
+        value: Dict[str, str] = {"@value": str(term)}
+        if term.language:
+            value["@language"] = term.language
+        elif term.datatype:
+            value["@type"] = str(term.datatype)
+        return value
+    return {"@id": _node_id(term)}
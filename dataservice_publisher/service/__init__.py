@@ -1,5 +1,28 @@
 """Service package.
 
 Modules:
+    admission
+    catalog_dump
+    catalog_events
+    catalog_registry
     catalog_service
+    catalog_snapshots
+    catalog_versions
+    change_feed
+    cache_warmup
+    loop_monitor
+    memory_accounting
+    metrics
+    oas_conversion
+    oas_loader
+    profiling
+    publish_jobs
+    response_cache
+    search_index
+    shard_rebalancing
+    shards
+    shared_cache
+    single_flight
+    startup
+    write_batcher
 """
@@ -0,0 +1,189 @@
+"""Module for admission control, shedding load the worker cannot keep up with."""
+
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+import json
+import logging
+from os import environ as env
+from typing import Any, AsyncIterator, Deque, Dict, Iterable, Optional
+
+from aiohttp import hdrs, web
+from dotenv import load_dotenv
+
+from dataservice_publisher.service.metrics import MetricsRegistry, Sample
+
+load_dotenv()
+# The number of operations of a class run at a time, 0 for no limit:
+ADMISSION_READS_LIMIT = int(env.get("ADMISSION_READS_LIMIT", 64))
+ADMISSION_WRITES_LIMIT = int(env.get("ADMISSION_WRITES_LIMIT", 4))
+ADMISSION_OAS_FETCHES_LIMIT = int(env.get("ADMISSION_OAS_FETCHES_LIMIT", 32))
+# The number of operations of a class waiting for their turn, 0 sheds the rest at once:
+ADMISSION_READS_QUEUE = int(env.get("ADMISSION_READS_QUEUE", 0))
+ADMISSION_WRITES_QUEUE = int(env.get("ADMISSION_WRITES_QUEUE", 0))
+ADMISSION_OAS_FETCHES_QUEUE = int(env.get("ADMISSION_OAS_FETCHES_QUEUE", 0))
+# The seconds an operation may wait for its turn before it is shed:
+ADMISSION_QUEUE_TIMEOUT = float(env.get("ADMISSION_QUEUE_TIMEOUT", 2))
+ADMISSION_RETRY_AFTER = int(env.get("ADMISSION_RETRY_AFTER", 1))
+
+# Long-lived streams and probes are not subject to admission control:
+EXEMPT_PATHS = ("/ping", "/ready", "/metrics", "/changes")
+
+
+class OverloadedError(Exception):
+    """Raised when an operation is shed because the worker is overloaded."""
+
+
+class Limiter:
+    """Runs at most limit operations at a time, letting at most queue_size wait."""
+
+    def __init__(
+        self,
+        name: str,
+        limit: int,
+        queue_size: int,
+        queue_timeout: float = ADMISSION_QUEUE_TIMEOUT,
+    ) -> None:
+        """Inits the limiter."""
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.admitted = 0
+        self.shed = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        """Return the number of operations waiting for their turn."""
+        return len(self._waiters)
+
+    async def acquire(self, shed: bool = True) -> None:
+        """Wait for a turn, or raise OverloadedError if there is none and shed is true."""
+        if self.limit <= 0 or (self.active < self.limit and not self._waiters):
+            self.active += 1
+            self.admitted += 1
+            return
+        if shed and len(self._waiters) >= self.queue_size:
+            self._shed()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(
+                asyncio.shield(waiter), self.queue_timeout if shed else None
+            )
+        except asyncio.TimeoutError:
+            self._abandon(waiter)
+            self._shed()
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+        self.admitted += 1
+
+    def release(self) -> None:
+        """End an operation, handing its turn to the longest waiting one."""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def turn(self, shed: bool = True) -> AsyncIterator[None]:
+        """Run an operation in a turn, waiting as long as it takes if shed is false."""
+        await self.acquire(shed)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def __aenter__(self) -> "Limiter":
+        """Wait for a turn."""
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        """End the turn."""
+        self.release()
+
+    def _abandon(self, waiter: asyncio.Future) -> None:
+        """Stop waiting, passing the turn on if it was handed over meanwhile."""
+        if waiter.done():
+            self.release()
+        else:
+            waiter.cancel()
+            self._waiters.remove(waiter)
+
+    def _shed(self) -> None:
+        self.shed += 1
+        logging.warning("Shedding %s, %s active", self.name, self.active)
+        raise OverloadedError(f"Too many concurrent {self.name}")
+
+
+class Admission:
+    """The limiters of the operation classes of a worker."""
+
+    def __init__(self, limiters: Optional[Dict[str, Limiter]] = None) -> None:
+        """Inits the limiters, for reads, writes and fetches of OpenAPI documents."""
+        self.limiters = limiters or {
+            "reads": Limiter("reads", ADMISSION_READS_LIMIT, ADMISSION_READS_QUEUE),
+            "writes": Limiter("writes", ADMISSION_WRITES_LIMIT, ADMISSION_WRITES_QUEUE),
+            # OpenAPI documents are fetched by requests and publish jobs alike:
+            "oas_fetches": Limiter(
+                "oas_fetches", ADMISSION_OAS_FETCHES_LIMIT, ADMISSION_OAS_FETCHES_QUEUE
+            ),
+        }
+
+    def limiter(self, request: web.Request) -> Optional[Limiter]:
+        """Return the limiter of the class of the request, if it has one."""
+        if request.method == "OPTIONS" or request.path in EXEMPT_PATHS:
+            return None
+        if request.method in ("GET", "HEAD"):
+            return self.limiters["reads"]
+        return self.limiters["writes"]
+
+    def register(self, metrics: MetricsRegistry) -> None:
+        """Expose the admission metrics."""
+        metrics.describe("admission_active", "gauge", "Operations running, by class.")
+        metrics.describe(
+            "admission_queued", "gauge", "Operations waiting for their turn, by class."
+        )
+        metrics.describe(
+            "admission_admitted_total", "counter", "Operations admitted, by class."
+        )
+        metrics.describe(
+            "admission_shed_total", "counter", "Operations shed, by class."
+        )
+        metrics.add_collector(self.samples)
+
+    def samples(self) -> Iterable[Sample]:
+        """Return the samples of the admission metrics."""
+        for name, limiter in self.limiters.items():
+            labels = {"class": name}
+            yield "admission_active", labels, limiter.active
+            yield "admission_queued", labels, limiter.queued
+            yield "admission_admitted_total", labels, limiter.admitted
+            yield "admission_shed_total", labels, limiter.shed
+
+
+ADMISSION = web.AppKey("admission", Admission)
+
+
+@web.middleware
+async def admission_middleware(request: web.Request, handler: Any) -> Any:
+    """Middleware answering 503 to the requests the worker cannot take on now."""
+    limiter = request.app[ADMISSION].limiter(request)
+    try:
+        if limiter is None:
+            return await handler(request)
+        async with limiter:
+            return await handler(request)
+    except OverloadedError as e:
+        return web.Response(
+            status=503,
+            headers={hdrs.RETRY_AFTER: str(ADMISSION_RETRY_AFTER)},
+            body=json.dumps({"msg": str(e)}),
+            content_type="application/json",
+        )
@@ -0,0 +1,143 @@
+"""Module for warming up the response cache when a worker starts."""
+
+import asyncio
+from dataclasses import dataclass
+import logging
+from os import environ as env
+import random
+from typing import List, Optional
+
+from aiohttp import web
+from dotenv import load_dotenv
+from rdflib import DCAT, RDF
+from rdflib.graph import Graph
+
+from dataservice_publisher.resources.negotiation import RDF_FORMATS, serialize, Variant
+from dataservice_publisher.service.catalog_registry import (
+    CATALOG_REGISTRY,
+    CatalogRegistry,
+    summaries_graph,
+)
+from dataservice_publisher.service.catalog_service import (
+    catalog_uri,
+    DATASERVICE_PUBLISHER_URL,
+    get_catalog_by_id,
+)
+from dataservice_publisher.service.response_cache import RESPONSE_CACHE, ResponseCache
+
+load_dotenv()
+CACHE_WARMUP = env.get("CACHE_WARMUP", "false").lower() == "true"
+CACHE_WARMUP_SIZE = int(env.get("CACHE_WARMUP_SIZE", 20))
+CACHE_WARMUP_CONCURRENCY = int(env.get("CACHE_WARMUP_CONCURRENCY", 4))
+CACHE_WARMUP_JITTER = float(env.get("CACHE_WARMUP_JITTER", 2.0))
+CACHE_SNAPSHOT_FILE = env.get("CACHE_SNAPSHOT_FILE")
+# The default representation, with and without compression:
+WARMUP_VARIANTS = [
+    Variant(RDF_FORMATS["text/turtle"]),
+    Variant(RDF_FORMATS["text/turtle"], gzip=True),
+]
+
+
+@dataclass
+class WarmupState:
+    """Progress of the cache warm-up."""
+
+    total: int = 0
+    loaded: int = 0
+    done: bool = True
+
+
+WARMUP_STATE = web.AppKey("warmup_state", WarmupState)
+WARMUP_TASK = web.AppKey("warmup_task", asyncio.Task)
+
+
+async def warm_up(
+    cache: ResponseCache, registry: CatalogRegistry, state: WarmupState
+) -> None:
+    """Preload the catalog list and the most requested catalogs into the cache."""
+    state.done = False
+    try:
+        if CACHE_SNAPSHOT_FILE:
+            loaded = cache.load(CACHE_SNAPSHOT_FILE)
+            logging.info("Loaded %s entries from cache snapshot", loaded)
+
+        # Spread the load from workers starting at the same time:
+        await asyncio.sleep(random.uniform(0, CACHE_WARMUP_JITTER))  # noqa: S311
+
+        generation = cache.generation("/catalogs")
+        catalogs = summaries_graph(await registry.summaries(generation))
+        _put(cache, "/catalogs", catalogs, catalog_uri(), generation)
+        ids = _most_requested_ids(cache) or _catalog_ids(catalogs)
+        ids = ids[:CACHE_WARMUP_SIZE]
+        state.total = len(ids)
+
+        semaphore = asyncio.Semaphore(CACHE_WARMUP_CONCURRENCY)
+
+        async def _load(id: str) -> None:
+            async with semaphore:
+                generation = cache.generation(f"/catalogs/{id}")
+                catalog = await get_catalog_by_id(id)
+                if len(catalog) > 0:
+                    _put(cache, f"/catalogs/{id}", catalog, catalog_uri(id), generation)
+                state.loaded += 1
+
+        results = await asyncio.gather(
+            *[_load(id) for id in ids], return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                logging.warning("Cache warm-up of a catalog failed: %s", result)
+        logging.info("Cache warm-up loaded %s of %s catalogs", state.loaded, len(ids))
+    except Exception:
+        logging.exception("Cache warm-up failed")
+    finally:
+        state.done = True
+
+
+def _put(
+    cache: ResponseCache, path: str, graph: Graph, identifier: str, generation: int
+) -> None:
+    for variant in WARMUP_VARIANTS:
+        body = serialize(graph, variant, identifier)
+        cache.put(path, variant.key, body, count=False, generation=generation)
+
+
+def _most_requested_ids(cache: ResponseCache) -> List[str]:
+    prefix = "/catalogs/"
+    return [
+        path[len(prefix) :]
+        for path in cache.most_requested(CACHE_WARMUP_SIZE + 1)
+        if path.startswith(prefix)
+    ]
+
+
+def _catalog_ids(catalogs: Graph) -> List[str]:
+    prefix = f"{DATASERVICE_PUBLISHER_URL}/catalogs/"
+    return [
+        str(catalog)[len(prefix) :]
+        for catalog in catalogs.subjects(RDF.type, DCAT.Catalog)
+        if str(catalog).startswith(prefix)
+    ]
+
+
+async def start_cache_warmup(app: web.Application) -> None:
+    """Start warming up the cache in the background, if enabled."""
+    if CACHE_WARMUP and app[RESPONSE_CACHE].ttl <= 0:
+        logging.info("Not warming up the cache, as CACHE_TTL=0 disables it")
+    elif CACHE_WARMUP:
+        app[WARMUP_STATE].done = False
+        app[WARMUP_TASK] = asyncio.create_task(
+            warm_up(app[RESPONSE_CACHE], app[CATALOG_REGISTRY], app[WARMUP_STATE])
+        )
+
+
+async def stop_cache_warmup(app: web.Application) -> None:
+    """Stop an unfinished warm-up, and write the cache snapshot if configured."""
+    task: Optional[asyncio.Task] = app.get(WARMUP_TASK)
+    if task is not None and not task.done():
+        task.cancel()
+    if CACHE_SNAPSHOT_FILE:
+        try:
+            app[RESPONSE_CACHE].save(CACHE_SNAPSHOT_FILE)
+        except OSError as e:
+            logging.warning("Could not write cache snapshot: %s", e)
@@ -0,0 +1,242 @@
+"""Module for dumping all catalogs to files, as N-Quads and TriG."""
+
+import asyncio
+from contextlib import ExitStack
+import gzip
+import hashlib
+import logging
+import os
+from os import environ as env
+import re
+import tempfile
+from typing import Any, AsyncIterator, Dict, IO, List, Optional, Tuple
+
+from aiohttp import ClientSession, ClientTimeout, hdrs, web
+from dotenv import load_dotenv
+from SPARQLWrapper import JSON, SPARQLWrapper
+
+from dataservice_publisher.service.catalog_registry import DSP, METADATA_GRAPH
+from dataservice_publisher.service.shards import SHARDS
+
+load_dotenv()
+DUMP_DIR = env.get(
+    "DUMP_DIR", os.path.join(tempfile.gettempdir(), "dataservice-publisher-dump")
+)
+DUMP_READ_TIMEOUT = float(env.get("DUMP_READ_TIMEOUT", 300))
+CHUNK_SIZE = 64 * 1024
+
+# The file extensions of the dump formats, by media type:
+DUMP_FORMATS = {"application/n-quads": "nq", "application/trig": "trig"}
+# Graphs internal to the publisher, that are not part of the dump:
+INTERNAL_GRAPHS = "<urn:dataservice-publisher:"
+
+_TERM = r'(?:<[^>]*>|_:\S+|"(?:[^"\\]|\\.)*"(?:@[A-Za-z0-9-]+|\^\^<[^>]*>)?)'
+_QUAD = re.compile(rf"^\s*({_TERM}\s+{_TERM}\s+{_TERM})(?:\s+({_TERM}))?\s*\.\s*$")
+
+
+def split_quad(line: str) -> Optional[Tuple[str, Optional[str]]]:
+    """Split an N-Quads line in the triple and the graph, or return None if blank."""
+    match = _QUAD.match(line)
+    if match is None:
+        if line.strip() and not line.lstrip().startswith("#"):
+            logging.warning("Skipping unparseable line in dump: %.200s", line)
+        return None
+    return match.group(1), match.group(2)
+
+
+class DumpWriter:
+    """Writes quads as N-Quads and as TriG, to gzip-compressed and plain files.
+
+    TriG groups consecutive quads of the same graph, which is how Fuseki
+    writes them, so no quads are held in memory.
+    """
+
+    def __init__(self, files: Dict[str, List[IO[bytes]]]) -> None:
+        """Inits the writer, given the files to write each format to."""
+        self.files = files
+        self.quads = 0
+        self._graph: Optional[str] = None
+
+    def write_lines(self, lines: List[str]) -> None:
+        """Write the quads in the N-Quads lines, leaving out internal graphs."""
+        for line in lines:
+            quad = split_quad(line)
+            if quad is None:
+                continue
+            triple, graph = quad
+            # Triples in the default graph are not part of any catalog:
+            if graph is None or graph.startswith(INTERNAL_GRAPHS):
+                continue
+            self.write(triple, graph)
+
+    def write(self, triple: str, graph: str) -> None:
+        """Write the triple in the graph to the files of every format."""
+        self._emit("nq", f"{triple} {graph} .\n")
+        if graph != self._graph:
+            opening = f"{graph} {{\n"
+            self._emit("trig", opening if self._graph is None else "}\n" + opening)
+            self._graph = graph
+        self._emit("trig", f"  {triple} .\n")
+        self.quads += 1
+
+    def close(self) -> None:
+        """Write what ends the files."""
+        if self._graph is not None:
+            self._emit("trig", "}\n")
+
+    def _emit(self, extension: str, text: str) -> None:
+        data = text.encode()
+        for file in self.files[extension]:
+            file.write(data)
+
+
+class CatalogDump:
+    """The latest dump of all catalogs, in files shared by the workers of a host.
+
+    A dump is tagged with the generation it was made at, and made again
+    only when it is asked for at another generation, i.e. after a write.
+    """
+
+    def __init__(self, directory: str = DUMP_DIR) -> None:
+        """Inits the dump."""
+        self.directory = directory
+        self._lock = asyncio.Lock()
+
+    def path(self, generation: str, media_type: str) -> str:
+        """Return the path of the uncompressed dump file of the generation."""
+        return os.path.join(
+            self.directory, f"catalogs-{generation}.{DUMP_FORMATS[media_type]}"
+        )
+
+    async def get(self, generation: str, media_type: str) -> str:
+        """Return the path of the dump of the generation, making it if needed."""
+        path = self.path(generation, media_type)
+        if os.path.exists(path):
+            return path
+        async with self._lock:
+            if not os.path.exists(path):
+                await self._make(generation)
+        return path
+
+    async def _make(self, generation: str) -> None:
+        """Stream all graphs from Fuseki into the dump files of the generation."""
+        logging.info("Making the dump of all catalogs at generation %s", generation)
+        os.makedirs(self.directory, exist_ok=True)
+        paths = [
+            self.path(generation, media_type) + suffix
+            for media_type in DUMP_FORMATS
+            for suffix in ("", ".gz")
+        ]
+        temporary = {path: f"{path}.{os.getpid()}.tmp" for path in paths}
+        try:
+            with ExitStack() as stack:
+                files: Dict[str, List[IO[bytes]]] = {
+                    extension: [] for extension in DUMP_FORMATS.values()
+                }
+                for path in paths:
+                    extension = path.removesuffix(".gz").rsplit(".", 1)[-1]
+                    files[extension].append(
+                        stack.enter_context(
+                            _open(temporary[path], path.endswith(".gz"))
+                        )
+                    )
+                writer = DumpWriter(files)
+                async for lines in _fetch_nquads():
+                    # Parsing and compressing is CPU bound, keep it off the event loop:
+                    await asyncio.to_thread(writer.write_lines, lines)
+                writer.close()
+            # The compressed files go last, as they are looked for first when serving:
+            for path in sorted(paths, key=lambda path: path.endswith(".gz")):
+                os.replace(temporary[path], path)
+            logging.info("Dumped %s quads at generation %s", writer.quads, generation)
+        finally:
+            for path in temporary.values():
+                if os.path.exists(path):
+                    os.remove(path)
+        self._remove_others(generation)
+
+    def _remove_others(self, generation: str) -> None:
+        for name in os.listdir(self.directory):
+            if not name.startswith("catalogs-") or name.endswith(".tmp"):
+                continue
+            if name.startswith(f"catalogs-{generation}."):
+                continue
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+
+async def fetch_generation() -> str:
+    """Return the generation of all catalogs, which changes with any write to them."""
+    querystring = """
+        SELECT ?catalog ?version ?etag ?graph ?triples
+        WHERE {
+            {
+                GRAPH <%s> {
+                    ?catalog <%s> ?version .
+                    OPTIONAL { ?catalog <%s> ?etag }
+                }
+            }
+            UNION
+            {
+                SELECT ?graph (COUNT(*) AS ?triples)
+                WHERE {
+                    GRAPH ?graph { ?s ?p ?o }
+                    FILTER (!STRSTARTS(STR(?graph), "%s"))
+                }
+                GROUP BY ?graph
+            }
+        }
+    """ % (
+        METADATA_GRAPH,
+        DSP.version,
+        DSP.etag,
+        DSP,
+    )
+
+    async def _fetch(query_endpoint: str) -> List[Dict[str, Any]]:
+        sparql = SPARQLWrapper(query_endpoint)
+        sparql.setQuery(querystring)
+        sparql.setReturnFormat(JSON)
+        result = await asyncio.to_thread(sparql.queryAndConvert)
+        return result["results"]["bindings"]  # type: ignore
+
+    # Every publish bumps the version in the summary of the catalog, on whichever
+    # dataset keeps it, and every delete removes the summary. The sizes of the graphs
+    # tell of the catalogs without summaries, e.g. older than the registry:
+    shards = await asyncio.gather(*[_fetch(e) for e in SHARDS.endpoints])
+    names = ["catalog", "version", "etag", "graph", "triples"]
+    rows = sorted(
+        " ".join(b.get(name, {}).get("value", "") for name in names)
+        for bindings in shards
+        for b in bindings
+    )
+    return hashlib.sha256("\n".join(rows).encode()).hexdigest()[:32]
+
+
+def _open(path: str, compressed: bool) -> IO[bytes]:
+    if compressed:
+        return gzip.open(path, "wb", compresslevel=6)  # type: ignore
+    return open(path, "wb")
+
+
+async def _fetch_nquads() -> AsyncIterator[List[str]]:
+    """Yield the lines of every dataset, read as N-Quads from Fuseki, in chunks."""
+    timeout = ClientTimeout(total=None, sock_read=DUMP_READ_TIMEOUT)
+    async with ClientSession(timeout=timeout) as session:
+        for url in SHARDS.endpoints:
+            async with session.get(
+                url, headers={hdrs.ACCEPT: "application/n-quads"}
+            ) as response:
+                response.raise_for_status()
+                rest = b""
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    lines = (rest + chunk).split(b"\n")
+                    rest = lines.pop()
+                    yield [line.decode() for line in lines]
+                if rest:
+                    yield [rest.decode()]
+
+
+CATALOG_DUMP = web.AppKey("catalog_dump", CatalogDump)
@@ -0,0 +1,42 @@
+"""Module for notifying the parts of a worker that keep state about catalogs."""
+
+import logging
+from typing import Callable, List
+
+from aiohttp import web
+from rdflib.graph import Graph
+
+from dataservice_publisher.service.catalog_registry import CatalogSummary
+
+
+class CatalogEvents:
+    """Callbacks run after a catalog has been created or deleted by this worker.
+
+    A failing callback is logged, and does not stop the other callbacks.
+    """
+
+    def __init__(self) -> None:
+        """Inits the callback lists."""
+        self.on_created: List[Callable[[CatalogSummary, Graph], None]] = []
+        self.on_deleted: List[Callable[[str], None]] = []
+
+    def created(self, summary: CatalogSummary, graph: Graph) -> None:
+        """Run the callbacks for a created or updated catalog."""
+        for callback in self.on_created:
+            try:
+                callback(summary, graph)
+            except Exception:
+                logging.exception(
+                    "Callback for created catalog %s failed", summary.identifier
+                )
+
+    def deleted(self, identifier: str) -> None:
+        """Run the callbacks for a deleted catalog."""
+        for callback in self.on_deleted:
+            try:
+                callback(identifier)
+            except Exception:
+                logging.exception("Callback for deleted catalog %s failed", identifier)
+
+
+CATALOG_EVENTS = web.AppKey("catalog_events", CatalogEvents)
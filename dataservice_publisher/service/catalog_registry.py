@@ -0,0 +1,362 @@
+"""Module for the registry of catalog summaries used for listing catalogs."""
+
+import asyncio
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+import logging
+from os import environ as env
+import time
+from typing import Dict, List, Optional
+
+from aiohttp import web
+from dotenv import load_dotenv
+from rdflib import DCAT, DCTERMS, Namespace, RDF, XSD
+from rdflib.graph import Graph, Literal, URIRef
+from SPARQLWrapper import JSON, POST, SPARQLWrapper, TURTLE
+from SPARQLWrapper.SPARQLExceptions import SPARQLWrapperException
+
+from dataservice_publisher.service.shards import SHARDS, update_endpoint
+
+load_dotenv()
+FUSEKI_PASSWORD = env.get("FUSEKI_PASSWORD")
+REGISTRY_TTL = float(env.get("REGISTRY_TTL", 10))
+
+DSP = Namespace("urn:dataservice-publisher:")
+METADATA_GRAPH = URIRef("urn:dataservice-publisher:metadata")
+SORT_KEYS = ["identifier", "title", "publisher", "services", "modified"]
+
+
+@dataclass
+class CatalogSummary:
+    """The facts about a catalog needed to list it."""
+
+    identifier: str
+    title: Dict[str, str] = field(default_factory=dict)
+    publisher: Optional[str] = None
+    services: int = 0
+    modified: Optional[datetime] = None
+    version: int = 0
+    etag: Optional[str] = None
+    # What was published, kept to recognize a republish of the same catalog:
+    request_hash: Optional[str] = None
+    content_hash: Optional[str] = None
+    idempotency_key: Optional[str] = None
+    # Tells the publish that wrote the summary, so it can see that it did:
+    publication: Optional[str] = None
+
+    def sort_key(self, key: str) -> str:
+        """Return the value to sort on for the given sort key."""
+        if key == "title":
+            return next(iter(sorted(self.title.items())), ("", ""))[1].lower()
+        if key == "services":
+            return f"{self.services:012d}"
+        if key == "modified":
+            return self.modified.isoformat() if self.modified else ""
+        return str(getattr(self, key) or "")
+
+    def to_graph(self, graph: Optional[Graph] = None, private: bool = False) -> Graph:
+        """Add the summary as triples to graph, or to a new graph, private facts too."""
+        graph = Graph() if graph is None else graph
+        graph.bind("dsp", DSP)
+        catalog = URIRef(self.identifier)
+        graph.add((catalog, RDF.type, DCAT.Catalog))
+        for language, title in self.title.items():
+            graph.add((catalog, DCTERMS.title, Literal(title, lang=language or None)))
+        if self.publisher:
+            graph.add((catalog, DCTERMS.publisher, URIRef(self.publisher)))
+        graph.add((catalog, DSP.services, Literal(self.services)))
+        graph.add((catalog, DSP.version, Literal(self.version)))
+        if self.etag:
+            graph.add((catalog, DSP.etag, Literal(self.etag)))
+        if self.modified:
+            graph.add(
+                (
+                    catalog,
+                    DCTERMS.modified,
+                    Literal(self.modified, datatype=XSD.dateTime),
+                )
+            )
+        if private:
+            for predicate, value in [
+                (DSP.requestHash, self.request_hash),
+                (DSP.contentHash, self.content_hash),
+                (DSP.idempotencyKey, self.idempotency_key),
+                (DSP.publication, self.publication),
+            ]:
+                if value:
+                    graph.add((catalog, predicate, Literal(value)))
+        return graph
+
+
+def summarize(identifier: str, graph: Graph) -> CatalogSummary:
+    """Create the summary of the catalog given by identifier, found in graph."""
+    catalog = URIRef(identifier)
+    services = graph.value(catalog, DSP.services)
+    modified = graph.value(catalog, DCTERMS.modified)
+    publisher = graph.value(catalog, DCTERMS.publisher)
+    version = graph.value(catalog, DSP.version)
+    etag = graph.value(catalog, DSP.etag)
+    request_hash = graph.value(catalog, DSP.requestHash)
+    content_hash = graph.value(catalog, DSP.contentHash)
+    idempotency_key = graph.value(catalog, DSP.idempotencyKey)
+    publication = graph.value(catalog, DSP.publication)
+    return CatalogSummary(
+        identifier=str(identifier),
+        title={
+            title.language or "": str(title)
+            for title in graph.objects(catalog, DCTERMS.title)
+            if isinstance(title, Literal)
+        },
+        publisher=str(publisher) if publisher is not None else None,
+        services=(
+            int(str(services))
+            if services is not None
+            else len(set(graph.objects(catalog, DCAT.service)))
+        ),
+        modified=(
+            modified.toPython()
+            if isinstance(modified, Literal)
+            else datetime.now(timezone.utc)
+        ),
+        version=int(str(version)) if version is not None else 0,
+        etag=str(etag) if etag is not None else None,
+        request_hash=str(request_hash) if request_hash is not None else None,
+        content_hash=str(content_hash) if content_hash is not None else None,
+        idempotency_key=(str(idempotency_key) if idempotency_key is not None else None),
+        publication=str(publication) if publication is not None else None,
+    )
+
+
+def summaries_graph(summaries: List[CatalogSummary]) -> Graph:
+    """Return a graph listing the catalogs of the summaries."""
+    graph = Graph()
+    for summary in summaries:
+        summary.to_graph(graph)
+    return graph
+
+
+def select_summaries(
+    summaries: List[CatalogSummary],
+    publisher: Optional[str] = None,
+    sort: str = "identifier",
+    descending: bool = False,
+    offset: int = 0,
+    limit: Optional[int] = None,
+) -> List[CatalogSummary]:
+    """Filter the summaries by publisher, sort them and return a page of them."""
+    if sort not in SORT_KEYS:
+        raise ValueError(f"Cannot sort on {sort}")
+    selected = [
+        summary
+        for summary in summaries
+        if publisher is None or summary.publisher == publisher
+    ]
+    selected.sort(key=lambda summary: summary.sort_key(sort), reverse=descending)
+    end = None if limit is None else offset + limit
+    return selected[offset:end]
+
+
+def summary_update(summary: CatalogSummary, condition: str = "") -> str:
+    """Return the SPARQL Update replacing the summary, if the condition holds."""
+    triples = summary.to_graph(private=True).serialize(format="nt")
+    return """
+        DELETE { GRAPH <%s> { <%s> ?p ?o } }
+        INSERT { GRAPH <%s> { %s } }
+        WHERE { %s OPTIONAL { GRAPH <%s> { <%s> ?p ?o } } }
+    """ % (
+        METADATA_GRAPH,
+        URIRef(summary.identifier),
+        METADATA_GRAPH,
+        triples,
+        condition,
+        METADATA_GRAPH,
+        URIRef(summary.identifier),
+    )
+
+
+def version_condition(identifier: str, version: int) -> str:
+    """Return the SPARQL pattern matching only if the catalog is at the version."""
+    # A catalog without a summary, or with a rebuilt one, is at version 0:
+    return """
+        {
+            OPTIONAL { GRAPH <%s> { <%s> <%s> ?current } }
+            FILTER (COALESCE(?current, 0) = %s)
+        }
+    """ % (
+        METADATA_GRAPH,
+        URIRef(identifier),
+        DSP.version,
+        int(version),
+    )
+
+
+def summary_delete(identifier: str) -> str:
+    """Return the SPARQL Update removing the summary from the metadata graph."""
+    return """
+        DELETE WHERE { GRAPH <%s> { <%s> ?p ?o } }
+    """ % (
+        METADATA_GRAPH,
+        URIRef(identifier),
+    )
+
+
+async def fetch_catalog_summaries() -> List[CatalogSummary]:
+    """Return the summaries of all catalogs, from the metadata graphs of all datasets."""
+    logging.debug("Fetch catalog summaries")
+    try:
+        shards = await asyncio.gather(
+            *[_fetch_shard_summaries(endpoint) for endpoint in SHARDS.endpoints]
+        )
+        return [summary for summaries in shards for summary in summaries]
+    except SPARQLWrapperException as e:
+        logging.exception("message")
+        # Logs the error appropriately.
+        raise e
+
+
+async def _fetch_shard_summaries(endpoint: str) -> List[CatalogSummary]:
+    """Return the summaries of the catalogs of the dataset."""
+    graph = await _construct(
+        endpoint,
+        """
+        CONSTRUCT { ?s ?p ?o }
+        WHERE { GRAPH <%s> { ?s ?p ?o } }
+        """
+        % (METADATA_GRAPH,),
+    )
+    if len(graph) == 0:
+        return await _rebuild_catalog_summaries(endpoint)
+    return [
+        summarize(str(catalog), graph)
+        for catalog in graph.subjects(RDF.type, DCAT.Catalog)
+    ]
+
+
+async def fetch_catalog_summary(identifier: str) -> Optional[CatalogSummary]:
+    """Return the summary of the catalog given by identifier, if there is one."""
+    graph = await _construct(
+        SHARDS.endpoint(identifier),
+        """
+        CONSTRUCT { <%s> ?p ?o }
+        WHERE { GRAPH <%s> { <%s> ?p ?o } }
+        """
+        % (URIRef(identifier), METADATA_GRAPH, URIRef(identifier)),
+    )
+    if (URIRef(identifier), None, None) not in graph:
+        return None
+    return summarize(identifier, graph)
+
+
+async def summary_published(identifier: str, publication: str) -> bool:
+    """Return true if the summary of the catalog was written by the publication."""
+    sparql = SPARQLWrapper(SHARDS.endpoint(identifier))
+    sparql.setQuery(
+        """
+        ASK { GRAPH <%s> { <%s> <%s> %s } }
+        """
+        % (
+            METADATA_GRAPH,
+            URIRef(identifier),
+            DSP.publication,
+            Literal(publication).n3(),
+        )
+    )
+    sparql.setReturnFormat(JSON)
+    result = await asyncio.to_thread(sparql.queryAndConvert)
+    return bool(result["boolean"])  # type: ignore
+
+
+async def _rebuild_catalog_summaries(endpoint: str) -> List[CatalogSummary]:
+    """Summarize the catalogs by scanning all graphs, and persist the summaries."""
+    graph = await _construct(
+        endpoint,
+        """
+        PREFIX dcat: <http://www.w3.org/ns/dcat#>
+        PREFIX dct: <http://purl.org/dc/terms/>
+        CONSTRUCT {
+            ?c a dcat:Catalog ; dct:title ?title ; dct:publisher ?publisher ;
+               dcat:service ?service .
+        }
+        WHERE {
+            GRAPH ?g {
+                ?c a dcat:Catalog .
+                OPTIONAL { ?c dct:title ?title }
+                OPTIONAL { ?c dct:publisher ?publisher }
+                OPTIONAL { ?c dcat:service ?service }
+            }
+        }
+        """,
+    )
+    summaries = [
+        summarize(str(catalog), graph)
+        for catalog in graph.subjects(RDF.type, DCAT.Catalog)
+    ]
+    if summaries:
+        logging.info("Rebuilding the registry of %s catalogs", len(summaries))
+        sparql = SPARQLWrapper(update_endpoint(endpoint))
+        sparql.setCredentials("admin", FUSEKI_PASSWORD)
+        sparql.setMethod(POST)
+        sparql.setQuery(" ;\n".join(summary_update(s) for s in summaries))
+        await asyncio.to_thread(sparql.query)
+    return summaries
+
+
+async def _construct(endpoint: str, querystring: str) -> Graph:
+    sparql = SPARQLWrapper(endpoint)
+    sparql.setQuery(querystring)
+    sparql.setReturnFormat(TURTLE)
+    sparql.setOnlyConneg(True)
+    data = await asyncio.to_thread(sparql.queryAndConvert)
+    return Graph().parse(data=data, format="turtle")  # type: ignore
+
+
+class CatalogRegistry:
+    """In-memory copy of the catalog summaries in the metadata graph.
+
+    Writes by this worker are applied directly; writes by other workers are
+    picked up when the copy is reloaded, at most `ttl` seconds later, or as
+    soon as the change feed tells of them, see `invalidate`. A copy loaded at
+    another generation of the cached catalog list is reloaded too, so that
+    the list is never cached from a copy older than its invalidation.
+    """
+
+    def __init__(self, ttl: float = REGISTRY_TTL) -> None:
+        """Inits the registry."""
+        self.ttl = ttl
+        self._summaries: Dict[str, CatalogSummary] = {}
+        self._loaded: Optional[float] = None
+        self._generation: Optional[int] = None
+        self._lock = asyncio.Lock()
+
+    async def summaries(self, generation: Optional[int] = None) -> List[CatalogSummary]:
+        """Return all summaries, reloading them if stale or of another generation."""
+        async with self._lock:
+            if (
+                self._loaded is None
+                or time.monotonic() - self._loaded > self.ttl
+                or (generation is not None and generation != self._generation)
+            ):
+                summaries = await fetch_catalog_summaries()
+                self._summaries = {s.identifier: s for s in summaries}
+                self._loaded = time.monotonic()
+                self._generation = generation
+        return list(self._summaries.values())
+
+    def invalidate(self) -> None:
+        """Reload the summaries when next asked for, e.g. after a write elsewhere."""
+        self._loaded = None
+
+    def get(self, identifier: str) -> Optional[CatalogSummary]:
+        """Return the summary of the catalog given by identifier, if it is known."""
+        return self._summaries.get(str(identifier))
+
+    def put(self, summary: CatalogSummary) -> None:
+        """Add or replace the summary of the created catalog."""
+        self._summaries[summary.identifier] = summary
+
+    def remove(self, identifier: str) -> None:
+        """Remove the summary of the deleted catalog."""
+        self._summaries.pop(str(identifier), None)
+
+
+CATALOG_REGISTRY = web.AppKey("catalog_registry", CatalogRegistry)
@@ -1,92 +1,218 @@
 """Repository module for service layer."""
 
+import asyncio
+from contextlib import nullcontext
+import hashlib
+import json
 import logging
 from os import environ as env
+from typing import Any, AsyncContextManager, Callable, Dict, List, Optional, Set, Tuple
+import uuid
 
 from aiohttp import ClientSession
-from datacatalogtordf import Catalog
+from datacatalogtordf import Catalog, DataService
 from dotenv import load_dotenv
-from oastodcat import OASDataService
-from rdflib.graph import Graph, Literal, URIRef
-from SPARQLWrapper import POST, SPARQLWrapper, TURTLE
+from rdflib.graph import Graph, URIRef
+from SPARQLWrapper import JSON, POST, SPARQLWrapper, TURTLE
 from SPARQLWrapper.SPARQLExceptions import SPARQLWrapperException
-import yaml
 
-from dataservice_publisher.exceptions.exceptions import RequestBodyError
+from dataservice_publisher.exceptions.exceptions import (
+    IdempotencyKeyError,
+    OASLoadError,
+    PublishConflictError,
+    RequestBodyError,
+)
+from dataservice_publisher.service.catalog_registry import (
+    CatalogSummary,
+    fetch_catalog_summary,
+    summarize,
+    summary_delete,
+    summary_published,
+    summary_update,
+    version_condition,
+)
+from dataservice_publisher.service.catalog_versions import (
+    Delta,
+    delta_between,
+    delta_update,
+    deltas_delete,
+)
+from dataservice_publisher.service.memory_accounting import annotate, measure
+from dataservice_publisher.service.oas_conversion import convert_apis
+from dataservice_publisher.service.oas_loader import (
+    fetch_spec_validator,
+    load_spec,
+    OAS_FETCH_CONCURRENCY,
+    SpecTiming,
+)
+from dataservice_publisher.service.shards import SHARDS, update_endpoint
+from dataservice_publisher.service.write_batcher import execute_update, WriteBatcher
 
 load_dotenv()
 DATASERVICE_PUBLISHER_URL = env.get("DATASERVICE_PUBLISHER_URL")
-DATASET = env.get("FUSEKI_DATASET_1", "ds")
 FUSEKI_PASSWORD = env.get("FUSEKI_PASSWORD")
-FUSEKI_HOST = env.get("FUSEKI_HOST", "http://fuseki")
-FUSEKI_PORT = int(env.get("FUSEKI_PORT", 8080))
+# How many times a publish reads and writes the catalog, when others change it meanwhile:
+PUBLISH_ATTEMPTS = int(env.get("PUBLISH_ATTEMPTS", 3))
 
+# Called with the timing of each api, when it has been converted:
+ProgressCallback = Callable[[SpecTiming], None]
+# Gives every fetch of an OpenAPI document its turn, see Limiter.turn:
+FetchTurn = Callable[[], AsyncContextManager[Any]]
 
-async def fetch_catalogs() -> Graph:
-    """Returns a list of Catalog objects."""
-    logging.debug("Fetch catalogs")
-    try:
-        # Find all catalogs from all named graph
-        # Find a specific catalog
-        query_endpoint = f"{FUSEKI_HOST}:{FUSEKI_PORT}/fuseki/{DATASET}"
 
-        querystring = """
-            PREFIX dcat: <http://www.w3.org/ns/dcat#>
-            PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
-            CONSTRUCT { ?s a dcat:Catalog .}
-            WHERE { GRAPH ?g { ?s a dcat:Catalog .} }
-        """
-        sparql = SPARQLWrapper(query_endpoint)
+def catalog_uri(id: Optional[str] = None) -> URIRef:
+    """Return the URI of the catalog given by id, or of the catalog collection."""
+    if id is None:
+        return URIRef(f"{DATASERVICE_PUBLISHER_URL}/catalogs")
+    return URIRef(f"{DATASERVICE_PUBLISHER_URL}/catalogs/{id}")
 
-        sparql.setQuery(querystring)
 
-        sparql.setReturnFormat(TURTLE)
-        sparql.setOnlyConneg(True)
-        data = sparql.queryAndConvert()
+def catalog_id(identifier: str) -> str:
+    """Return the id of the catalog, i.e. the last segment of its identifier."""
+    return str(identifier).rstrip("/").rsplit("/", 1)[-1]
 
-        return Graph().parse(data=data, format="turtle")  # type: ignore
-    except SPARQLWrapperException as e:
-        logging.exception("message")
-        # Logs the error appropriately.
-        raise e
 
+def catalog_etag(graph: Graph) -> str:
+    """Return an entity tag for the contents of the catalog graph."""
+    lines = sorted(graph.serialize(format="nt").splitlines())
+    return '"%s"' % hashlib.sha256("\n".join(lines).encode()).hexdigest()[:32]
+
+
+def validate_catalog(catalog: dict) -> None:
+    """Check that the request body has the keys needed to create the catalog."""
+    if not isinstance(catalog, dict):
+        raise RequestBodyError("TypeError when processing request body")
+    for key in ["identifier", "title", "description", "publisher", "apis"]:
+        if key not in catalog:
+            raise RequestBodyError("KeyError when processing request body")
+    if not isinstance(catalog["apis"], list):
+        raise RequestBodyError("TypeError when processing request body")
+    for api in catalog["apis"]:
+        if not isinstance(api, dict):
+            raise RequestBodyError("TypeError when processing request body")
+        if "url" not in api or "identifier" not in api:
+            raise RequestBodyError("KeyError when processing request body")
+
+
+def request_hash(catalog: dict) -> str:
+    """Return a digest of the request body, whatever the order of its keys."""
+    body = json.dumps(catalog, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def content_hash(request: str, validators: List[str]) -> Optional[str]:
+    """Return a digest of the request and the documents of its apis, if all are known."""
+    if not all(validators):
+        return None
+    return hashlib.sha256("\n".join([request, *validators]).encode()).hexdigest()
+
+
+async def unchanged_catalog(
+    catalog: dict,
+    idempotency_key: Optional[str] = None,
+    fetch_turn: FetchTurn = nullcontext,
+) -> Optional[Tuple[Graph, CatalogSummary]]:
+    """Return the stored catalog and its summary, if publishing it changes nothing."""
+    identifier = catalog["identifier"]
+    previous = await fetch_catalog_summary(identifier)
+    if previous is None:
+        return None
+    request = request_hash(catalog)
+    if idempotency_key and idempotency_key == previous.idempotency_key:
+        # A retry of the latest publish gets its result, whatever has changed since:
+        if request != previous.request_hash:
+            raise IdempotencyKeyError(
+                "The Idempotency-Key was used for another request body"
+            )
+    elif request != previous.request_hash or previous.content_hash is None:
+        return None
+    else:
+        semaphore = asyncio.Semaphore(OAS_FETCH_CONCURRENCY)
+        async with ClientSession() as session:
 
-async def _parse_user_input(catalog: dict) -> Graph:
+            async def _validator(url: str) -> str:
+                async with semaphore, fetch_turn():
+                    return await fetch_spec_validator(session, url)
+
+            try:
+                validators = await asyncio.gather(
+                    *[_validator(api["url"]) for api in catalog["apis"]]
+                )
+            except OASLoadError:
+                # Publishing the catalog reports the error, if it persists:
+                return None
+        if content_hash(request, list(validators)) != previous.content_hash:
+            return None
+    logging.info(
+        "Catalog %s is unchanged since version %s", identifier, previous.version
+    )
+    return await fetch_graph(URIRef(identifier)), previous
+
+
+async def _parse_user_input(
+    catalog: dict,
+    progress: Optional[ProgressCallback] = None,
+    fetch_turn: FetchTurn = nullcontext,
+) -> Tuple[Graph, List[str]]:
     g = Catalog()
     g.identifier = URIRef(catalog["identifier"])
     g.title = catalog["title"]
     g.description = catalog["description"]
     g.publisher = catalog["publisher"]
-    # TODO: consider doing the request in parallel
-    for api in catalog["apis"]:
-        logging.debug(f"""getting ${api["url"]}""")
-        async with ClientSession() as session:
-            async with session.get(api["url"]) as response:
-                logging.debug(f"""${api["url"]}: ${response.status}""")
-                if response.status == 200:
-                    api_spec = await response.text()
-                    oas = yaml.safe_load(api_spec)
-
-        oas_spec = OASDataService(api["url"], oas, api["identifier"])
-        if "conformsTo" in api:
-            oas_spec.conforms_to = api["conformsTo"]
-        if "publisher" in api:
-            oas_spec.publisher = api["publisher"]
-        #
-        # Add dataservices to catalog:
-        for dataservice in oas_spec.dataservices:
-            g.services.append(dataservice)
-
-    return g._to_graph()
-
-
-async def create_catalog(catalog: dict) -> Graph:
+
+    # Fetch the documents concurrently:
+    semaphore = asyncio.Semaphore(OAS_FETCH_CONCURRENCY)
+    async with ClientSession() as session:
+
+        async def _load(url: str) -> Tuple[Optional[dict], str]:
+            async with semaphore, fetch_turn():
+                oas, timing = await load_spec(session, url)
+            if progress:
+                progress(timing)
+            return oas, timing.validator
+
+        loaded = await asyncio.gather(*[_load(api["url"]) for api in catalog["apis"]])
+    # The apis whose documents were not found are left out:
+    apis = [
+        (api, oas)
+        for api, (oas, _) in zip(catalog["apis"], loaded, strict=True)
+        if oas is not None
+    ]
+
+    # Convert them in parallel, and add the resulting triples to the catalog:
+    conversions = await convert_apis(apis)
+    with measure("graph"):
+        for identifiers, _ in conversions:
+            for identifier in identifiers:
+                g.services.append(DataService(identifier))
+        _g = g._to_graph(include_services=False)
+        for _, triples in conversions:
+            for triple in triples:
+                _g.add(triple)
+    return _g, [validator for _, validator in loaded]
+
+
+async def create_catalog(
+    catalog: dict, progress: Optional[ProgressCallback] = None
+) -> Graph:
     """Create a graph based on catalog and persist to store."""
+    graph, _ = await publish_catalog(catalog, progress)
+    return graph
+
+
+async def publish_catalog(
+    catalog: dict,
+    progress: Optional[ProgressCallback] = None,
+    idempotency_key: Optional[str] = None,
+    fetch_turn: FetchTurn = nullcontext,
+    batcher: Optional[WriteBatcher] = None,
+) -> Tuple[Graph, CatalogSummary]:
+    """Create a graph based on catalog, persist it and return it and its summary."""
     # Use datacatalogtordf and oastodcat to create a graph and persist:
     _g = Graph()
     logging.info("creating and persisting graph from catalog")
     try:
-        _g = await _parse_user_input(catalog)
+        _g, validators = await _parse_user_input(catalog, progress, fetch_turn)
     except TypeError as e:
         logging.exception("message")
         # Logs the error appropriately.
@@ -96,61 +222,109 @@ async def create_catalog(catalog: dict) -> Graph:
         # Logs the error appropriately.
         raise RequestBodyError("KeyError when processing request body") from e
 
+    identifier = catalog["identifier"]
+    annotate(identifier, len(_g))
+    publication = uuid.uuid4().hex
     try:
-        update_endpoint = f"{FUSEKI_HOST}:{FUSEKI_PORT}/fuseki/{DATASET}/update"
-        sparql = SPARQLWrapper(update_endpoint)
-        sparql.setCredentials("admin", FUSEKI_PASSWORD)
-        sparql.setMethod(POST)
-        # Prepare query:
-        prefixes = ""
-        for ns in _g.namespaces():
-            prefixes += f"PREFIX {ns[0]}: <{ns[1]}>\n"
-        for s, p, o in _g:
-            if isinstance(o, Literal):
-                querystring = (
-                    prefixes
-                    + """
-                    INSERT DATA {GRAPH <%s> {<%s> <%s> "%s"@%s}}
-                    """
-                    % (
-                        URIRef(catalog["identifier"]),
-                        s,
-                        p,
-                        o,
-                        o.language,
-                    )
-                )
-            else:
-                querystring = (
-                    prefixes
-                    + """
-                    INSERT DATA {GRAPH <%s> {<%s> <%s> <%s>}}
-                    """
-                    % (
-                        URIRef(catalog["identifier"]),
-                        s,
-                        p,
-                        o,
-                    )
+        for attempt in range(1, PUBLISH_ATTEMPTS + 1):
+            summary, delta = await _write_version(
+                catalog, _g, validators, idempotency_key, publication, batcher
+            )
+            if await summary_published(identifier, publication):
+                logging.info(
+                    "Published version %s of %s: %s triples added, %s removed",
+                    summary.version,
+                    identifier,
+                    len(delta.added),
+                    len(delta.removed),
                 )
-
-            sparql.setQuery(querystring)
-            sparql.query()
-
-        return _g
+                return _g, summary
+            logging.warning(
+                "Version %s of %s was published by another publish, attempt %s of %s",
+                summary.version,
+                identifier,
+                attempt,
+                PUBLISH_ATTEMPTS,
+            )
     except SPARQLWrapperException as e:
         logging.exception("message")
         # Logs the error appropriately.
         raise e
+    raise PublishConflictError(
+        f"Catalog {identifier} is being changed by other publishes, try again later"
+    )
+
+
+async def _write_version(
+    catalog: dict,
+    graph: Graph,
+    validators: List[str],
+    idempotency_key: Optional[str],
+    publication: str,
+    batcher: Optional[WriteBatcher],
+) -> Tuple[CatalogSummary, Delta]:
+    """Write the graph as the next version of the catalog, unless another is first."""
+    identifier = catalog["identifier"]
+    previous = await fetch_catalog_summary(identifier)
+    old = await fetch_graph(URIRef(identifier)) if previous else Graph()
+    delta = delta_between(old, graph)
+
+    # Keep the registry of catalogs up to date:
+    summary = summarize(identifier, graph)
+    summary.version = previous.version + 1 if previous else 1
+    summary.request_hash = request_hash(catalog)
+    summary.content_hash = content_hash(summary.request_hash, validators)
+    summary.idempotency_key = idempotency_key
+    summary.publication = publication
+    with measure("serialized"):
+        summary.etag = catalog_etag(graph)
+
+        # Replace the graph, keep the delta and replace the summary in a single
+        # update, applied only if no other publish has written a version since
+        # the previous one was read. The summary goes last, as it bumps the version:
+        condition = version_condition(identifier, summary.version - 1)
+        update = " ;\n".join(
+            [
+                graph_replace(URIRef(identifier), graph, condition),
+                delta_update(identifier, summary.version, delta, condition),
+                summary_update(summary, condition),
+            ]
+        )
+    # Returns once Fuseki has committed the update, batched with others or not:
+    if batcher is None:
+        await execute_update(SHARDS.endpoint(identifier), update)
+    else:
+        await batcher.execute(SHARDS.endpoint(identifier), update, identifier)
+    return summary, delta
+
+
+def graph_replace(context: URIRef, graph: Graph, condition: str = "") -> str:
+    """Return the SPARQL Update replacing the named graph, if the condition holds."""
+    return """
+        DELETE { GRAPH <%s> { ?s ?p ?o } } WHERE { %s GRAPH <%s> { ?s ?p ?o } } ;
+        INSERT { GRAPH <%s> { %s } } WHERE { %s }
+    """ % (
+        context,
+        condition,
+        context,
+        context,
+        graph.serialize(format="nt"),
+        condition,
+    )
 
 
 async def get_catalog_by_id(id: str) -> Graph:
     """Returns a specific catalog objects identified by id."""
-    logging.debug(f"Get catalog by id: {id}")
+    logging.debug("Get catalog by id: %s", id)
+    graph = await fetch_graph(URIRef(f"{DATASERVICE_PUBLISHER_URL}/catalogs/{id}"))
+    annotate(id, len(graph))
+    return graph
+
+
+async def fetch_graph(context: URIRef, query_endpoint: Optional[str] = None) -> Graph:
+    """Returns the contents of the named graph, from the dataset of the catalog."""
     try:
-        # Find a specific catalog
-        context = URIRef(f"{DATASERVICE_PUBLISHER_URL}/catalogs/{id}")
-        query_endpoint = f"{FUSEKI_HOST}:{FUSEKI_PORT}/fuseki/{DATASET}"
+        query_endpoint = query_endpoint or SHARDS.endpoint(context)
 
         querystring = """
             CONSTRUCT { ?s ?p ?o }
@@ -163,41 +337,111 @@ async def get_catalog_by_id(id: str) -> Graph:
         sparql = SPARQLWrapper(query_endpoint)
 
         sparql.setQuery(querystring)
-        # logging.debug(f"querystring: {querystring}")
+        # logging.debug("querystring: %s", querystring)
 
         sparql.setReturnFormat(TURTLE)
         sparql.setOnlyConneg(True)
-        data = sparql.queryAndConvert()
-        # logging.debug(f"data: {data!r}")
+        data = await asyncio.to_thread(sparql.queryAndConvert)
+        # logging.debug("data: %r", data)
+
+        with measure("graph"):
+            return Graph().parse(data=data, format="turtle")  # type: ignore
+    except SPARQLWrapperException as e:
+        logging.exception("message")
+        # Logs the error appropriately.
+        raise e
+
+
+async def catalog_exists(id: str) -> bool:
+    """Return true if the graph of the catalog given by id has any triples."""
+    logging.debug("Ask if catalog exists: %s", id)
+    try:
+        sparql = SPARQLWrapper(SHARDS.endpoint(id))
+        sparql.setQuery("ASK { GRAPH <%s> { ?s ?p ?o } }" % (catalog_uri(id),))
+        sparql.setReturnFormat(JSON)
+        result = await asyncio.to_thread(sparql.queryAndConvert)
+        return bool(result["boolean"])  # type: ignore
+    except SPARQLWrapperException as e:
+        logging.exception("message")
+        # Logs the error appropriately.
+        raise e
+
+
+async def existing_catalogs(ids: List[str]) -> Set[str]:
+    """Return the ids of the catalogs whose graphs have any triples."""
+    if not ids:
+        return set()
+    try:
+        contexts = {str(catalog_uri(id)): id for id in ids}
+
+        async def _existing(query_endpoint: str, ids: List[str]) -> Set[str]:
+            sparql = SPARQLWrapper(query_endpoint)
+            sparql.setQuery(
+                """
+                SELECT ?g
+                WHERE {
+                    VALUES ?g { %s }
+                    FILTER EXISTS { GRAPH ?g { ?s ?p ?o } }
+                }
+                """
+                % " ".join(f"<{catalog_uri(id)}>" for id in ids)
+            )
+            sparql.setReturnFormat(JSON)
+            result = await asyncio.to_thread(sparql.queryAndConvert)
+            bindings: List[Dict[str, Any]] = result["results"]["bindings"]  # type: ignore
+            return {
+                contexts[b["g"]["value"]]
+                for b in bindings
+                if b["g"]["value"] in contexts
+            }
 
-        return Graph().parse(data=data, format="turtle")  # type: ignore
+        # Every dataset is asked about its own catalogs, all at once:
+        existing = await asyncio.gather(
+            *[_existing(e, ids) for e, ids in SHARDS.group(ids).items()]
+        )
+        return set().union(*existing)
     except SPARQLWrapperException as e:
         logging.exception("message")
         # Logs the error appropriately.
         raise e
 
 
+def catalog_delete(context: URIRef) -> str:
+    """Return the SPARQL Update removing the catalog, its summary and its deltas."""
+    return " ;\n".join(
+        [
+            "DROP SILENT GRAPH <%s>" % (URIRef(context),),
+            summary_delete(context),
+            deltas_delete(context),
+        ]
+    )
+
+
 async def delete_catalog(id: str) -> bool:
     """Delete the graph given by id and return true if successful."""
+    return await delete_catalogs([id])
+
+
+async def delete_catalogs(ids: List[str]) -> bool:
+    """Delete the graphs given by ids, in one update per dataset, true if successful."""
     try:
-        context = URIRef(f"{DATASERVICE_PUBLISHER_URL}/catalogs/{id}")
-        update_endpoint = f"{FUSEKI_HOST}:{FUSEKI_PORT}/fuseki/{DATASET}/update"
-        sparql = SPARQLWrapper(update_endpoint)
-        sparql.setCredentials("admin", FUSEKI_PASSWORD)
-        sparql.setMethod(POST)
-        # Prepare query:
-        querystring = """
-            DROP GRAPH <%s>
-        """ % (
-            URIRef(context),
-        )
 
-        sparql.setQuery(querystring)
-        result = sparql.query()
-        if result.response.status == 200:
-            return True
+        async def _delete(query_endpoint: str, ids: List[str]) -> bool:
+            sparql = SPARQLWrapper(update_endpoint(query_endpoint))
+            sparql.setCredentials("admin", FUSEKI_PASSWORD)
+            sparql.setMethod(POST)
+            # Prepare query:
+            querystring = " ;\n".join(catalog_delete(catalog_uri(id)) for id in ids)
+
+            sparql.setQuery(querystring)
+            result = await asyncio.to_thread(sparql.query)
+            return result.response.status == 200
+
+        deleted = await asyncio.gather(
+            *[_delete(e, ids) for e, ids in SHARDS.group(ids).items()]
+        )
+        return all(deleted)
     except SPARQLWrapperException as e:
         logging.exception("message")
         # Logs the error appropriately.
         raise e
-    return False
@@ -0,0 +1,222 @@
+"""Module for snapshots of catalogs on disk, served when the backend is unavailable."""
+
+import asyncio
+import glob
+import hashlib
+import logging
+import os
+from os import environ as env
+import time
+from typing import Any, Awaitable, Callable, Optional, Set, TypeVar
+
+from aiohttp import web
+from dotenv import load_dotenv
+from rdflib.graph import Graph
+from SPARQLWrapper.SPARQLExceptions import EndPointInternalError
+
+load_dotenv()
+# The directory of the snapshots, empty for no snapshots:
+SNAPSHOT_DIR = env.get("SNAPSHOT_DIR", "")
+# A loaded catalog replaces its snapshot if that is older than these seconds:
+SNAPSHOT_REFRESH_INTERVAL = float(env.get("SNAPSHOT_REFRESH_INTERVAL", 10))
+# The consecutive backend failures opening the circuit, and the seconds it stays open:
+CIRCUIT_FAILURE_THRESHOLD = int(env.get("CIRCUIT_FAILURE_THRESHOLD", 3))
+CIRCUIT_OPEN_SECONDS = float(env.get("CIRCUIT_OPEN_SECONDS", 30))
+
+# The errors of an unavailable backend: refused or reset connections, timeouts and
+# 5xx responses, but not the errors of a bad query or of missing credentials:
+BACKEND_ERRORS = (EndPointInternalError, OSError)
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(Exception):
+    """Raised when the backend is not called, as it has been failing."""
+
+
+# The errors of reads that may be answered from a snapshot:
+UNAVAILABLE_ERRORS = (CircuitOpenError, *BACKEND_ERRORS)
+
+
+class Circuit:
+    """Circuit breaker, open for a while after consecutive backend failures."""
+
+    def __init__(
+        self,
+        failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        open_seconds: float = CIRCUIT_OPEN_SECONDS,
+    ) -> None:
+        """Inits the circuit, closed."""
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.failures = 0
+        self._opened_at: Optional[float] = None
+
+    @property
+    def open(self) -> bool:
+        """Return true if the backend is not to be called now."""
+        if self._opened_at is None:
+            return False
+        # When the time is up, calls are let through to try the backend again:
+        return time.monotonic() < self._opened_at + self.open_seconds
+
+    def succeeded(self) -> None:
+        """Close the circuit."""
+        self.failures = 0
+        self._opened_at = None
+
+    def failed(self) -> None:
+        """Count a failure, opening the circuit at the threshold."""
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            if not self.open:
+                logging.warning("Opening the circuit after %s failures", self.failures)
+            self._opened_at = time.monotonic()
+
+
+class CatalogSnapshots:
+    """The last known graphs of catalogs, as N-Triples files shared by the workers.
+
+    A snapshot is named by the path of its resource, and is replaced by every
+    publish of the catalog and, at most every `refresh_interval` seconds, by
+    every load of it. The serializations of a snapshot are made when first
+    served, and kept until the snapshot is replaced. Snapshots are serialized
+    and written in a thread, in the order they were asked for, without
+    keeping the caller waiting.
+    """
+
+    def __init__(
+        self,
+        directory: str = SNAPSHOT_DIR,
+        circuit: Optional[Circuit] = None,
+        refresh_interval: float = SNAPSHOT_REFRESH_INTERVAL,
+    ) -> None:
+        """Inits the snapshots, none are kept if directory is empty."""
+        self.directory = directory
+        self.circuit = circuit or Circuit()
+        self.refresh_interval = refresh_interval
+        self._writing: Set[asyncio.Task] = set()
+        self._write_lock = asyncio.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    async def call(self, load: Callable[[], Awaitable[T]]) -> T:
+        """Load from the backend through the circuit, raising CircuitOpenError if open."""
+        if self.circuit.open:
+            raise CircuitOpenError("The backend is unavailable")
+        try:
+            result = await load()
+        except BACKEND_ERRORS:
+            self.circuit.failed()
+            raise
+        self.circuit.succeeded()
+        return result
+
+    def write(self, name: str, graph: Graph) -> None:
+        """Replace the snapshot with the graph, without waiting for it to be written."""
+        self._soon(self._write_graph, name, graph)
+
+    def refresh(self, name: str, graph: Graph) -> None:
+        """Replace the snapshot with the loaded graph, unless it was just written."""
+        self._soon(self._refresh_graph, name, graph)
+
+    def remove(self, name: str) -> None:
+        """Remove the snapshot and its serializations, without waiting for it."""
+        self._soon(self._remove_graph, name)
+
+    async def flush(self) -> None:
+        """Wait until the snapshots asked for have been written."""
+        if self._writing:
+            await asyncio.gather(*self._writing, return_exceptions=True)
+
+    def age(self, name: str) -> int:
+        """Return the seconds since the snapshot was written."""
+        return max(0, int(time.time() - os.stat(self._path(name, "nt")).st_mtime))
+
+    async def variant(
+        self, name: str, key: str, serialize: Callable[[Graph], bytes]
+    ) -> Optional[str]:
+        """Return the path of the snapshot serialized as the variant, or None."""
+        if not self.directory:
+            return None
+        # Served from the snapshot that was last asked for:
+        await self.flush()
+        path = self._path(name, f"{_digest(key)}.variant")
+        if os.path.exists(path):
+            return path
+        nt_path = self._path(name, "nt")
+
+        def _serialize_variant() -> bool:
+            if not os.path.exists(nt_path):
+                return False
+            self._write(path, serialize(Graph().parse(nt_path, format="nt")))
+            return True
+
+        # Not while the snapshot is replaced, which drops its serializations:
+        async with self._write_lock:
+            if not await asyncio.to_thread(_serialize_variant):
+                return None
+        return path
+
+    def _soon(self, write: Callable[..., None], *args: Any) -> None:
+        if not self.directory:
+            return
+
+        async def _run() -> None:
+            async with self._write_lock:
+                await asyncio.to_thread(write, *args)
+
+        task = asyncio.create_task(_run())
+        self._writing.add(task)
+        task.add_done_callback(self._written)
+
+    def _written(self, task: asyncio.Task) -> None:
+        self._writing.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logging.error("Writing a snapshot failed: %s", task.exception())
+
+    def _write_graph(self, name: str, graph: Graph) -> None:
+        self._write(self._path(name, "nt"), graph.serialize(format="nt").encode())
+        for path in glob.glob(self._path(name, "*.variant")):
+            _remove(path)
+
+    def _refresh_graph(self, name: str, graph: Graph) -> None:
+        try:
+            age = time.time() - os.stat(self._path(name, "nt")).st_mtime
+        except FileNotFoundError:
+            age = None
+        if age is None or age >= self.refresh_interval:
+            self._write_graph(name, graph)
+
+    def _remove_graph(self, name: str) -> None:
+        for path in glob.glob(self._path(name, "*")):
+            _remove(path)
+
+    def _path(self, name: str, suffix: str) -> str:
+        return os.path.join(self.directory, f"{_digest(name)}.{suffix}")
+
+    def _write(self, path: str, data: bytes) -> None:
+        # Write to a temporary file first, as several workers share the directory:
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+
+
+def _digest(text: str) -> str:
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+CATALOG_SNAPSHOTS = web.AppKey("catalog_snapshots", CatalogSnapshots)
+
+
+async def flush_snapshots(app: web.Application) -> None:
+    """Write the snapshots asked for before the worker stops."""
+    await app[CATALOG_SNAPSHOTS].flush()
@@ -0,0 +1,181 @@
+"""Module for the triple level changes between versions of catalogs."""
+
+import asyncio
+from dataclasses import dataclass, field
+import logging
+from os import environ as env
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+from rdflib.compare import to_canonical_graph
+from rdflib.graph import Graph, Literal, URIRef
+from SPARQLWrapper import JSON, SPARQLWrapper
+from SPARQLWrapper.SPARQLExceptions import SPARQLWrapperException
+
+from dataservice_publisher.service.catalog_registry import DSP
+from dataservice_publisher.service.shards import SHARDS
+
+load_dotenv()
+CATALOG_VERSIONS_RETAINED = int(env.get("CATALOG_VERSIONS_RETAINED", 10))
+
+DELTAS_GRAPH = URIRef("urn:dataservice-publisher:deltas")
+RDF_PATCH_CONTENT_TYPE = "application/rdf-patch"
+
+# A triple in the N-Triples syntax, without the closing dot:
+Triple = str
+_NT_ESCAPES = str.maketrans({"\\": "\\\\", "\n": "\\n", '"': '\\"', "\r": "\\r"})
+
+
+@dataclass
+class Delta:
+    """The triples added to and removed from a catalog graph."""
+
+    added: Set[Triple] = field(default_factory=set)
+    removed: Set[Triple] = field(default_factory=set)
+
+    def then(self, later: "Delta") -> "Delta":
+        """Return the net delta of this delta followed by the later one."""
+        return Delta(
+            (self.added - later.removed) | (later.added - self.removed),
+            (self.removed - later.added) | (later.removed - self.added),
+        )
+
+    def to_patch(self) -> str:
+        """Return the delta as the rows of an RDF Patch, deletes first."""
+        rows = [f"D {triple} ." for triple in sorted(self.removed)]
+        rows += [f"A {triple} ." for triple in sorted(self.added)]
+        return "".join(f"{row}\n" for row in rows)
+
+    def __bool__(self) -> bool:
+        """Return true if the delta changes anything."""
+        return bool(self.added or self.removed)
+
+
+def delta_between(old: Graph, new: Graph) -> Delta:
+    """Return the delta turning the old graph into the new one."""
+    # Blank nodes are labelled by their contents, so unchanged ones compare equal:
+    old_triples = {_n3(triple) for triple in to_canonical_graph(old)}
+    new_triples = {_n3(triple) for triple in to_canonical_graph(new)}
+    return Delta(new_triples - old_triples, old_triples - new_triples)
+
+
+def parse_patch(patch: str) -> Delta:
+    """Read the delta from the rows of an RDF Patch."""
+    delta = Delta()
+    for row in patch.splitlines():
+        if row[:2] in ("A ", "D ") and row.endswith(" ."):
+            triple = row[2:-2]
+            (delta.added if row[0] == "A" else delta.removed).add(triple)
+    return delta
+
+
+def delta_update(
+    identifier: str, version: int, delta: Delta, condition: str = ""
+) -> str:
+    """Return the SPARQL Update keeping the delta if the condition holds, trimming old."""
+    return """
+        INSERT { GRAPH <%s> { <%s> <%s> <%s> ; <%s> %s ; <%s> %s } } WHERE { %s } ;
+        DELETE { GRAPH <%s> { ?delta ?p ?o } }
+        WHERE {
+            GRAPH <%s> { ?delta <%s> <%s> ; <%s> ?version ; ?p ?o }
+            FILTER (?version <= %s)
+        }
+    """ % (
+        DELTAS_GRAPH,
+        _delta_uri(identifier, version),
+        DSP.catalog,
+        URIRef(identifier),
+        DSP.version,
+        Literal(version).n3(),
+        DSP.patch,
+        Literal(delta.to_patch()).n3(),
+        condition,
+        DELTAS_GRAPH,
+        DELTAS_GRAPH,
+        DSP.catalog,
+        URIRef(identifier),
+        DSP.version,
+        version - CATALOG_VERSIONS_RETAINED,
+    )
+
+
+def deltas_delete(identifier: str) -> str:
+    """Return the SPARQL Update forgetting all deltas of the catalog."""
+    return """
+        DELETE { GRAPH <%s> { ?delta ?p ?o } }
+        WHERE { GRAPH <%s> { ?delta <%s> <%s> ; ?p ?o } }
+    """ % (
+        DELTAS_GRAPH,
+        DELTAS_GRAPH,
+        DSP.catalog,
+        URIRef(identifier),
+    )
+
+
+async def fetch_deltas(identifier: str, since: int) -> List[Tuple[int, Delta]]:
+    """Return the kept deltas of the versions after since, oldest first."""
+    logging.debug("Fetch deltas of %s since version %s", identifier, since)
+    try:
+        sparql = SPARQLWrapper(SHARDS.endpoint(identifier))
+        sparql.setQuery(
+            """
+            SELECT ?version ?patch
+            WHERE {
+                GRAPH <%s> { ?delta <%s> <%s> ; <%s> ?version ; <%s> ?patch }
+                FILTER (?version > %s)
+            }
+            ORDER BY ?version
+            """
+            % (
+                DELTAS_GRAPH,
+                DSP.catalog,
+                URIRef(identifier),
+                DSP.version,
+                DSP.patch,
+                int(since),
+            )
+        )
+        sparql.setReturnFormat(JSON)
+        result = await asyncio.to_thread(sparql.queryAndConvert)
+        bindings: List[Dict[str, Any]] = result["results"]["bindings"]  # type: ignore
+        return [
+            (int(b["version"]["value"]), parse_patch(b["patch"]["value"]))
+            for b in bindings
+        ]
+    except SPARQLWrapperException as e:
+        logging.exception("message")
+        # Logs the error appropriately.
+        raise e
+
+
+def squash(deltas: List[Tuple[int, Delta]], since: int) -> Optional[Delta]:
+    """Return the net delta of consecutive versions after since, or None if any is missing."""
+    net = Delta()
+    expected = since + 1
+    for version, delta in deltas:
+        if version != expected:
+            return None
+        net = net.then(delta)
+        expected += 1
+    return net
+
+
+def _delta_uri(identifier: str, version: int) -> URIRef:
+    return URIRef(f"{identifier}#version-{version}")
+
+
+def nt_term(term: Any) -> str:
+    """Return the term in the N-Triples syntax."""
+    if isinstance(term, Literal):
+        # Node.n3() writes a literal with line breaks as a Turtle long string:
+        quoted = '"%s"' % str(term).translate(_NT_ESCAPES)
+        if term.language:
+            return f"{quoted}@{term.language}"
+        if term.datatype:
+            return f"{quoted}^^<{term.datatype}>"
+        return quoted
+    return term.n3()
+
+
+def _n3(triple: Tuple[Any, Any, Any]) -> Triple:
+    return " ".join(nt_term(term) for term in triple)
@@ -0,0 +1,252 @@
+"""Module for the feed of changes to catalogs, shared by the workers."""
+
+import asyncio
+from dataclasses import asdict, dataclass
+import json
+import logging
+import os
+from os import environ as env
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Callable, List, Optional, Set
+
+from aiohttp import web
+from dotenv import load_dotenv
+
+load_dotenv()
+CHANGE_LOG_FILE = env.get(
+    "CHANGE_LOG_FILE",
+    os.path.join(tempfile.gettempdir(), "dataservice-publisher-changes.db"),
+)
+CHANGE_LOG_RETAINED = int(env.get("CHANGE_LOG_RETAINED", 10000))
+CHANGE_FEED_POLL_INTERVAL = float(env.get("CHANGE_FEED_POLL_INTERVAL", 0.5))
+CHANGE_FEED_QUEUE_SIZE = int(env.get("CHANGE_FEED_QUEUE_SIZE", 1000))
+REPLAY_PAGE_SIZE = 1000
+
+
+@dataclass
+class ChangeEvent:
+    """A catalog that has been created, updated or deleted."""
+
+    id: int
+    type: str
+    catalog: str
+    version: int
+    etag: Optional[str]
+    time: float
+
+    def to_sse(self) -> bytes:
+        """Return the event in the text/event-stream format."""
+        data = {k: v for k, v in asdict(self).items() if k not in ("id", "type")}
+        return (
+            f"id: {self.id}\nevent: {self.type}\ndata: {json.dumps(data)}\n\n".encode()
+        )
+
+
+class ChangeLog:
+    """Log of change events, in an SQLite file shared by the workers of a host.
+
+    Event ids are never reused, and only the `retained` latest events are kept.
+    """
+
+    def __init__(
+        self, filename: str = CHANGE_LOG_FILE, retained: int = CHANGE_LOG_RETAINED
+    ) -> None:
+        """Inits the log."""
+        self.filename = filename
+        self.retained = retained
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def append(
+        self, type: str, catalog: str, version: int, etag: Optional[str] = None
+    ) -> ChangeEvent:
+        """Append an event to the log and return it."""
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                cursor = connection.execute(
+                    "INSERT INTO changes (type, catalog, version, etag, time) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (type, catalog, version, etag, now),
+                )
+                id = cursor.lastrowid or 0
+                connection.execute(
+                    "DELETE FROM changes WHERE id <= ?", (id - self.retained,)
+                )
+        return ChangeEvent(id, type, catalog, version, etag, now)
+
+    def since(self, id: int, limit: int = REPLAY_PAGE_SIZE) -> List[ChangeEvent]:
+        """Return the events after the event given by id, oldest first."""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT id, type, catalog, version, etag, time FROM changes "
+                "WHERE id > ? ORDER BY id LIMIT ?",
+                (id, limit),
+            )
+            return [ChangeEvent(*row) for row in rows]
+
+    def first_id(self) -> Optional[int]:
+        """Return the id of the oldest event kept, if there is one."""
+        with self._lock:
+            row = self._connect().execute("SELECT MIN(id) FROM changes").fetchone()
+        return row[0]
+
+    def last_id(self) -> int:
+        """Return the id of the latest event, or 0 if there is none."""
+        with self._lock:
+            row = self._connect().execute("SELECT MAX(id) FROM changes").fetchone()
+        return row[0] or 0
+
+    def close(self) -> None:
+        """Close the connection to the log file."""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            connection = sqlite3.connect(
+                self.filename, timeout=10, check_same_thread=False
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS changes ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, type TEXT, catalog TEXT, "
+                "version INTEGER, etag TEXT, time REAL)"
+            )
+            self._connection = connection
+        return self._connection
+
+
+class ChangeFeed:
+    """Fans out the events in the change log to the subscribers of this worker.
+
+    Every worker polls the log for events appended by any worker, so
+    subscribers get the same events whichever worker they are connected to.
+    The listeners are called with every event too, e.g. to drop state the
+    worker keeps about the catalog.
+    """
+
+    def __init__(
+        self,
+        log: Optional[ChangeLog] = None,
+        poll_interval: float = CHANGE_FEED_POLL_INTERVAL,
+    ) -> None:
+        """Inits the feed."""
+        self.log = log or ChangeLog()
+        self.poll_interval = poll_interval
+        self.last_id = 0
+        self._subscribers: Set[asyncio.Queue] = set()
+        self.listeners: List[Callable[[ChangeEvent], None]] = []
+        self._task: Optional[asyncio.Task] = None
+        self._appending: Set[asyncio.Task] = set()
+        self._append_lock = asyncio.Lock()
+
+    async def start(self) -> None:
+        """Start polling the log for new events."""
+        self.last_id = await asyncio.to_thread(self.log.last_id)
+        self._task = asyncio.create_task(self._poll())
+
+    async def stop(self) -> None:
+        """Stop polling, and end the streams of the subscribers."""
+        if self._appending:
+            await asyncio.gather(*self._appending, return_exceptions=True)
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for queue in self._subscribers:
+            _end(queue)
+        self._subscribers.clear()
+        await asyncio.to_thread(self.log.close)
+
+    def publish(
+        self, type: str, catalog: str, version: int, etag: Optional[str] = None
+    ) -> None:
+        """Append an event to the log, without waiting for it to be written."""
+
+        async def _append() -> None:
+            async with self._append_lock:
+                await asyncio.to_thread(self.log.append, type, catalog, version, etag)
+
+        task = asyncio.create_task(_append())
+        self._appending.add(task)
+        task.add_done_callback(self._appended)
+
+    def subscribe(self) -> asyncio.Queue:
+        """Return a queue getting every new event, and None when the feed stops."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=CHANGE_FEED_QUEUE_SIZE)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        """Stop sending events to the queue."""
+        self._subscribers.discard(queue)
+
+    async def replay(self, id: int) -> List[ChangeEvent]:
+        """Return the events after the event given by id, oldest first."""
+        return await asyncio.to_thread(self.log.since, id)
+
+    async def first_id(self) -> Optional[int]:
+        """Return the id of the oldest event that can be replayed."""
+        return await asyncio.to_thread(self.log.first_id)
+
+    async def _poll(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                events = await asyncio.to_thread(self.log.since, self.last_id)
+            except sqlite3.Error:
+                logging.exception("Reading the change log failed")
+                continue
+            for event in events:
+                self.last_id = event.id
+                self._dispatch(event)
+
+    def _dispatch(self, event: ChangeEvent) -> None:
+        for listener in self.listeners:
+            try:
+                listener(event)
+            except Exception:
+                logging.exception("Change feed listener failed")
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # The subscriber is too slow, it can resume from its last id:
+                logging.warning("Dropping slow change feed subscriber")
+                self._subscribers.discard(queue)
+                _end(queue)
+
+    def _appended(self, task: asyncio.Task) -> None:
+        self._appending.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logging.error("Appending to the change log failed: %s", task.exception())
+
+
+def _end(queue: asyncio.Queue) -> None:
+    """Tell the subscriber of the queue that there will be no more events."""
+    while True:
+        try:
+            queue.put_nowait(None)
+            return
+        except asyncio.QueueFull:
+            queue.get_nowait()
+
+
+CHANGE_FEED = web.AppKey("change_feed", ChangeFeed)
+
+
+async def start_change_feed(app: web.Application) -> None:
+    """Start the change feed."""
+    await app[CHANGE_FEED].start()
+
+
+async def stop_change_feed(app: web.Application) -> None:
+    """Stop the change feed, ending the open event streams."""
+    await app[CHANGE_FEED].stop()
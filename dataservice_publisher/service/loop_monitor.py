@@ -0,0 +1,151 @@
+"""Module for monitoring the lag of the event loop, and finding what blocks it."""
+
+import asyncio
+import logging
+from os import environ as env
+import sys
+import threading
+import time
+import traceback
+from typing import Iterable, List, Optional
+
+from aiohttp import web
+from dotenv import load_dotenv
+
+from dataservice_publisher.service.metrics import MetricsRegistry, Sample
+
+load_dotenv()
+# The seconds between measurements of the lag:
+LOOP_LAG_INTERVAL = float(env.get("LOOP_LAG_INTERVAL", 0.5))
+# The seconds the loop may be blocked before the blocking code is logged, 0 for never:
+SLOW_CALLBACK_THRESHOLD = float(env.get("SLOW_CALLBACK_THRESHOLD", 0))
+
+LAG_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PACKAGE = "dataservice_publisher"
+
+
+class LoopMonitor:
+    """Measures how late a periodic timer fires, i.e. how long callbacks block the loop.
+
+    Given a slow callback threshold, a thread watches the timer, and logs the
+    stack of the event loop's thread when the timer is late by more than that.
+    """
+
+    def __init__(
+        self,
+        interval: float = LOOP_LAG_INTERVAL,
+        slow_callback_threshold: float = SLOW_CALLBACK_THRESHOLD,
+    ) -> None:
+        """Inits the monitor."""
+        self.slow_callback_threshold = slow_callback_threshold
+        # The timer is due often enough for the watcher to see short stalls:
+        self.interval = min(interval, slow_callback_threshold or interval)
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self.lag_sum = 0.0
+        self.lag_counts: List[int] = [0] * len(LAG_BUCKETS)
+        self.measurements = 0
+        self.blocked = 0
+        self._due = time.monotonic()
+        self._loop_thread: Optional[int] = None
+        self._stopped = threading.Event()
+
+    async def run(self) -> None:
+        """Measure the lag every interval, until cancelled."""
+        self._loop_thread = threading.get_ident()
+        if self.slow_callback_threshold > 0:
+            threading.Thread(
+                target=self._watch, name="loop-monitor", daemon=True
+            ).start()
+        try:
+            while True:
+                self._due = time.monotonic() + self.interval
+                await asyncio.sleep(self.interval)
+                self.observe(max(0.0, time.monotonic() - self._due))
+        finally:
+            self._stopped.set()
+
+    def observe(self, lag: float) -> None:
+        """Record a measurement of the lag."""
+        self.lag = lag
+        self.max_lag = max(self.max_lag, lag)
+        self.lag_sum += lag
+        self.measurements += 1
+        for i, bound in enumerate(LAG_BUCKETS):
+            if lag <= bound:
+                self.lag_counts[i] += 1
+
+    def _watch(self) -> None:
+        """Log the stack of the loop's thread once per stall beyond the threshold."""
+        reported_due = None
+        while not self._stopped.wait(self.slow_callback_threshold / 2):
+            due = self._due
+            late = time.monotonic() - due
+            if late > self.slow_callback_threshold and due != reported_due:
+                reported_due = due
+                self.blocked += 1
+                self._report(late)
+
+    def _report(self, late: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread or 0)
+        if frame is None:
+            return
+        stack = traceback.extract_stack(frame)
+        # The innermost frame of our own code is the likely culprit:
+        culprit = next((f for f in reversed(stack) if PACKAGE in f.filename), stack[-1])
+        logging.warning(
+            "Event loop blocked for more than %.3fs in %s (%s:%s), at:\n%s",
+            late,
+            culprit.name,
+            culprit.filename,
+            culprit.lineno,
+            "".join(traceback.format_list(stack)),
+        )
+
+    def register(self, metrics: MetricsRegistry) -> None:
+        """Expose the event loop metrics."""
+        metrics.describe(
+            "event_loop_lag_seconds", "gauge", "Latest lag of the event loop."
+        )
+        metrics.describe(
+            "event_loop_lag_max_seconds", "gauge", "Largest lag of the event loop."
+        )
+        metrics.describe(
+            "event_loop_lag_observed_seconds",
+            "histogram",
+            "Measurements of the lag of the event loop.",
+        )
+        metrics.describe(
+            "event_loop_blocked_total",
+            "counter",
+            "Times the event loop was blocked beyond the slow callback threshold.",
+        )
+        metrics.add_collector(self.samples)
+
+    def samples(self) -> Iterable[Sample]:
+        """Return the samples of the event loop metrics."""
+        yield "event_loop_lag_seconds", {}, self.lag
+        yield "event_loop_lag_max_seconds", {}, self.max_lag
+        bucket = "event_loop_lag_observed_seconds_bucket"
+        for bound, count in zip(LAG_BUCKETS, self.lag_counts, strict=True):
+            yield bucket, {"le": str(bound)}, count
+        yield bucket, {"le": "+Inf"}, self.measurements
+        yield "event_loop_lag_observed_seconds_count", {}, self.measurements
+        yield "event_loop_lag_observed_seconds_sum", {}, self.lag_sum
+        yield "event_loop_blocked_total", {}, self.blocked
+
+
+LOOP_MONITOR = web.AppKey("loop_monitor", LoopMonitor)
+LOOP_MONITOR_TASK = web.AppKey("loop_monitor_task", asyncio.Task)
+
+
+async def start_loop_monitor(app: web.Application) -> None:
+    """Start monitoring the event loop in the background."""
+    app[LOOP_MONITOR_TASK] = asyncio.create_task(app[LOOP_MONITOR].run())
+
+
+async def stop_loop_monitor(app: web.Application) -> None:
+    """Stop monitoring the event loop."""
+    task: Optional[asyncio.Task] = app.get(LOOP_MONITOR_TASK)
+    if task is not None:
+        task.cancel()
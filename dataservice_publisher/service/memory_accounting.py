@@ -0,0 +1,227 @@
+"""Module for accounting the memory allocated by requests, and by their stages."""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+import logging
+from os import environ as env
+import threading
+import tracemalloc
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+
+from aiohttp import web
+from dotenv import load_dotenv
+
+from dataservice_publisher.service.metrics import MetricsRegistry, Sample
+
+load_dotenv()
+# Tracing allocations slows every allocation down, so it is only done when asked for:
+MEMORY_ACCOUNTING = env.get("MEMORY_ACCOUNTING", "false").lower() == "true"
+
+# The stages of catalog operations, in the order they hold memory:
+STAGES = ("spec_text", "parsed_spec", "graph", "serialized")
+MEMORY_BUCKETS = (1e6, 4e6, 16e6, 64e6, 256e6, 1e9, 4e9)
+
+_lock = threading.Lock()
+_windows: Set["_Window"] = set()
+
+
+class _Window:
+    """The peak of the traced memory since it was opened, above what was then traced.
+
+    tracemalloc keeps a single peak for the process. Before it is reset, every
+    open window takes it into account, so windows overlapping in time (e.g. of
+    concurrent requests) are each charged with the allocations of the others.
+    """
+
+    def __init__(self) -> None:
+        with _lock:
+            self.start = tracemalloc.get_traced_memory()[0]
+            self.peak = 0
+            _windows.add(self)
+
+    def close(self) -> int:
+        with _lock:
+            self._observe()
+            _windows.discard(self)
+        return self.peak
+
+    def _observe(self) -> None:
+        self.peak = max(self.peak, tracemalloc.get_traced_memory()[1] - self.start)
+
+
+def _reset_peak() -> None:
+    with _lock:
+        for window in _windows:
+            window._observe()
+        tracemalloc.reset_peak()
+
+
+class MemoryAccount:
+    """The memory allocated at most by a request, in all and by stage."""
+
+    def __init__(self, name: str) -> None:
+        """Inits the account, opening it."""
+        self.name = name
+        self.catalog: Optional[str] = None
+        self.triples: Optional[int] = None
+        self.peak = 0
+        # The peaks of the runs of each stage, summed, e.g. over the specs of a catalog:
+        self.stages: Dict[str, int] = {}
+        _reset_peak()
+        self._window = _Window()
+
+    def add(self, stage: str, size: int) -> None:
+        """Add the bytes allocated by a run of the stage."""
+        self.stages[stage] = self.stages.get(stage, 0) + max(0, size)
+
+    def close(self) -> None:
+        """Close the account, taking the peak of the request."""
+        self.peak = self._window.close()
+
+
+_account: ContextVar[Optional[MemoryAccount]] = ContextVar(
+    "memory_account", default=None
+)
+
+
+@contextmanager
+def measure(stage: str) -> Iterator[None]:
+    """Add the peak memory allocated by the block to the stage, if accounting."""
+    account = _account.get()
+    if account is None:
+        yield
+        return
+    _reset_peak()
+    window = _Window()
+    try:
+        yield
+    finally:
+        account.add(stage, window.close())
+
+
+def record(stage: str, size: int) -> None:
+    """Add bytes held by the stage, for what is not allocated in a single block."""
+    account = _account.get()
+    if account is not None:
+        account.add(stage, size)
+
+
+def annotate(catalog: str, triples: int) -> None:
+    """Tell which catalog, of how many triples, the current request is about."""
+    account = _account.get()
+    if account is not None:
+        account.catalog = catalog
+        account.triples = triples
+
+
+class MemoryAccounts:
+    """Distributions of the memory of requests and stages, for the metrics."""
+
+    def __init__(self, enabled: bool = MEMORY_ACCOUNTING) -> None:
+        """Inits the accounts."""
+        self.enabled = enabled
+        self.started_tracing = False
+        self.max_peak = 0
+        # The counts per bucket, the count and the sum, of requests and of each stage:
+        self.histograms: Dict[str, List[float]] = {
+            name: [0] * (len(MEMORY_BUCKETS) + 2) for name in ("request",) + STAGES
+        }
+
+    def observe(self, account: MemoryAccount) -> None:
+        """Log the account and add it to the distributions."""
+        self.max_peak = max(self.max_peak, account.peak)
+        self._observe("request", account.peak)
+        for stage, size in account.stages.items():
+            self._observe(stage, size)
+        logging.info(
+            "Memory of %s (catalog %s, %s triples): peak %s bytes; %s",
+            account.name,
+            account.catalog,
+            account.triples,
+            account.peak,
+            ", ".join(
+                f"{stage} {account.stages[stage]}"
+                for stage in STAGES
+                if stage in account.stages
+            ),
+        )
+
+    def _observe(self, name: str, size: int) -> None:
+        histogram = self.histograms.setdefault(name, [0] * (len(MEMORY_BUCKETS) + 2))
+        for i, bound in enumerate(MEMORY_BUCKETS):
+            if size <= bound:
+                histogram[i] += 1
+        histogram[-2] += 1
+        histogram[-1] += size
+
+    def register(self, metrics: MetricsRegistry) -> None:
+        """Expose the memory metrics."""
+        metrics.describe(
+            "request_memory_peak_bytes",
+            "histogram",
+            "Peak memory allocated by catalog requests.",
+        )
+        metrics.describe(
+            "request_memory_peak_max_bytes",
+            "gauge",
+            "Largest peak memory allocated by a catalog request.",
+        )
+        metrics.describe(
+            "stage_memory_peak_bytes",
+            "histogram",
+            "Peak memory allocated by each stage of catalog requests.",
+        )
+        metrics.add_collector(self.samples)
+
+    def samples(self) -> Iterable[Sample]:
+        """Return the samples of the memory metrics, if accounting."""
+        if not self.enabled:
+            return
+        yield "request_memory_peak_max_bytes", {}, self.max_peak
+        for name, histogram in self.histograms.items():
+            if name == "request":
+                metric, labels = "request_memory_peak_bytes", {}
+            else:
+                metric, labels = "stage_memory_peak_bytes", {"stage": name}
+            for bound, count in zip(MEMORY_BUCKETS, histogram[:-2], strict=True):
+                yield f"{metric}_bucket", {**labels, "le": str(bound)}, count
+            yield f"{metric}_bucket", {**labels, "le": "+Inf"}, histogram[-2]
+            yield f"{metric}_count", labels, histogram[-2]
+            yield f"{metric}_sum", labels, histogram[-1]
+
+
+MEMORY_ACCOUNTS = web.AppKey("memory_accounts", MemoryAccounts)
+
+
+async def start_memory_accounting(app: web.Application) -> None:
+    """Start tracing allocations, if accounting and they are not traced already."""
+    accounts = app[MEMORY_ACCOUNTS]
+    if accounts.enabled and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        accounts.started_tracing = True
+
+
+async def stop_memory_accounting(app: web.Application) -> None:
+    """Stop tracing allocations, if started by the accounting."""
+    accounts = app[MEMORY_ACCOUNTS]
+    if accounts.started_tracing:
+        tracemalloc.stop()
+        accounts.started_tracing = False
+
+
+@web.middleware
+async def memory_middleware(request: web.Request, handler: Any) -> Any:
+    """Middleware accounting the memory of requests doing catalog operations."""
+    accounts = request.app[MEMORY_ACCOUNTS]
+    if not accounts.enabled or not tracemalloc.is_tracing():
+        return await handler(request)
+    account = MemoryAccount(f"{request.method} {request.path}")
+    token = _account.set(account)
+    try:
+        return await handler(request)
+    finally:
+        _account.reset(token)
+        account.close()
+        # Only the requests through the stages are of interest, not e.g. /ping:
+        if account.stages:
+            accounts.observe(account)
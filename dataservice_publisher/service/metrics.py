@@ -0,0 +1,72 @@
+"""Module for the metrics of a worker, in the Prometheus text format."""
+
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from aiohttp import web
+
+PREFIX = "dataservice_publisher_"
+
+# A sample is a metric name, its labels and its value:
+Sample = Tuple[str, Dict[str, str], float]
+Collector = Callable[[], Iterable[Sample]]
+
+
+class MetricsRegistry:
+    """The registry of metrics, read from collectors every time they are exposed."""
+
+    def __init__(self) -> None:
+        """Inits the registry."""
+        self._descriptions: Dict[str, Tuple[str, str]] = {}
+        self._collectors: List[Collector] = []
+
+    def describe(self, name: str, type: str, help: str) -> None:
+        """Describe a metric, its type is counter, gauge or histogram."""
+        self._descriptions[PREFIX + name] = (type, help)
+
+    def add_collector(self, collector: Collector) -> None:
+        """Add a function returning samples, called when the metrics are exposed."""
+        self._collectors.append(collector)
+
+    def expose(self) -> str:
+        """Return the samples of all collectors, in the Prometheus text format."""
+        samples: Dict[str, List[str]] = {}
+        for collector in self._collectors:
+            for name, labels, value in collector():
+                name = PREFIX + name
+                samples.setdefault(self._family(name), []).append(
+                    f"{name}{_labels(labels)} {_value(value)}"
+                )
+        lines = []
+        for family, rows in samples.items():
+            if family in self._descriptions:
+                type, help = self._descriptions[family]
+                lines.append(f"# HELP {family} {help}")
+                lines.append(f"# TYPE {family} {type}")
+            lines.extend(rows)
+        return "".join(f"{line}\n" for line in lines)
+
+    def _family(self, name: str) -> str:
+        """Return the described metric of the sample, e.g. a histogram of a bucket."""
+        for suffix in ("_bucket", "_count", "_sum"):
+            if name.endswith(suffix) and name[: -len(suffix)] in self._descriptions:
+                return name[: -len(suffix)]
+        return name
+
+
+def _value(value: float) -> str:
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in labels.items()
+    )
+    return "{%s}" % ",".join('%s="%s"' % (k, v) for k, v in escaped)
+
+
+METRICS = web.AppKey("metrics", MetricsRegistry)
@@ -0,0 +1,87 @@
+"""Module for converting OpenAPI documents to DCAT data services in a process pool."""
+
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+import logging
+import multiprocessing
+from os import environ as env
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiohttp import web
+from dotenv import load_dotenv
+from oastodcat import OASDataService
+from rdflib.graph import Graph
+
+load_dotenv()
+# The number of processes converting apis, per worker, 0 converts them on the event loop:
+CONVERSION_WORKERS = int(env.get("CONVERSION_WORKERS", 0))
+# Forking a worker, which runs threads, is unsafe, so the processes are started afresh:
+CONVERSION_START_METHOD = env.get(
+    "CONVERSION_START_METHOD",
+    (
+        "forkserver"
+        if "forkserver" in multiprocessing.get_all_start_methods()
+        else "spawn"
+    ),
+)
+# Catalogs with fewer apis are converted on the event loop, as it is cheaper:
+CONVERSION_PARALLEL_MIN_APIS = int(env.get("CONVERSION_PARALLEL_MIN_APIS", 8))
+
+# The identifiers of the data services of an api, and the triples describing them:
+Conversion = Tuple[List[str], List[Tuple[Any, Any, Any]]]
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def convert_api(api: Dict[str, Any], oas: Dict[str, Any]) -> Conversion:
+    """Convert the OpenAPI document of the api to data services, as triples."""
+    oas_spec = OASDataService(api["url"], oas, api["identifier"])
+    if "conformsTo" in api:
+        oas_spec.conforms_to = api["conformsTo"]
+    if "publisher" in api:
+        oas_spec.publisher = api["publisher"]
+    identifiers = []
+    g = Graph()
+    for dataservice in oas_spec.dataservices:
+        # Adding the graph of the data service is what Catalog._to_graph does:
+        g += dataservice._to_graph()
+        identifiers.append(dataservice.identifier)
+    return identifiers, list(g)
+
+
+async def convert_apis(
+    apis: List[Tuple[Dict[str, Any], Dict[str, Any]]]
+) -> List[Conversion]:
+    """Convert the apis and their documents, in parallel if there are many of them."""
+    if CONVERSION_WORKERS <= 0 or len(apis) < CONVERSION_PARALLEL_MIN_APIS:
+        return [convert_api(api, oas) for api, oas in apis]
+    loop = asyncio.get_running_loop()
+    pool = _get_pool()
+    return list(
+        await asyncio.gather(
+            *[loop.run_in_executor(pool, convert_api, api, oas) for api, oas in apis]
+        )
+    )
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        logging.info(
+            "Starting %s processes converting apis, by %s",
+            CONVERSION_WORKERS,
+            CONVERSION_START_METHOD,
+        )
+        _pool = ProcessPoolExecutor(
+            max_workers=CONVERSION_WORKERS,
+            mp_context=multiprocessing.get_context(CONVERSION_START_METHOD),
+        )
+    return _pool
+
+
+async def stop_conversion_pool(app: web.Application) -> None:
+    """Stop the processes converting apis, if they have been started."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
@@ -0,0 +1,191 @@
+"""Module for fetching and parsing the OpenAPI documents of apis."""
+
+import asyncio
+from dataclasses import dataclass
+import hashlib
+import json
+import logging
+from os import environ as env
+import time
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+from aiohttp import ClientError, ClientResponse, ClientSession, ClientTimeout, hdrs
+from dotenv import load_dotenv
+import yaml
+
+from dataservice_publisher.exceptions.exceptions import OASLoadError
+from dataservice_publisher.service.memory_accounting import measure, record
+
+try:  # pragma: no cover
+    import orjson
+
+    _json_loads: Callable[[bytes], Any] = orjson.loads
+except ImportError:  # pragma: no cover
+    _json_loads = json.loads
+
+# The libyaml based loader is much faster, use it when PyYAML is built with it:
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+load_dotenv()
+OAS_MAX_BYTES = int(env.get("OAS_MAX_BYTES", 10 * 1024 * 1024))
+OAS_CONNECT_TIMEOUT = float(env.get("OAS_CONNECT_TIMEOUT", 10))
+OAS_READ_TIMEOUT = float(env.get("OAS_READ_TIMEOUT", 30))
+# The seconds fetching a document may take in all, however steadily it is sent:
+OAS_TOTAL_TIMEOUT = float(env.get("OAS_TOTAL_TIMEOUT", 120))
+# Fail the publish when an api's document is not found, rather than leave the api out:
+OAS_STRICT_STATUS = env.get("OAS_STRICT_STATUS", "false").lower() == "true"
+# Documents larger than this are parsed in a thread, not on the event loop:
+OAS_OFFLOAD_BYTES = int(env.get("OAS_OFFLOAD_BYTES", 256 * 1024))
+OAS_FETCH_CONCURRENCY = int(env.get("OAS_FETCH_CONCURRENCY", 8))
+CHUNK_SIZE = 64 * 1024
+
+
+@dataclass
+class SpecTiming:
+    """The size of an OpenAPI document, its validator and the time spent loading it."""
+
+    url: str
+    bytes: int = 0
+    format: str = ""
+    validator: str = ""
+    fetch_seconds: float = 0.0
+    parse_seconds: float = 0.0
+
+    @property
+    def seconds(self) -> float:
+        """Return the total time spent loading the document."""
+        return self.fetch_seconds + self.parse_seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return a json serializable representation of the timing."""
+        return {
+            "url": self.url,
+            "seconds": round(self.seconds, 3),
+            "bytes": self.bytes,
+            "format": self.format,
+            "fetchSeconds": round(self.fetch_seconds, 3),
+            "parseSeconds": round(self.parse_seconds, 3),
+        }
+
+
+def is_json(body: bytes, content_type: str = "") -> bool:
+    """Return true if the document is JSON, judged by content type or first byte."""
+    if "json" in content_type:
+        return True
+    return body.lstrip()[:1] in (b"{", b"[")
+
+
+def parse_spec(body: bytes, content_type: str = "") -> Tuple[Any, str]:
+    """Parse the document as JSON if it looks like JSON, otherwise as YAML."""
+    with measure("parsed_spec"):
+        if is_json(body, content_type):
+            try:
+                return _json_loads(body), "json"
+            except ValueError:
+                # JSON is a subset of YAML, so let the YAML parser have a go:
+                pass
+        return yaml.load(body, Loader=YAML_LOADER), "yaml"  # noqa: S506
+
+
+async def load_spec(
+    session: ClientSession, url: str
+) -> Tuple[Optional[Dict[str, Any]], SpecTiming]:
+    """Fetch and parse the OpenAPI document at url, None if the url is not found."""
+    timing = SpecTiming(url)
+    started = time.perf_counter()
+    try:
+        async with session.get(url, timeout=_timeout()) as response:
+            logging.debug("%s: %s", url, response.status)
+            if response.status != 200:
+                if OAS_STRICT_STATUS:
+                    raise OASLoadError(f"Got status {response.status} fetching {url}")
+                logging.warning(
+                    "Got status %s fetching %s, leaving the api out",
+                    response.status,
+                    url,
+                )
+                return None, timing
+            content_type = response.headers.get(hdrs.CONTENT_TYPE, "")
+            body = await _read_body(response, url)
+            timing.validator = spec_validator(response.headers, body)
+    except asyncio.TimeoutError as e:
+        raise OASLoadError(f"Timed out fetching {url}") from e
+    except ClientError as e:
+        raise OASLoadError(f"Could not fetch {url}") from e
+    timing.bytes = len(body)
+    # Read across awaits, the text is accounted by its size rather than traced:
+    record("spec_text", len(body))
+    timing.fetch_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    try:
+        if len(body) > OAS_OFFLOAD_BYTES:
+            oas, timing.format = await asyncio.to_thread(parse_spec, body, content_type)
+        else:
+            oas, timing.format = parse_spec(body, content_type)
+    except yaml.YAMLError as e:
+        raise OASLoadError(f"Could not parse the document at {url}") from e
+    timing.parse_seconds = time.perf_counter() - started
+    if not isinstance(oas, dict):
+        raise OASLoadError(f"The document at {url} is not an OpenAPI document")
+
+    logging.info(
+        "Loaded %s (%s bytes of %s): fetched in %.3fs, parsed in %.3fs",
+        url,
+        timing.bytes,
+        timing.format,
+        timing.fetch_seconds,
+        timing.parse_seconds,
+    )
+    return oas, timing
+
+
+def spec_validator(headers: Mapping[str, str], body: bytes = b"") -> str:
+    """Return what changes with the document: its entity tag, modification or digest."""
+    if hdrs.ETAG in headers:
+        return f"etag:{headers[hdrs.ETAG]}"
+    if hdrs.LAST_MODIFIED in headers:
+        return f"modified:{headers[hdrs.LAST_MODIFIED]}"
+    return f"sha256:{hashlib.sha256(body).hexdigest()}"
+
+
+async def fetch_spec_validator(session: ClientSession, url: str) -> str:
+    """Return the validator of the document at url, without parsing it."""
+    timeout = _timeout()
+    try:
+        # Only when the server tells neither, the document is fetched for its digest:
+        async with session.head(url, timeout=timeout) as response:
+            if response.status == 200 and (
+                hdrs.ETAG in response.headers or hdrs.LAST_MODIFIED in response.headers
+            ):
+                return spec_validator(response.headers)
+        async with session.get(url, timeout=timeout) as response:
+            if response.status != 200:
+                raise OASLoadError(f"Got status {response.status} fetching {url}")
+            return spec_validator(response.headers, await _read_body(response, url))
+    except asyncio.TimeoutError as e:
+        raise OASLoadError(f"Timed out fetching {url}") from e
+    except ClientError as e:
+        raise OASLoadError(f"Could not fetch {url}") from e
+
+
+def _timeout() -> ClientTimeout:
+    return ClientTimeout(
+        total=OAS_TOTAL_TIMEOUT,
+        sock_connect=OAS_CONNECT_TIMEOUT,
+        sock_read=OAS_READ_TIMEOUT,
+    )
+
+
+async def _read_body(response: ClientResponse, url: str) -> bytes:
+    """Read the body in chunks, giving up as soon as it is too large."""
+    if (response.content_length or 0) > OAS_MAX_BYTES:
+        raise OASLoadError(f"The document at {url} is too large")
+    chunks = []
+    size = 0
+    async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+        size += len(chunk)
+        if size > OAS_MAX_BYTES:
+            raise OASLoadError(f"The document at {url} is too large")
+        chunks.append(chunk)
+    return b"".join(chunks)
@@ -0,0 +1,231 @@
+"""Module for profiling single requests on demand, for administrators."""
+
+import asyncio
+from collections import Counter
+import json
+import logging
+import marshal
+import os
+from os import environ as env
+import sys
+import tempfile
+import time
+from types import FrameType
+from typing import Any, Dict, List, Optional, Tuple
+import uuid
+
+from aiohttp import hdrs, web
+from dotenv import load_dotenv
+
+load_dotenv()
+PROFILE_DIR = env.get(
+    "PROFILE_DIR", os.path.join(tempfile.gettempdir(), "dataservice-publisher-profiles")
+)
+PROFILES_RETAINED = int(env.get("PROFILES_RETAINED", 20))
+
+# Requests with this header set to 1 are profiled, given an admin token:
+PROFILE_HEADER = "X-Profile"
+PROFILES_PATH = "/profiles"
+# The media types of the artifacts of a profile, by format:
+PROFILE_FORMATS = {
+    "speedscope": "application/json",
+    "pstats": "application/octet-stream",
+}
+PROFILE_ID = "profile_id"
+
+# A function is identified by its file, first line and name, as in pstats:
+Function = Tuple[str, int, str]
+
+
+class Recorder:
+    """Records calls of Python functions in the worker's thread.
+
+    Each call, and each time a coroutine is resumed, is recorded both as an
+    event of a speedscope profile and in the statistics of a pstats file.
+    Everything run by the event loop meanwhile is recorded, including other
+    requests, but not what runs in other threads or processes.
+    """
+
+    def __init__(self) -> None:
+        """Inits the recorder."""
+        self.frames: List[Function] = []
+        self.events: List[Dict[str, Any]] = []
+        self.stats: Dict[Function, List[Any]] = {}
+        self._indexes: Dict[Function, int] = {}
+        # The open calls: function, start and time spent in calls made by it:
+        self._stack: List[List[Any]] = []
+        self._active: Counter = Counter()
+        self._start = 0.0
+        self.duration = 0.0
+
+    def enable(self) -> None:
+        """Start recording."""
+        self._start = time.perf_counter()
+        sys.setprofile(self._profile)
+
+    def disable(self) -> None:
+        """Stop recording, ending the calls still open."""
+        sys.setprofile(None)
+        now = time.perf_counter() - self._start
+        while self._stack:
+            self._return(now)
+        self.duration = now
+
+    def _profile(self, frame: FrameType, event: str, arg: Any) -> None:
+        if event == "call":
+            code = frame.f_code
+            function = (code.co_filename, code.co_firstlineno, code.co_name)
+            index = self._indexes.get(function)
+            if index is None:
+                index = self._indexes[function] = len(self.frames)
+                self.frames.append(function)
+            now = time.perf_counter() - self._start
+            self.events.append({"type": "O", "frame": index, "at": now})
+            self._stack.append([function, now, 0.0])
+            self._active[function] += 1
+        elif event == "return" and self._stack:
+            # Returns of calls made before recording started are left out:
+            self._return(time.perf_counter() - self._start)
+
+    def _return(self, now: float) -> None:
+        function, start, in_calls = self._stack.pop()
+        self._active[function] -= 1
+        elapsed = now - start
+        self.events.append({"type": "C", "frame": self._indexes[function], "at": now})
+        stats = self.stats.setdefault(function, [0, 0, 0.0, 0.0, {}])
+        stats[1] += 1
+        stats[2] += elapsed - in_calls
+        # Recursive calls are part of the cumulative time of the outermost one:
+        if not self._active[function]:
+            stats[0] += 1
+            stats[3] += elapsed
+        if self._stack:
+            caller = self._stack[-1]
+            caller[2] += elapsed
+            calls = stats[4].setdefault(caller[0], [0, 0, 0.0, 0.0])
+            calls[0] += 1
+            calls[1] += 1
+            calls[2] += elapsed - in_calls
+            calls[3] += elapsed
+
+    def speedscope(self, name: str) -> Dict[str, Any]:
+        """Return the calls as an evented profile in the speedscope file format."""
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "dataservice-publisher",
+            "shared": {
+                "frames": [
+                    {"name": function, "file": file, "line": line}
+                    for file, line, function in self.frames
+                ]
+            },
+            "profiles": [
+                {
+                    "type": "evented",
+                    # The calls of the other requests run meanwhile are recorded too:
+                    "name": f"Event loop while running {name}",
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": self.duration,
+                    "events": self.events,
+                }
+            ],
+        }
+
+    def pstats(self) -> Dict[Function, Tuple[Any, ...]]:
+        """Return the statistics in the format of a file read by pstats.Stats."""
+        return {
+            function: (
+                cc,
+                nc,
+                tt,
+                ct,
+                {caller: tuple(calls) for caller, calls in callers.items()},
+            )
+            for function, (cc, nc, tt, ct, callers) in self.stats.items()
+        }
+
+
+class Profiles:
+    """The profiles of requests, kept as files in a directory."""
+
+    def __init__(
+        self, directory: str = PROFILE_DIR, retained: int = PROFILES_RETAINED
+    ) -> None:
+        """Inits the profiles."""
+        self.directory = directory
+        self.retained = retained
+        # Only one request at a time is profiled, as the recorder sees them all:
+        self.recording = False
+
+    def path(self, id: str, format: str) -> Optional[str]:
+        """Return the path of the profile in the format, or None if there is none."""
+        if format not in PROFILE_FORMATS or not id.isalnum():
+            return None
+        path = os.path.join(self.directory, f"{id}.{format}")
+        return path if os.path.exists(path) else None
+
+    def save(self, id: str, name: str, recorder: Recorder) -> None:
+        """Write the profile in every format, removing the oldest profiles."""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, f"{id}.speedscope"), "w") as file:
+            json.dump(recorder.speedscope(name), file)
+        with open(os.path.join(self.directory, f"{id}.pstats"), "wb") as file:
+            marshal.dump(recorder.pstats(), file)
+        paths = sorted(
+            (os.path.join(self.directory, name) for name in os.listdir(self.directory)),
+            key=_mtime,
+        )
+        for path in paths[: -self.retained * len(PROFILE_FORMATS)]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def _mtime(path: str) -> float:
+    try:
+        return os.path.getmtime(path)
+    except FileNotFoundError:
+        return 0.0
+
+
+PROFILES = web.AppKey("profiles", Profiles)
+
+
+@web.middleware
+async def profile_middleware(request: web.Request, handler: Any) -> Any:
+    """Middleware profiling the requests asking for it, once authenticated."""
+    if request.headers.get(PROFILE_HEADER) != "1":
+        return await handler(request)
+    profiles = request.app[PROFILES]
+    if profiles.recording:
+        logging.warning("Not profiling %s, another request is profiled", request.path)
+        return await handler(request)
+    request[PROFILE_ID] = id = uuid.uuid4().hex
+    name = f"{request.method} {request.path}"
+    recorder = Recorder()
+    profiles.recording = True
+    recorder.enable()
+    try:
+        return await handler(request)
+    finally:
+        recorder.disable()
+        profiles.recording = False
+        # Serialized in a thread, so that the other requests are not held up meanwhile:
+        await asyncio.to_thread(profiles.save, id, name, recorder)
+        logging.info(
+            "Profiled the event loop while running %s in %.3fs: %s/%s",
+            name,
+            recorder.duration,
+            PROFILES_PATH,
+            id,
+        )
+
+
+async def add_profile_link(request: web.Request, response: web.StreamResponse) -> None:
+    """Tell where the profile of a profiled request will be."""
+    id = request.get(PROFILE_ID)
+    if id is not None:
+        response.headers.add(hdrs.LINK, f'<{PROFILES_PATH}/{id}>; rel="profile"')
@@ -0,0 +1,386 @@
+"""Module for publishing catalogs asynchronously in background jobs."""
+
+import asyncio
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from functools import partial
+import json
+import logging
+import os
+from os import environ as env
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import uuid
+
+from aiohttp import web
+from dotenv import load_dotenv
+
+from dataservice_publisher.exceptions.exceptions import RequestBodyError
+from dataservice_publisher.service.admission import Limiter
+from dataservice_publisher.service.catalog_events import CatalogEvents
+from dataservice_publisher.service.catalog_service import (
+    FetchTurn,
+    publish_catalog,
+    unchanged_catalog,
+)
+from dataservice_publisher.service.oas_loader import SpecTiming
+from dataservice_publisher.service.write_batcher import WriteBatcher
+
+load_dotenv()
+PUBLISH_WORKERS = int(env.get("PUBLISH_WORKERS", 2))
+PUBLISH_QUEUE_SIZE = int(env.get("PUBLISH_QUEUE_SIZE", 20))
+PUBLISH_JOBS_RETAINED = int(env.get("PUBLISH_JOBS_RETAINED", 100))
+PUBLISH_JOBS_FILE = env.get(
+    "PUBLISH_JOBS_FILE",
+    os.path.join(tempfile.gettempdir(), "dataservice-publisher-jobs.db"),
+)
+# The seconds a job is left to its worker without news from it, before another takes it:
+PUBLISH_JOB_LEASE = float(env.get("PUBLISH_JOB_LEASE", 30))
+PUBLISH_JOBS_POLL_INTERVAL = float(env.get("PUBLISH_JOBS_POLL_INTERVAL", 0.5))
+# The seconds between writes of the progress of a running job:
+_SAVE_INTERVAL = 1.0
+
+
+class JobQueueFullError(Exception):
+    """Raised when there is no room for another publish job."""
+
+
+@dataclass
+class PublishJob:
+    """A request to publish a catalog, and its progress."""
+
+    catalog: Dict[str, Any]
+    idempotency_key: Optional[str] = None
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = "pending"
+    created: float = field(default_factory=time.time)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    api_timings: List[Dict[str, Any]] = field(default_factory=list)
+    triples: Optional[int] = None
+    unchanged: bool = False
+    error: Optional[str] = None
+
+    def api_done(self, timing: SpecTiming) -> None:
+        """Record that an api of the catalog has been converted."""
+        self.api_timings.append(timing.to_dict())
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return a json serializable representation of the job."""
+        return {
+            "id": self.id,
+            "catalog": self.catalog["identifier"],
+            "status": self.status,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "progress": {
+                "apis": len(self.catalog["apis"]),
+                "done": len(self.api_timings),
+            },
+            "apiTimings": self.api_timings,
+            "triples": self.triples,
+            "unchanged": self.unchanged,
+            "error": self.error,
+        }
+
+
+class JobStore:
+    """The publish jobs, in an SQLite file shared by the workers of a host.
+
+    The file is also the queue: every worker claims pending jobs from it, so a
+    job is known to all workers, and outlives the worker that took it. A
+    worker running a job holds a lease on it, which it renews while running.
+    A job whose lease ran out, e.g. as its worker died, is claimed again.
+    """
+
+    def __init__(self, filename: str = PUBLISH_JOBS_FILE) -> None:
+        """Inits the store."""
+        self.filename = filename
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def add(self, job: PublishJob, queue_size: int, retained: int) -> None:
+        """Add the pending job, forgetting the oldest finished jobs beyond retained."""
+        with self._lock, self._transaction() as connection:
+            (pending,) = connection.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'pending'"
+            ).fetchone()
+            if pending >= queue_size:
+                raise JobQueueFullError()
+            connection.execute(
+                "INSERT INTO jobs (id, catalog, idempotency_key, status, created) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    job.id,
+                    json.dumps(job.catalog),
+                    job.idempotency_key,
+                    job.status,
+                    job.created,
+                ),
+            )
+            connection.execute(
+                "DELETE FROM jobs WHERE finished IS NOT NULL AND id NOT IN ("
+                "SELECT id FROM jobs WHERE finished IS NOT NULL "
+                "ORDER BY finished DESC LIMIT ?)",
+                (retained,),
+            )
+
+    def get(self, id: str) -> Optional[PublishJob]:
+        """Return the job given by id, if it is known."""
+        with self._lock:
+            row = self._connect().execute(_SELECT + "WHERE id = ?", (id,)).fetchone()
+        return _job(row) if row else None
+
+    def claim(self, lease: float) -> Optional[PublishJob]:
+        """Take the oldest pending job, or one whose lease ran out, if there is one."""
+        now = time.time()
+        with self._lock, self._transaction() as connection:
+            row = connection.execute(
+                _SELECT + "WHERE status = 'pending' "
+                "OR (status = 'running' AND lease < ?) ORDER BY created LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                return None
+            job = _job(row)
+            job.status = "running"
+            job.started = now
+            job.api_timings = []
+            connection.execute(
+                "UPDATE jobs SET status = ?, started = ?, api_timings = ?, lease = ? "
+                "WHERE id = ?",
+                (job.status, job.started, "[]", now + lease, job.id),
+            )
+        return job
+
+    def save(self, job: PublishJob, lease: Optional[float] = None) -> None:
+        """Write the progress of the job, renewing its lease by the given seconds."""
+        with self._lock, self._transaction() as connection:
+            connection.execute(
+                "UPDATE jobs SET status = ?, started = ?, finished = ?, "
+                "api_timings = ?, triples = ?, unchanged = ?, error = ?, lease = ? "
+                "WHERE id = ?",
+                (
+                    job.status,
+                    job.started,
+                    job.finished,
+                    json.dumps(job.api_timings),
+                    job.triples,
+                    job.unchanged,
+                    job.error,
+                    time.time() + lease if lease is not None else None,
+                    job.id,
+                ),
+            )
+
+    def close(self) -> None:
+        """Close the connection to the store file."""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        connection = self._connect()
+        # Taking the write lock at once, workers do not both claim the same job:
+        connection.execute("BEGIN IMMEDIATE")
+        with connection:
+            yield connection
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            connection = sqlite3.connect(
+                self.filename, timeout=10, check_same_thread=False
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, catalog TEXT, idempotency_key TEXT, "
+                "status TEXT, created REAL, started REAL, finished REAL, "
+                "api_timings TEXT DEFAULT '[]', triples INTEGER, "
+                "unchanged INTEGER DEFAULT 0, error TEXT, lease REAL)"
+            )
+            self._connection = connection
+        return self._connection
+
+
+_SELECT = (
+    "SELECT id, catalog, idempotency_key, status, created, started, finished, "
+    "api_timings, triples, unchanged, error FROM jobs "
+)
+
+
+def _job(row: Tuple) -> PublishJob:
+    id, catalog, idempotency_key, status, created, started, finished = row[:7]
+    api_timings, triples, unchanged, error = row[7:]
+    return PublishJob(
+        json.loads(catalog),
+        idempotency_key,
+        id=id,
+        status=status,
+        created=created,
+        started=started,
+        finished=finished,
+        api_timings=json.loads(api_timings),
+        triples=triples,
+        unchanged=bool(unchanged),
+        error=error,
+    )
+
+
+class PublishJobs:
+    """A bounded queue of publish jobs, kept in a JobStore, and the tasks running them.
+
+    Every worker runs up to `workers` jobs from the store at a time, whichever
+    worker they were submitted to.
+    """
+
+    def __init__(
+        self,
+        workers: int = PUBLISH_WORKERS,
+        queue_size: int = PUBLISH_QUEUE_SIZE,
+        retained: int = PUBLISH_JOBS_RETAINED,
+        events: Optional[CatalogEvents] = None,
+        store: Optional[JobStore] = None,
+        lease: float = PUBLISH_JOB_LEASE,
+        poll_interval: float = PUBLISH_JOBS_POLL_INTERVAL,
+        fetches: Optional[Limiter] = None,
+        batcher: Optional[WriteBatcher] = None,
+    ) -> None:
+        """Inits the job queue, whose jobs wait for their turns to fetch documents."""
+        self.workers = workers
+        self.queue_size = queue_size
+        self.retained = retained
+        self.events = events
+        self.store = store or JobStore()
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.fetches = fetches
+        self.batcher = batcher
+        # The jobs run by this worker, whose progress is more recent than the store's:
+        self._running: Dict[str, PublishJob] = {}
+        self._submitted = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    async def submit(
+        self, catalog: Dict[str, Any], idempotency_key: Optional[str] = None
+    ) -> PublishJob:
+        """Enqueue a job publishing the catalog."""
+        job = PublishJob(catalog, idempotency_key)
+        await asyncio.to_thread(self.store.add, job, self.queue_size, self.retained)
+        self._submitted.set()
+        return job
+
+    async def get(self, id: str) -> Optional[PublishJob]:
+        """Return the job given by id, if it is known."""
+        job = self._running.get(id)
+        if job is not None:
+            return job
+        return await asyncio.to_thread(self.store.get, id)
+
+    async def start(self) -> None:
+        """Start the tasks running the jobs."""
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Cancel the tasks running the jobs, putting the jobs back in the queue."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for job in self._running.values():
+            if job.finished is None:
+                # Publishing is a single update, so the job can safely run again:
+                job.status = "pending"
+                job.started = None
+                job.api_timings = []
+            await asyncio.to_thread(self.store.save, job)
+        self._running.clear()
+        await asyncio.to_thread(self.store.close)
+
+    async def _work(self) -> None:
+        while True:
+            try:
+                job = await asyncio.to_thread(self.store.claim, self.lease)
+            except sqlite3.Error:
+                logging.exception("Claiming a publish job failed")
+                job = None
+            if job is None:
+                self._submitted.clear()
+                try:
+                    await asyncio.wait_for(self._submitted.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            self._running[job.id] = job
+            heartbeat = asyncio.create_task(self._heartbeat(job))
+            try:
+                await self._run(job)
+            finally:
+                heartbeat.cancel()
+            try:
+                await asyncio.to_thread(self.store.save, job)
+            except sqlite3.Error:
+                logging.exception("Saving publish job %s failed", job.id)
+            del self._running[job.id]
+
+    async def _heartbeat(self, job: PublishJob) -> None:
+        """Write the progress of the job, and renew its lease, until cancelled."""
+        while True:
+            await asyncio.sleep(min(_SAVE_INTERVAL, self.lease / 3))
+            try:
+                await asyncio.to_thread(self.store.save, job, self.lease)
+            except sqlite3.Error:
+                logging.exception("Saving publish job %s failed", job.id)
+
+    async def _run(self, job: PublishJob) -> None:
+        # A job is not shed when the worker is busy, it waits for its turn instead:
+        fetch_turn: FetchTurn = (
+            partial(self.fetches.turn, shed=False) if self.fetches else nullcontext
+        )
+        try:
+            unchanged = await unchanged_catalog(
+                job.catalog, job.idempotency_key, fetch_turn
+            )
+            if unchanged is not None:
+                job.triples = len(unchanged[0])
+                job.unchanged = True
+            else:
+                graph, summary = await publish_catalog(
+                    job.catalog,
+                    job.api_done,
+                    job.idempotency_key,
+                    fetch_turn,
+                    self.batcher,
+                )
+                job.triples = len(graph)
+                if self.events is not None:
+                    self.events.created(summary, graph)
+            job.status = "completed"
+        except RequestBodyError as e:
+            job.status = "failed"
+            job.error = str(e)
+        except Exception as e:
+            logging.exception("Publish job %s failed", job.id)
+            job.status = "failed"
+            job.error = f"{type(e).__name__} when publishing catalog"
+        # Not when cancelled, as the job is then put back in the queue:
+        job.finished = time.time()
+
+
+PUBLISH_JOBS = web.AppKey("publish_jobs", PublishJobs)
+
+
+async def start_publish_jobs(app: web.Application) -> None:
+    """Start the publish job workers."""
+    await app[PUBLISH_JOBS].start()
+
+
+async def stop_publish_jobs(app: web.Application) -> None:
+    """Stop the publish job workers."""
+    await app[PUBLISH_JOBS].stop()
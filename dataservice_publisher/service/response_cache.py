@@ -0,0 +1,207 @@
+"""Module for caching serialized representations of catalogs."""
+
+import base64
+from collections import Counter, OrderedDict
+import json
+import logging
+import os
+from os import environ as env
+import time
+from typing import List, Optional, Tuple, Union
+
+from aiohttp import web
+from dotenv import load_dotenv
+
+from dataservice_publisher.service.shared_cache import SharedCache
+
+load_dotenv()
+# Off by default: another host does not invalidate the cache of this one on writes:
+CACHE_TTL = float(env.get("CACHE_TTL", 0))
+CACHE_MAX_ENTRIES = int(env.get("CACHE_MAX_ENTRIES", 1000))
+# The seconds an expired entry may still be served while it is being refreshed:
+CACHE_STALE_WHILE_REVALIDATE = float(env.get("CACHE_STALE_WHILE_REVALIDATE", 30))
+# A directory shared by the workers of a host, empty for a cache per worker:
+SHARED_CACHE_DIR = env.get("SHARED_CACHE_DIR", "")
+
+# A cached body, a view of a shared cache file or bytes kept by the worker:
+Body = Union[bytes, memoryview]
+
+
+class ResponseCache:
+    """Bounded cache of serialized responses, keyed by path and variant.
+
+    Entries expire after `ttl` seconds, and the least recently used entry is
+    evicted when the cache is full. A `ttl` of 0 disables the cache.
+    An expired entry is kept for another `stale_while_revalidate` seconds,
+    during which it may be served by `get_stale` while it is refreshed.
+    The cache also counts reads per path, in order to know which catalogs are
+    the most requested.
+    Given a shared directory, the entries are kept in a SharedCache instead,
+    where they are read by every worker and invalidated for all at once.
+    Otherwise every worker removes its own entries of a catalog changed by
+    another worker of the host when the change feed tells it, see `forget`.
+    """
+
+    def __init__(
+        self,
+        ttl: float = CACHE_TTL,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        shared_dir: str = SHARED_CACHE_DIR,
+        stale_while_revalidate: float = CACHE_STALE_WHILE_REVALIDATE,
+    ) -> None:
+        """Inits the cache."""
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stale_while_revalidate = stale_while_revalidate
+        self.requests: Counter = Counter()
+        self._entries: OrderedDict[Tuple[str, str], Tuple[float, bytes]] = OrderedDict()
+        # Bumped when a path is invalidated, see generation:
+        self._generations: Counter = Counter()
+        self.shared: Optional[SharedCache] = None
+        if shared_dir and ttl > 0:
+            self.shared = SharedCache(
+                shared_dir, ttl, max_entries, stale_while_revalidate
+            )
+
+    def generation(self, path: str) -> int:
+        """Return the generation of the path, to be read before loading its body."""
+        if self.shared is not None:
+            return self.shared.generation(path)
+        return self._generations[path]
+
+    def get(self, path: str, variant: str) -> Optional[Body]:
+        """Return the cached body, or None if there is no fresh entry."""
+        return self._get(path, variant, stale=False)
+
+    def get_stale(self, path: str, variant: str) -> Optional[Body]:
+        """Return the cached body, even if it expired within the grace window."""
+        return self._get(path, variant, stale=True)
+
+    def _get(self, path: str, variant: str, stale: bool) -> Optional[Body]:
+        if self.shared is not None:
+            view = self.shared.get(path, variant, stale)
+            if view is not None:
+                self.requests[path] += 1
+            return view
+        key = (path, variant)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, body = entry
+        now = time.monotonic()
+        if expires + self.stale_while_revalidate < now:
+            del self._entries[key]
+            return None
+        if expires < now and not stale:
+            return None
+        self._entries.move_to_end(key)
+        self.requests[path] += 1
+        return body
+
+    def put(
+        self,
+        path: str,
+        variant: str,
+        body: bytes,
+        count: bool = True,
+        written: Optional[float] = None,
+        generation: Optional[int] = None,
+    ) -> None:
+        """Store the body, unless invalidated since the generation, and count it."""
+        if self.ttl <= 0:
+            return
+        if count:
+            self.requests[path] += 1
+        if self.shared is not None:
+            self.shared.put(path, variant, body, written=written, generation=generation)
+            return
+        if generation is not None and generation != self._generations[path]:
+            return
+        age = time.time() - written if written is not None else 0
+        key = (path, variant)
+        self._entries[key] = (time.monotonic() + self.ttl - age, body)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, *paths: str) -> None:
+        """Remove all entries for the given paths."""
+        if self.shared is not None:
+            self.shared.invalidate(paths)
+        self._remove(paths)
+
+    def invalidate_catalog(self, id: str) -> None:
+        """Remove all entries for the catalog given by id and for the catalog list."""
+        self.invalidate("/catalogs", f"/catalogs/{id}")
+
+    def forget(self, id: str) -> None:
+        """Remove the entries of this worker for a catalog changed by another one."""
+        # The shared entries were invalidated by the worker making the change:
+        self._remove(("/catalogs", f"/catalogs/{id}"))
+
+    def _remove(self, paths: Tuple[str, ...]) -> None:
+        for path in paths:
+            self._generations[path] += 1
+        for key in [key for key in self._entries if key[0] in paths]:
+            del self._entries[key]
+
+    def most_requested(self, n: int) -> List[str]:
+        """Return the n most requested paths."""
+        return [path for path, _ in self.requests.most_common(n)]
+
+    def save(self, filename: str) -> None:
+        """Write the fresh entries, unless shared, and the request counts to a file."""
+        # The shared entries are kept in the shared directory, which outlives the worker:
+        entries = self._entries.items() if self.shared is None else []
+        now = time.monotonic()
+        # The wall clock time each entry was written, as a later process sees it:
+        offset = time.time() - now - self.ttl
+        snapshot = {
+            "entries": [
+                {
+                    "path": path,
+                    "variant": variant,
+                    "written": expires + offset,
+                    "body": base64.b64encode(body).decode(),
+                }
+                for (path, variant), (expires, body) in entries
+                if expires >= now
+            ],
+            "requests": dict(self.requests),
+        }
+        # Write to a temporary file first, as several workers share the file:
+        tmp_filename = f"{filename}.{os.getpid()}"
+        with open(tmp_filename, "w") as file:
+            json.dump(snapshot, file)
+        os.replace(tmp_filename, filename)
+
+    def load(self, filename: str) -> int:
+        """Load the unexpired entries, unless shared, and request counts from a snapshot."""
+        try:
+            with open(filename, "r") as file:
+                snapshot = json.load(file)
+        except (OSError, ValueError) as e:
+            logging.warning("Could not load cache snapshot %s: %s", filename, e)
+            return 0
+        now = time.time()
+        loaded = 0
+        # The shared directory has the entries already, the snapshot only the counts:
+        entries = snapshot.get("entries", []) if self.shared is None else []
+        for entry in entries:
+            # Entries of unknown age, from older snapshots, are dropped too:
+            written = entry.get("written")
+            if written is None or written + self.ttl < now:
+                continue
+            self.put(
+                entry["path"],
+                entry["variant"],
+                base64.b64decode(entry["body"]),
+                count=False,
+                written=written,
+            )
+            loaded += 1
+        self.requests.update(snapshot.get("requests", {}))
+        return loaded
+
+
+RESPONSE_CACHE = web.AppKey("response_cache", ResponseCache)
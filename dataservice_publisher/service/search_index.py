@@ -0,0 +1,260 @@
+"""Module for searching catalogs and data services by keyword."""
+
+import asyncio
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+import logging
+from os import environ as env
+import re
+from typing import Counter, Dict, List, Optional, Set, Tuple
+
+from aiohttp import web
+from dotenv import load_dotenv
+from rdflib import DCAT, DCTERMS
+from rdflib.graph import Graph, URIRef
+
+from dataservice_publisher.service.catalog_registry import (
+    CATALOG_REGISTRY,
+    CatalogRegistry,
+    CatalogSummary,
+)
+from dataservice_publisher.service.catalog_service import catalog_id, get_catalog_by_id
+
+load_dotenv()
+SEARCH_INDEX_CONCURRENCY = int(env.get("SEARCH_INDEX_CONCURRENCY", 4))
+# The seconds between refreshes of the index from the catalog registry:
+SEARCH_INDEX_INTERVAL = float(env.get("SEARCH_INDEX_INTERVAL", 10))
+# Build the index when the worker starts, rather than on the first search:
+SEARCH_INDEX_WARMUP = env.get("SEARCH_INDEX_WARMUP", "false").lower() == "true"
+
+# The properties whose values are indexed, for catalogs and data services:
+INDEXED_PROPERTIES = [
+    DCTERMS.title,
+    DCTERMS.description,
+    DCAT.endpointURL,
+    DCAT.endpointDescription,
+    DCAT.mediaType,
+]
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text, e.g. a title or an url, into lower case words."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+@dataclass
+class SearchEntry:
+    """A catalog or data service that can be found by searching."""
+
+    resource: URIRef
+    catalog: str
+    publisher: Optional[str]
+    graph: Graph
+    tokens: Counter[str] = field(default_factory=Counter)
+
+
+class SearchIndex:
+    """Inverted index from words to the catalogs and data services having them.
+
+    Catalogs created or deleted by this worker are indexed directly. Changes
+    by other workers are found by comparing the modification times in the
+    catalog registry with the time each catalog was indexed, by a background
+    task, so that searches never wait for catalogs to be fetched. The task is
+    started by the first search, which waits for the index to be built, or
+    when the worker starts if warming up.
+    """
+
+    def __init__(self) -> None:
+        """Inits the index."""
+        self._postings: Dict[str, Dict[URIRef, int]] = defaultdict(dict)
+        self._entries: Dict[URIRef, SearchEntry] = {}
+        self._catalogs: Dict[str, Tuple[datetime, List[URIRef]]] = {}
+        self._lock = asyncio.Lock()
+        self._changed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        # Whether the index has been built from the registry once:
+        self.ready = False
+        self._built = asyncio.Event()
+
+    def start(self, registry: CatalogRegistry) -> None:
+        """Start keeping the index up to date in the background, unless started."""
+        if self._task is None:
+            self._task = asyncio.create_task(self.run(registry))
+
+    async def wait_ready(self, registry: CatalogRegistry, timeout: float) -> bool:
+        """Start the index unless started, and wait at most timeout seconds for it."""
+        self.start(registry)
+        if not self.ready:
+            try:
+                await asyncio.wait_for(asyncio.shield(self._built.wait()), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.ready
+
+    def stop(self) -> None:
+        """Stop keeping the index up to date."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def run(
+        self, registry: CatalogRegistry, interval: float = SEARCH_INDEX_INTERVAL
+    ) -> None:
+        """Refresh the index every interval, or when woken, until cancelled."""
+        while True:
+            try:
+                await self.refresh(await registry.summaries())
+                self.ready = True
+                self._built.set()
+            except Exception:
+                logging.exception("Refreshing the search index failed")
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def wake(self) -> None:
+        """Refresh the index without waiting for the interval, e.g. on a change."""
+        self._changed.set()
+
+    def add_catalog(
+        self, identifier: str, graph: Graph, indexed: Optional[datetime] = None
+    ) -> None:
+        """Index the catalog and its data services, replacing an earlier version."""
+        self.remove_catalog(identifier)
+        catalog = URIRef(identifier)
+        catalog_publisher = graph.value(catalog, DCTERMS.publisher)
+        resources: List[URIRef] = []
+        if (catalog, None, None) in graph:
+            services = graph.objects(catalog, DCAT.service)
+            resources += [catalog] + sorted(URIRef(str(s)) for s in services)
+        for resource in resources:
+            publisher = graph.value(resource, DCTERMS.publisher, default=None)
+            publisher = publisher if publisher is not None else catalog_publisher
+            entry = SearchEntry(
+                resource=resource,
+                catalog=str(identifier),
+                publisher=str(publisher) if publisher is not None else None,
+                graph=Graph(),
+            )
+            for p, o in graph.predicate_objects(resource):
+                entry.graph.add((resource, p, o))
+                if p in INDEXED_PROPERTIES:
+                    entry.tokens.update(tokenize(str(o)))
+            if resource != catalog:
+                entry.graph.add((catalog, DCAT.service, resource))
+            self._entries[entry.resource] = entry
+            for token, count in entry.tokens.items():
+                self._postings[token][entry.resource] = count
+        self._catalogs[str(identifier)] = (
+            indexed or datetime.now(timezone.utc),
+            resources,
+        )
+
+    def remove_catalog(self, identifier: str) -> None:
+        """Remove the catalog and its data services from the index."""
+        _, resources = self._catalogs.pop(str(identifier), (None, []))
+        for resource in resources:
+            entry = self._entries.pop(resource, None)
+            if entry is None:
+                continue
+            for token in entry.tokens:
+                postings = self._postings.get(token, {})
+                postings.pop(resource, None)
+                if not postings:
+                    self._postings.pop(token, None)
+
+    async def refresh(self, summaries: List[CatalogSummary]) -> None:
+        """Index the catalogs changed by other workers, and drop deleted ones."""
+        async with self._lock:
+            known = {summary.identifier for summary in summaries}
+            for identifier in [c for c in self._catalogs if c not in known]:
+                self.remove_catalog(identifier)
+            stale = [
+                summary.identifier
+                for summary in summaries
+                if summary.identifier not in self._catalogs
+                or (
+                    summary.modified is not None
+                    and _utc(summary.modified) > self._catalogs[summary.identifier][0]
+                )
+            ]
+            if not stale:
+                return
+            logging.debug("Indexing %s catalogs for search", len(stale))
+            semaphore = asyncio.Semaphore(SEARCH_INDEX_CONCURRENCY)
+
+            async def _index(identifier: str) -> None:
+                async with semaphore:
+                    # Changes made while the catalog is fetched are indexed later:
+                    indexed = datetime.now(timezone.utc)
+                    graph = await get_catalog_by_id(catalog_id(identifier))
+                    self.add_catalog(identifier, graph, indexed)
+
+            await asyncio.gather(*[_index(identifier) for identifier in stale])
+
+    def search(
+        self,
+        q: str = "",
+        publisher: Optional[str] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> Tuple[int, List[URIRef]]:
+        """Return the number of resources with all words in q, and a page of them."""
+        tokens = set(tokenize(q))
+        hits: Set[URIRef]
+        if tokens:
+            postings = [self._postings.get(token, {}) for token in tokens]
+            postings.sort(key=len)
+            hits = set(postings[0]).intersection(*postings[1:])
+        elif q.strip():
+            # A q without words, e.g. punctuation only, matches nothing:
+            hits = set()
+        else:
+            hits = set(self._entries)
+        if publisher is not None:
+            hits = {hit for hit in hits if self._entries[hit].publisher == publisher}
+
+        def _score(hit: URIRef) -> Tuple[int, str]:
+            entry = self._entries[hit]
+            return (-sum(entry.tokens[token] for token in tokens), str(hit))
+
+        ranked = sorted(hits, key=_score)
+        end = None if limit is None else offset + limit
+        return len(ranked), ranked[offset:end]
+
+    def graph(self, resources: List[URIRef]) -> Graph:
+        """Return a graph describing the resources."""
+        graph = Graph()
+        graph.bind("dcat", DCAT)
+        graph.bind("dct", DCTERMS)
+        for resource in resources:
+            graph += self._entries[resource].graph
+        return graph
+
+    def __len__(self) -> int:
+        """Return the number of indexed catalogs and data services."""
+        return len(self._entries)
+
+
+def _utc(timestamp: datetime) -> datetime:
+    if timestamp.tzinfo is None:
+        return timestamp.replace(tzinfo=timezone.utc)
+    return timestamp
+
+
+SEARCH_INDEX = web.AppKey("search_index", SearchIndex)
+
+
+async def start_search_index(app: web.Application) -> None:
+    """Start building the index in the background, if warming up."""
+    if SEARCH_INDEX_WARMUP:
+        app[SEARCH_INDEX].start(app[CATALOG_REGISTRY])
+
+
+async def stop_search_index(app: web.Application) -> None:
+    """Stop refreshing the index."""
+    app[SEARCH_INDEX].stop()
@@ -0,0 +1,164 @@
+"""Module for moving catalogs to the datasets the shard map gives them, e.g. when adding one.
+
+Run it after changing FUSEKI_SHARDS, with the datasets being removed, if any:
+
+    python -m dataservice_publisher.service.shard_rebalancing --from URL,URL
+"""
+
+import argparse
+import asyncio
+import logging
+from os import environ as env
+from typing import Any, Dict, Iterable, List, Tuple
+
+from dotenv import load_dotenv
+from rdflib.graph import Graph, URIRef
+from SPARQLWrapper import JSON, POST, SPARQLWrapper, TURTLE
+
+from dataservice_publisher.service.catalog_registry import (
+    DSP,
+    METADATA_GRAPH,
+    summary_delete,
+)
+from dataservice_publisher.service.catalog_service import catalog_delete, graph_replace
+from dataservice_publisher.service.catalog_versions import deltas_delete, DELTAS_GRAPH
+from dataservice_publisher.service.shards import (
+    parse_shards,
+    ShardMap,
+    SHARDS,
+    update_endpoint,
+)
+
+load_dotenv()
+FUSEKI_PASSWORD = env.get("FUSEKI_PASSWORD")
+
+# A catalog, the dataset keeping it and the dataset the shard map gives it:
+Move = Tuple[str, str, str]
+
+
+async def rebalance(
+    shards: ShardMap = SHARDS, removed: Iterable[str] = (), dry_run: bool = False
+) -> List[Move]:
+    """Move every catalog kept by another dataset than its own, returning the moves."""
+    moves = []
+    for source in dict.fromkeys([*shards.endpoints, *removed]):
+        for identifier in await kept_catalogs(source):
+            target = shards.endpoint(identifier)
+            if target == source:
+                continue
+            moves.append((identifier, source, target))
+            if dry_run:
+                logging.info("Would move %s from %s to %s", identifier, source, target)
+            else:
+                await move_catalog(identifier, source, target)
+    return moves
+
+
+async def kept_catalogs(endpoint: str) -> List[str]:
+    """Return the identifiers of the catalogs kept by the dataset."""
+    # The graph of a catalog is named by its identifier, whatever it says:
+    rows = await _select(
+        endpoint,
+        """
+        SELECT DISTINCT ?g
+        WHERE {
+            GRAPH ?g { ?s ?p ?o }
+            FILTER (!STRSTARTS(STR(?g), "%s"))
+        }
+        """
+        % (DSP,),
+    )
+    return sorted(row["g"] for row in rows)
+
+
+async def move_catalog(identifier: str, source: str, target: str) -> None:
+    """Copy the graph, summary and deltas of the catalog to target, then drop them."""
+    context = URIRef(identifier)
+    graph = await _construct(
+        source, "CONSTRUCT { ?s ?p ?o } WHERE { GRAPH <%s> { ?s ?p ?o } }" % (context,)
+    )
+    summary = await _construct(
+        source,
+        "CONSTRUCT { <%s> ?p ?o } WHERE { GRAPH <%s> { <%s> ?p ?o } }"
+        % (context, METADATA_GRAPH, context),
+    )
+    deltas = await _construct(
+        source,
+        """
+        CONSTRUCT { ?delta ?p ?o }
+        WHERE { GRAPH <%s> { ?delta <%s> <%s> ; ?p ?o } }
+        """
+        % (DELTAS_GRAPH, DSP.catalog, context),
+    )
+    # Copied before it is dropped, a move cut short is completed by running again:
+    await _update(
+        target,
+        " ;\n".join(
+            [
+                graph_replace(context, graph),
+                summary_delete(identifier),
+                _insert(METADATA_GRAPH, summary),
+                deltas_delete(identifier),
+                _insert(DELTAS_GRAPH, deltas),
+            ]
+        ),
+    )
+    await _update(source, catalog_delete(context))
+    logging.info(
+        "Moved %s (%s triples) from %s to %s", identifier, len(graph), source, target
+    )
+
+
+def _insert(context: URIRef, graph: Graph) -> str:
+    return "INSERT DATA { GRAPH <%s> { %s } }" % (context, graph.serialize(format="nt"))
+
+
+async def _select(endpoint: str, querystring: str) -> List[Dict[str, str]]:
+    sparql = SPARQLWrapper(endpoint)
+    sparql.setQuery(querystring)
+    sparql.setReturnFormat(JSON)
+    result = await asyncio.to_thread(sparql.queryAndConvert)
+    bindings: List[Dict[str, Any]] = result["results"]["bindings"]  # type: ignore
+    return [{name: b[name]["value"] for name in b} for b in bindings]
+
+
+async def _construct(endpoint: str, querystring: str) -> Graph:
+    sparql = SPARQLWrapper(endpoint)
+    sparql.setQuery(querystring)
+    sparql.setReturnFormat(TURTLE)
+    sparql.setOnlyConneg(True)
+    data = await asyncio.to_thread(sparql.queryAndConvert)
+    return Graph().parse(data=data, format="turtle")  # type: ignore
+
+
+async def _update(endpoint: str, update: str) -> None:
+    sparql = SPARQLWrapper(update_endpoint(endpoint))
+    sparql.setCredentials("admin", FUSEKI_PASSWORD)
+    sparql.setMethod(POST)
+    sparql.setQuery(update)
+    await asyncio.to_thread(sparql.query)
+
+
+def main() -> None:
+    """Rebalance the catalogs over the datasets of FUSEKI_SHARDS."""
+    parser = argparse.ArgumentParser(
+        description="Move the catalogs to the datasets FUSEKI_SHARDS gives them."
+    )
+    parser.add_argument(
+        "--from",
+        dest="removed",
+        default="",
+        help="the endpoints of datasets being removed, separated by commas",
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="only log the catalogs to move"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
+    removed = parse_shards(args.removed) if args.removed else []
+    moves = asyncio.run(rebalance(SHARDS, removed, args.dry_run))
+    logging.info("%s catalogs %s", len(moves), "to move" if args.dry_run else "moved")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
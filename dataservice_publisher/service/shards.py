@@ -0,0 +1,83 @@
+"""Module for spreading catalogs over several Fuseki datasets by consistent hashing."""
+
+import bisect
+import hashlib
+from os import environ as env
+from typing import Dict, Iterable, List, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+DATASET = env.get("FUSEKI_DATASET_1", "ds")
+FUSEKI_HOST = env.get("FUSEKI_HOST", "http://fuseki")
+FUSEKI_PORT = int(env.get("FUSEKI_PORT", 8080))
+# The endpoints of the datasets keeping the catalogs, separated by commas:
+FUSEKI_SHARDS = env.get("FUSEKI_SHARDS", "")
+# The points of every dataset on the ring, more spread the catalogs more evenly:
+SHARD_VNODES = int(env.get("SHARD_VNODES", 64))
+
+
+def parse_shards(value: str) -> List[str]:
+    """Return the endpoints in the comma separated value, or the single dataset."""
+    endpoints = [endpoint.strip().rstrip("/") for endpoint in value.split(",")]
+    return [endpoint for endpoint in endpoints if endpoint] or [
+        f"{FUSEKI_HOST}:{FUSEKI_PORT}/fuseki/{DATASET}"
+    ]
+
+
+class ShardMap:
+    """Maps every catalog to the dataset keeping it, its graph, summary and deltas.
+
+    Every dataset has a number of points on a ring of hashes, and a catalog is
+    kept by the dataset of the first point at or after the hash of its id. A
+    dataset added to the map takes over only the catalogs nearest its points.
+    """
+
+    def __init__(self, endpoints: List[str], vnodes: int = SHARD_VNODES) -> None:
+        """Inits the map of the endpoints, the order of which does not matter."""
+        if not endpoints:
+            raise ValueError("At least one dataset is needed")
+        self.endpoints = list(dict.fromkeys(endpoints))
+        ring: List[Tuple[int, str]] = sorted(
+            (_hash(f"{endpoint}#{i}"), endpoint)
+            for endpoint in self.endpoints
+            for i in range(vnodes)
+        )
+        self._points = [point for point, _ in ring]
+        self._owners = [endpoint for _, endpoint in ring]
+
+    def endpoint(self, catalog: str) -> str:
+        """Return the endpoint of the dataset of the catalog, given by id or identifier."""
+        if len(self.endpoints) == 1:
+            return self.endpoints[0]
+        i = bisect.bisect_left(self._points, _hash(_catalog_id(catalog)))
+        return self._owners[i % len(self._owners)]
+
+    def group(self, catalogs: Iterable[str]) -> Dict[str, List[str]]:
+        """Return the catalogs by the endpoint of their dataset, in their order."""
+        groups: Dict[str, List[str]] = {}
+        for catalog in catalogs:
+            groups.setdefault(self.endpoint(catalog), []).append(catalog)
+        return groups
+
+
+def update_endpoint(endpoint: str) -> str:
+    """Return the SPARQL Update endpoint of the dataset."""
+    return f"{endpoint}/update"
+
+
+def ping_url(endpoint: str) -> str:
+    """Return the url pinging the Fuseki server of the dataset."""
+    return f"{endpoint.rsplit('/', 1)[0]}/$/ping"
+
+
+def _catalog_id(catalog: str) -> str:
+    # Both http://host/catalogs/1 and 1 are the catalog 1, whatever the host:
+    return str(catalog).rstrip("/").rsplit("/", 1)[-1]
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+SHARDS = ShardMap(parse_shards(FUSEKI_SHARDS))
@@ -0,0 +1,158 @@
+"""Module for caching serialized responses in files shared by the workers of a host."""
+
+import fcntl
+import hashlib
+import logging
+import mmap
+import os
+import shutil
+import struct
+import time
+from typing import Iterable, Optional
+
+# The number of generation counters, paths are hashed to one of them:
+GENERATION_SLOTS = 4096
+_COUNTER = struct.Struct("<Q")
+_SWEEP_EVERY = 100
+
+
+class SharedCache:
+    """Cache of response bodies in files, read through memory maps without copying.
+
+    Every path has a generation, kept in a memory-mapped table of counters.
+    An entry is stored under the generation of its path at the time it was
+    loaded, so invalidating a path, which increments the counter, makes all
+    workers miss its entries at once, including the ones being loaded.
+    Entries expire `ttl` seconds after they were put, and are kept for
+    another `grace` seconds for stale reads.
+    The directory is best put on a RAM-backed file system such as /dev/shm.
+    """
+
+    def __init__(
+        self, directory: str, ttl: float, max_entries: int, grace: float = 0
+    ) -> None:
+        """Inits the cache, creating the directory and the generation table."""
+        self.directory = directory
+        self.ttl = ttl
+        self.grace = grace
+        self.max_entries = max_entries
+        self._puts = 0
+        os.makedirs(directory, exist_ok=True)
+        self._generations_file = os.path.join(directory, "generations")
+        fd = os.open(self._generations_file, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            size = GENERATION_SLOTS * _COUNTER.size
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            self._generations = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+
+    def generation(self, path: str) -> int:
+        """Return the current generation of the path."""
+        return _COUNTER.unpack_from(self._generations, self._slot(path))[0]
+
+    def get(self, path: str, variant: str, stale: bool = False) -> Optional[memoryview]:
+        """Return a view of the fresh body, or of one in the grace window if stale."""
+        filename = self._filename(path, variant, self.generation(path))
+        try:
+            fd = os.open(filename, os.O_RDONLY)
+        except FileNotFoundError:
+            return None
+        try:
+            stat = os.fstat(fd)
+            if stat.st_mtime + self.ttl + (self.grace if stale else 0) < time.time():
+                return None
+            if stat.st_size == 0:
+                return memoryview(b"")
+            # The mapping stays valid even if the file is replaced or removed:
+            return memoryview(mmap.mmap(fd, 0, access=mmap.ACCESS_READ))
+        finally:
+            os.close(fd)
+
+    def put(
+        self,
+        path: str,
+        variant: str,
+        body: bytes,
+        written: Optional[float] = None,
+        generation: Optional[int] = None,
+    ) -> None:
+        """Store the body under the generation it was loaded at, or the current one."""
+        current = self.generation(path)
+        if generation is None:
+            generation = current
+        elif generation != current:
+            # Loaded before the path was invalidated, so it may be stale:
+            logging.debug("Not caching %s, invalidated while it was loaded", path)
+            return
+        # Under the given generation, so that an invalidation racing with the
+        # write leaves the entry behind, where no worker looks for it:
+        filename = self._filename(path, variant, generation)
+        tmp_filename = f"{filename}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            with open(tmp_filename, "wb") as file:
+                file.write(body)
+            if written is not None:
+                # The age of an entry is that of its file:
+                os.utime(tmp_filename, (written, written))
+            os.replace(tmp_filename, filename)
+        except OSError as e:
+            # E.g. the path being invalidated by another worker meanwhile:
+            logging.warning("Could not put %s in the shared cache: %s", path, e)
+            return
+        self._puts += 1
+        if self._puts % _SWEEP_EVERY == 0:
+            self.sweep()
+
+    def invalidate(self, paths: Iterable[str]) -> None:
+        """Move the paths to a new generation, and remove their entries."""
+        with open(self._generations_file, "rb") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                for path in paths:
+                    offset = self._slot(path)
+                    (value,) = _COUNTER.unpack_from(self._generations, offset)
+                    _COUNTER.pack_into(self._generations, offset, value + 1)
+                    shutil.rmtree(self._directory(path), ignore_errors=True)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def sweep(self) -> None:
+        """Remove expired entries, and the oldest ones beyond max_entries."""
+        entries = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if root == self.directory or name.endswith(".tmp"):
+                    continue
+                filename = os.path.join(root, name)
+                try:
+                    entries.append((os.stat(filename).st_mtime, filename))
+                except FileNotFoundError:
+                    pass
+        entries.sort()
+        expired = time.time() - self.ttl - self.grace
+        for i, (mtime, filename) in enumerate(entries):
+            if mtime >= expired and len(entries) - i <= self.max_entries:
+                break
+            try:
+                os.remove(filename)
+            except FileNotFoundError:
+                pass
+        logging.debug("Swept the shared cache, %s entries", len(entries))
+
+    def _slot(self, path: str) -> int:
+        digest = hashlib.blake2b(path.encode(), digest_size=8).digest()
+        return (int.from_bytes(digest, "little") % GENERATION_SLOTS) * _COUNTER.size
+
+    def _directory(self, path: str) -> str:
+        return os.path.join(self.directory, _digest(path))
+
+    def _filename(self, path: str, variant: str, generation: int) -> str:
+        name = _digest(variant)
+        return os.path.join(self._directory(path), f"{name}-{generation}")
+
+
+def _digest(text: str) -> str:
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
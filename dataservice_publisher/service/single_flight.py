@@ -0,0 +1,48 @@
+"""Module for coalescing concurrent identical calls into one."""
+
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+from aiohttp import web
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Lets concurrent calls with the same key share one in-flight call.
+
+    The shared call runs in its own task, and callers wait for it through
+    `asyncio.shield`, so a caller being cancelled does not cancel the call
+    for the others.
+    """
+
+    def __init__(self) -> None:
+        """Inits the single flight group."""
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Return the result of fn, or of the in-flight call with the same key."""
+        return await asyncio.shield(self.go(key, fn))
+
+    def go(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> "asyncio.Task[T]":
+        """Start fn in a task, unless a call with the same key is in flight."""
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        return task
+
+    def in_flight(self) -> int:
+        """Return the number of calls in flight."""
+        return len(self._calls)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Retrieve the exception, in case every caller was cancelled:
+        if not task.cancelled():
+            task.exception()
+
+
+SINGLE_FLIGHT = web.AppKey("single_flight", SingleFlight)
@@ -0,0 +1,48 @@
+"""Module for timing the startup of a worker."""
+
+import logging
+import os
+import time
+from typing import Iterable, Optional
+
+from aiohttp import web
+
+from dataservice_publisher.service.metrics import MetricsRegistry, Sample
+
+
+class StartupTimer:
+    """Times a worker from the creation of its app until its first response."""
+
+    def __init__(self) -> None:
+        """Inits the timer, the worker is starting now."""
+        self.started = time.perf_counter()
+        self.first_response: Optional[float] = None
+
+    async def on_response_prepare(
+        self, request: web.Request, response: web.StreamResponse
+    ) -> None:
+        """Record the time of the first response."""
+        if self.first_response is None:
+            self.first_response = time.perf_counter() - self.started
+            logging.info(
+                "Worker %s sent its first response %.3fs after starting",
+                os.getpid(),
+                self.first_response,
+            )
+
+    def register(self, metrics: MetricsRegistry) -> None:
+        """Expose the startup metrics."""
+        metrics.describe(
+            "worker_first_response_seconds",
+            "gauge",
+            "Seconds from the creation of the app to the first response.",
+        )
+        metrics.add_collector(self.samples)
+
+    def samples(self) -> Iterable[Sample]:
+        """Return the samples of the startup metrics."""
+        if self.first_response is not None:
+            yield "worker_first_response_seconds", {}, self.first_response
+
+
+STARTUP_TIMER = web.AppKey("startup_timer", StartupTimer)
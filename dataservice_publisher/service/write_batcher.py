@@ -0,0 +1,187 @@
+"""Module for coalescing the SPARQL Updates of concurrent publishes into batches."""
+
+import asyncio
+import logging
+from os import environ as env
+from typing import Dict, Iterable, List, Optional, Set
+from urllib.error import HTTPError
+
+from aiohttp import web
+from dotenv import load_dotenv
+from SPARQLWrapper import POST, SPARQLWrapper
+from SPARQLWrapper.SPARQLExceptions import SPARQLWrapperException
+
+from dataservice_publisher.service.metrics import MetricsRegistry, Sample
+from dataservice_publisher.service.shards import update_endpoint
+
+load_dotenv()
+FUSEKI_PASSWORD = env.get("FUSEKI_PASSWORD")
+# The seconds an update waits for others to send with it, 0 sends every update at once:
+WRITE_BATCH_WINDOW = float(env.get("WRITE_BATCH_WINDOW", 0))
+# A batch is sent before the window is up, when it has this many updates or bytes:
+WRITE_BATCH_MAX_UPDATES = int(env.get("WRITE_BATCH_MAX_UPDATES", 32))
+WRITE_BATCH_MAX_BYTES = int(env.get("WRITE_BATCH_MAX_BYTES", 16 * 1024 * 1024))
+
+
+class _Batch:
+    """The updates waiting to be sent to a dataset, and their callers."""
+
+    def __init__(self) -> None:
+        self.updates: List[str] = []
+        self.futures: List[asyncio.Future] = []
+        self.keys: Set[str] = set()
+        self.bytes = 0
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class WriteBatcher:
+    """Sends the updates of concurrent publishes to a dataset in one request.
+
+    Fuseki runs one write transaction at a time, so updates sent together wait
+    for each other less. An update waits at most `window` seconds for others.
+    Fuseki applies a request in one transaction, and a caller is answered only
+    when its batch has been committed. If Fuseki rejects a batch, its updates are
+    sent again one by one, so that every caller gets the outcome of its own
+    update. If the batch could not reach Fuseki, every caller gets the error.
+    """
+
+    def __init__(
+        self,
+        window: float = WRITE_BATCH_WINDOW,
+        max_updates: int = WRITE_BATCH_MAX_UPDATES,
+        max_bytes: int = WRITE_BATCH_MAX_BYTES,
+    ) -> None:
+        """Inits the batcher, which sends every update at once if window is 0."""
+        self.window = window
+        self.max_updates = max_updates
+        self.max_bytes = max_bytes
+        self.batches = 0
+        self.batched_updates = 0
+        self.retried_updates = 0
+        self._pending: Dict[str, _Batch] = {}
+        # Batches to a dataset are sent in order, one at a time:
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._sending: Set[asyncio.Task] = set()
+
+    async def execute(self, endpoint: str, update: str, key: str) -> None:
+        """Run the update of the catalog given by key, in a batch if batching."""
+        if self.window <= 0:
+            await execute_update(endpoint, update)
+            return
+        batch = self._pending.get(endpoint)
+        if batch is not None and key in batch.keys:
+            # Updates of the same catalog go in separate batches, in order:
+            self._send(endpoint)
+            batch = None
+        if batch is None:
+            batch = self._pending[endpoint] = _Batch()
+            batch.timer = asyncio.get_running_loop().call_later(
+                self.window, self._send, endpoint
+            )
+        future = asyncio.get_running_loop().create_future()
+        batch.updates.append(update)
+        batch.futures.append(future)
+        batch.keys.add(key)
+        batch.bytes += len(update)
+        if len(batch.updates) >= self.max_updates or batch.bytes >= self.max_bytes:
+            self._send(endpoint)
+        # The update is sent, even if the caller gives up waiting for it:
+        await asyncio.shield(future)
+
+    async def flush(self) -> None:
+        """Send the waiting updates, and wait until every batch has been sent."""
+        for endpoint in list(self._pending):
+            self._send(endpoint)
+        await asyncio.gather(*self._sending, return_exceptions=True)
+
+    def _send(self, endpoint: str) -> None:
+        batch = self._pending.pop(endpoint, None)
+        if batch is None:
+            return
+        if batch.timer is not None:
+            batch.timer.cancel()
+        task = asyncio.create_task(self._run(endpoint, batch))
+        self._sending.add(task)
+        task.add_done_callback(self._sending.discard)
+
+    async def _run(self, endpoint: str, batch: _Batch) -> None:
+        async with self._locks.setdefault(endpoint, asyncio.Lock()):
+            self.batches += 1
+            self.batched_updates += len(batch.updates)
+            try:
+                await execute_update(endpoint, " ;\n".join(batch.updates))
+            except (SPARQLWrapperException, HTTPError) as e:
+                if len(batch.updates) == 1:
+                    _set_exception(batch.futures[0], e)
+                    return
+                logging.warning(
+                    "Batch of %s updates failed, sending them one by one: %s",
+                    len(batch.updates),
+                    e,
+                )
+                for update, future in zip(batch.updates, batch.futures, strict=True):
+                    self.retried_updates += 1
+                    try:
+                        await execute_update(endpoint, update)
+                    except Exception as e:
+                        _set_exception(future, e)
+                    else:
+                        _set_result(future)
+                return
+            except Exception as e:
+                # A timeout or lost connection, sending again one by one would not help:
+                for future in batch.futures:
+                    _set_exception(future, e)
+                return
+            logging.debug("Sent a batch of %s updates", len(batch.updates))
+            for future in batch.futures:
+                _set_result(future)
+
+    def register(self, metrics: MetricsRegistry) -> None:
+        """Expose the batching metrics."""
+        metrics.describe(
+            "write_batches_total", "counter", "Batches of updates sent to Fuseki."
+        )
+        metrics.describe(
+            "write_batched_updates_total", "counter", "Updates sent in batches."
+        )
+        metrics.describe(
+            "write_retried_updates_total",
+            "counter",
+            "Updates sent again on their own, after their batch failed.",
+        )
+        metrics.add_collector(self.samples)
+
+    def samples(self) -> Iterable[Sample]:
+        """Return the samples of the batching metrics."""
+        yield "write_batches_total", {}, self.batches
+        yield "write_batched_updates_total", {}, self.batched_updates
+        yield "write_retried_updates_total", {}, self.retried_updates
+
+
+async def execute_update(endpoint: str, update: str) -> None:
+    """Run the SPARQL Update on the dataset."""
+    sparql = SPARQLWrapper(update_endpoint(endpoint))
+    sparql.setCredentials("admin", FUSEKI_PASSWORD)
+    sparql.setMethod(POST)
+    sparql.setQuery(update)
+    await asyncio.to_thread(sparql.query)
+
+
+def _set_result(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+def _set_exception(future: asyncio.Future, error: Exception) -> None:
+    if not future.done():
+        future.set_exception(error)
+
+
+# Shared by the requests and publish jobs of the app:
+WRITE_BATCHER = web.AppKey("write_batcher", WriteBatcher)
+
+
+async def flush_writes(app: web.Application) -> None:
+    """Send the waiting updates before the worker stops."""
+    await app[WRITE_BATCHER].flush()
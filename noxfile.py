@@ -5,7 +5,7 @@ import sys
 import nox
 from nox_poetry import Session, session
 
-locations = "dataservice_publisher", "tests", "noxfile.py", "docs/conf.py"
+locations = "dataservice_publisher", "tests", "benchmarks", "noxfile.py", "docs/conf.py"
 nox.options.envdir = ".cache"
 nox.options.reuse_existing_virtualenvs = True
 package = "dataservice_publisher"
@@ -105,6 +105,13 @@ def contract_tests(session: Session) -> None:
     )
 
 
+@session(python="3.10")
+def startup_benchmark(session: Session) -> None:
+    """Benchmark the import time and the time to first response of workers."""
+    session.install(".")
+    session.run("python", "benchmarks/startup.py", *session.posargs)
+
+
 @session(python="3.10")
 def black(session: Session) -> None:
     """Run black code formatter."""
@@ -1,8 +1,11 @@
 """Integration test cases for the catalogs route."""
 
+import asyncio
 import json
 from os import environ as env
-from typing import Any, Dict
+import time
+from typing import Any, Dict, Tuple
+from urllib.error import URLError
 
 from aiohttp import hdrs
 from aiohttp.test_utils import TestClient as _TestClient
@@ -10,11 +13,23 @@ from dotenv import load_dotenv
 from multidict import MultiDict
 import pytest
 from pytest_mock import MockFixture
-from rdflib import Graph
+from rdflib import Dataset, DCTERMS, Graph, URIRef
 from rdflib.compare import graph_diff, isomorphic
+from SPARQLWrapper import SPARQLWrapper
 from SPARQLWrapper.SPARQLExceptions import SPARQLWrapperException
 import yaml
 
+from dataservice_publisher import create_app
+from dataservice_publisher.service.catalog_registry import CatalogSummary
+from dataservice_publisher.service.catalog_service import content_hash, request_hash
+from dataservice_publisher.service.catalog_snapshots import (
+    CATALOG_SNAPSHOTS,
+    CatalogSnapshots,
+)
+from dataservice_publisher.service.catalog_versions import Delta
+from dataservice_publisher.service.oas_loader import SpecTiming
+from dataservice_publisher.service.response_cache import ResponseCache
+
 load_dotenv()
 DATASET = env.get("FUSEKI_DATASET_1", "ds")
 
@@ -92,6 +107,137 @@ async def test_catalogs_serializers(client: _TestClient, mocker: MockFixture) ->
     assert 406 == response.status, "not/acceptable failed"
 
 
+@pytest.mark.integration
+async def test_catalogs_quad_serializers(
+    client: _TestClient, mocker: MockFixture
+) -> None:
+    """Should return the catalog in a named graph."""
+    # Set up the mock
+    mocker.patch(
+        "SPARQLWrapper.SPARQLWrapper.queryAndConvert",
+        return_value=_mock_query_and_convert_result(),
+    )
+    for serializer in ["application/n-quads", "application/trig"]:
+        headers = MultiDict([(hdrs.ACCEPT, serializer)])
+        response = await client.get("/catalogs/123", headers=headers)
+        assert 200 == response.status, f"{serializer} failed"
+        assert f"{serializer}; charset=utf-8" == response.headers["Content-Type"]
+        data = await response.text()
+        g = Dataset()
+        g.parse(data=data, format=serializer)
+        named_graph = g.graph(URIRef("http://localhost:8000/catalogs/123"))
+        assert 0 < len(named_graph), f"{serializer} has no triples"
+
+
+@pytest.mark.integration
+async def test_catalogs_compacted_json_ld(
+    client: _TestClient, mocker: MockFixture
+) -> None:
+    """Should return compacted json-ld only when the profile is asked for."""
+    # Set up the mock
+    mocker.patch(
+        "SPARQLWrapper.SPARQLWrapper.queryAndConvert",
+        return_value=_mock_query_and_convert_result(),
+    )
+    profile = 'application/ld+json; profile="http://www.w3.org/ns/json-ld#compacted"'
+    headers = MultiDict([(hdrs.ACCEPT, f"text/turtle;q=0.5, {profile}")])
+
+    response = await client.get("/catalogs", headers=headers)
+
+    assert 200 == response.status
+    assert f"{profile}; charset=utf-8" == response.headers["Content-Type"]
+    data = await response.json()
+    assert "@context" in data
+    g = Graph().parse(data=json.dumps(data), format="json-ld")
+    assert 0 < len(g)
+
+    headers = MultiDict([(hdrs.ACCEPT, "application/ld+json")])
+    response = await client.get("/catalogs", headers=headers)
+
+    assert 200 == response.status
+    assert "application/ld+json; charset=utf-8" == response.headers["Content-Type"]
+    expanded = await response.json()
+    assert isinstance(expanded, list)
+    expanded_g = Graph().parse(data=json.dumps(expanded), format="json-ld")
+    assert isomorphic(g, expanded_g)
+
+
+@pytest.mark.integration
+async def test_catalogs_gzip(client: _TestClient, mocker: MockFixture) -> None:
+    """Should compress the response only when gzip is preferred."""
+    # Set up the mock
+    mocker.patch(
+        "SPARQLWrapper.SPARQLWrapper.queryAndConvert",
+        return_value=_mock_query_and_convert_result(),
+    )
+    for accept_encoding, content_encoding in [
+        ("gzip, deflate", "gzip"),
+        ("gzip;q=0.5, identity", None),
+        ("identity;q=0, gzip;q=0.1", "gzip"),
+        ("gzip;q=0", None),
+    ]:
+        headers = MultiDict([(hdrs.ACCEPT_ENCODING, accept_encoding)])
+        response = await client.get("/catalogs", headers=headers)
+        assert 200 == response.status
+        assert content_encoding == response.headers.get(hdrs.CONTENT_ENCODING)
+        data = await response.text()
+        g = Graph().parse(data=data, format="turtle")
+        assert 0 < len(g), f"{accept_encoding} has no triples"
+
+
+@pytest.mark.integration
+async def test_catalogs_filtered_by_publisher(
+    client: _TestClient, mocker: MockFixture
+) -> None:
+    """Should return 200 and only the catalogs of the publisher."""
+    # Set up the mock
+    mocker.patch(
+        "SPARQLWrapper.SPARQLWrapper.queryAndConvert",
+        return_value=_mock_full_query_result(),
+    )
+    publisher = "https://data.brreg.no/enhetsregisteret/api/enheter/961181399"
+
+    response = await client.get(
+        "/catalogs", params={"publisher": publisher, "sort": "title", "limit": "10"}
+    )
+    assert 200 == response.status
+    g = Graph().parse(data=await response.text(), format="turtle")
+    assert [URIRef(f"{env.get('DATASERVICE_PUBLISHER_URL')}/catalogs/1")] == list(
+        g.subjects(DCTERMS.publisher, URIRef(publisher))
+    )
+
+    response = await client.get("/catalogs", params={"publisher": "urn:other"})
+    assert 200 == response.status
+    g = Graph().parse(data=await response.text(), format="turtle")
+    assert 0 == len(g)
+
+    # Streamed, compressed on the fly:
+    headers = MultiDict(
+        [(hdrs.ACCEPT, "application/n-triples"), (hdrs.ACCEPT_ENCODING, "gzip")]
+    )
+    response = await client.get(
+        "/catalogs", params={"publisher": publisher}, headers=headers
+    )
+    assert 200 == response.status
+    assert "gzip" == response.headers[hdrs.CONTENT_ENCODING]
+    g = Graph().parse(data=await response.text(), format="nt")
+    assert 0 < len(g)
+
+
+@pytest.mark.integration
+async def test_catalogs_unknown_sort(client: _TestClient, mocker: MockFixture) -> None:
+    """Should return 400."""
+    # Set up the mock
+    mocker.patch(
+        "SPARQLWrapper.SPARQLWrapper.queryAndConvert",
+        return_value=_mock_query_and_convert_result(),
+    )
+
+    response = await client.get("/catalogs", params={"sort": "description"})
+
+    assert 400 == response.status
+
+
 @pytest.mark.integration
 async def test_catalog_by_id(client: _TestClient, mocker: MockFixture) -> None:
     """Should return 200 and a turtle serialization."""
@@ -111,6 +257,119 @@ async def test_catalog_by_id(client: _TestClient, mocker: MockFixture) -> None:
     assert 0 < len(g)
 
 
+@pytest.mark.integration
+async def test_catalog_by_id_is_cached(
+    aiohttp_client: Any, mocker: MockFixture
+) -> None:
+    """Should serve the second read from the cache, when enabled."""
+    mocker.patch(
+        "dataservice_publisher.app.ResponseCache",
+        lambda: ResponseCache(ttl=60, shared_dir=""),
+    )
+    client = await aiohttp_client(await create_app())
+    # Set up the mock
+    query_and_convert = mocker.patch(
+        "SPARQLWrapper.SPARQLWrapper.queryAndConvert",
+        return_value=_mock_query_and_convert_result(),
+    )
+
+    response = await client.get("/catalogs/123")
+    assert 200 == response.status
+    response = await client.get("/catalogs/123")
+    assert 200 == response.status
+
+    assert query_and_convert.call_count == 1
+    data = await response.text()
+    g = Graph().parse(data=data, format="turtle")
+    assert 0 < len(g)
+
+
+@pytest.mark.integration
+async def test_catalog_by_id_stale_while_revalidate(
+    aiohttp_client: Any, mocker: MockFixture
+) -> None:
+    """Should serve an expired read, while one background task refreshes it."""
+    mocker.patch(
+        "dataservice_publisher.app.ResponseCache",
+        lambda: ResponseCache(ttl=0.5, shared_dir="", stale_while_revalidate=60),
+    )
+    client = await aiohttp_client(await create_app())
+    query_and_convert = mocker.patch(
+        "SPARQLWrapper.SPARQLWrapper.queryAndConvert",
+        side_effect=_slow_query_and_convert_result,
+    )
+    response = await client.get("/catalogs/123")
+    assert 200 == response.status
+    assert "stale-while-revalidate=60" in response.headers[hdrs.CACHE_CONTROL]
+    await asyncio.sleep(0.6)
+
+    responses = await asyncio.gather(*[client.get("/catalogs/123") for _ in range(5)])
+
+    assert [200] * 5 == [response.status for response in responses]
+    # The stale reads did not wait for the refresh, which is still in flight:
+    assert query_and_convert.call_count == 2
+    await asyncio.sleep(0.2)
+    response = await client.get("/catalogs/123")
+    assert 200 == response.status
+    assert query_and_convert.call_count == 2
+
+
+@pytest.mark.integration
+async def test_catalog_by_id_concurrent_reads(
+    client: _TestClient, mocker: MockFixture
+) -> None:
+    """Should share one backend call between concurrent identical reads."""
+    # Set up the mock
+    query_and_convert = mocker.patch(
+        "SPARQLWrapper.SPARQLWrapper.queryAndConvert",
+        side_effect=_slow_query_and_convert_result,
+    )
+
+    responses = await asyncio.gather(*[client.get("/catalogs/123") for _ in range(5)])
+
+    assert [response.status for response in responses] == [200] * 5
+    assert query_and_convert.call_count == 1
+
+
+@pytest.mark.integration
+async def test_catalog_by_id_from_snapshot(
+    aiohttp_client: Any, mocker: MockFixture, tmp_path: Any
+) -> None:
+    """Should serve the last known catalog while the backend is down."""
+    mocker.patch(
+        "dataservice_publisher.app.CatalogSnapshots",
+        lambda: CatalogSnapshots(str(tmp_path)),
+    )
+    client = await aiohttp_client(await create_app())
+    query = mocker.patch(
+        "SPARQLWrapper.SPARQLWrapper.queryAndConvert",
+        return_value=_mock_query_and_convert_result(),
+    )
+    response = await client.get("/catalogs/123")
+    assert 200 == response.status
+    expected = Graph().parse(data=await response.text(), format="turtle")
+    await client.app[CATALOG_SNAPSHOTS].flush()
+
+    query.side_effect = URLError("Connection refused")
+    headers = MultiDict([(hdrs.ACCEPT, "application/ld+json")])
+    for _ in range(3):
+        response = await client.get("/catalogs/123", headers=headers)
+        assert 200 == response.status
+        assert "application/ld+json; charset=utf-8" == response.headers["Content-Type"]
+        assert "110" in response.headers[hdrs.WARNING]
+        assert 0 <= int(response.headers[hdrs.AGE])
+        g = Graph().parse(data=await response.text(), format="json-ld")
+        assert isomorphic(g, expected)
+    # The circuit is open, and the backend is not called:
+    calls = query.call_count
+    response = await client.get("/catalogs/123", headers=headers)
+    assert 200 == response.status
+    assert calls == query.call_count
+
+    response = await client.get("/catalogs/456")
+    assert 503 == response.status
+
+
 @pytest.mark.integration
 async def test_catalog_by_id_unsupported_accept_header(
     client: _TestClient, mocker: MockFixture
@@ -128,13 +387,78 @@ async def test_catalog_by_id_unsupported_accept_header(
     assert 406 == response.status
 
 
+@pytest.mark.integration
+async def test_catalog_changes(client: _TestClient, mocker: MockFixture) -> None:
+    """Should return 200 and the net change since the version, as RDF Patch."""
+    identifier = f"{env.get('DATASERVICE_PUBLISHER_URL')}/catalogs/1"
+    mocker.patch(
+        "dataservice_publisher.resources.catalogs.fetch_catalog_summary",
+        return_value=CatalogSummary(identifier, {}, None, 0, None, 3, '"abc"'),
+    )
+    mocker.patch(
+        "dataservice_publisher.resources.catalogs.fetch_deltas",
+        return_value=[
+            (2, Delta(added={"<a:s> <a:p> <a:b>"}, removed={"<a:s> <a:p> <a:a>"})),
+            (3, Delta(added={"<a:s> <a:p> <a:c>"}, removed={"<a:s> <a:p> <a:b>"})),
+        ],
+    )
+
+    response = await client.get("/catalogs/1/changes", params={"since": "1"})
+
+    assert 200 == response.status
+    assert "application/rdf-patch" == response.headers[hdrs.CONTENT_TYPE].split(";")[0]
+    assert "3" == response.headers["X-Catalog-Version"]
+    assert '"abc"' == response.headers[hdrs.ETAG]
+    assert [
+        f"H id <{identifier}#version-3> .",
+        f"H prev <{identifier}#version-1> .",
+        "TX .",
+        "D <a:s> <a:p> <a:a> .",
+        "A <a:s> <a:p> <a:c> .",
+        "TC .",
+    ] == (await response.text()).splitlines()
+
+
+@pytest.mark.integration
+async def test_catalog_changes_gone(client: _TestClient, mocker: MockFixture) -> None:
+    """Should return 410 when the deltas since the version are no longer kept."""
+    identifier = f"{env.get('DATASERVICE_PUBLISHER_URL')}/catalogs/1"
+    mocker.patch(
+        "dataservice_publisher.resources.catalogs.fetch_catalog_summary",
+        return_value=CatalogSummary(identifier, {}, None, 0, None, 20),
+    )
+    mocker.patch(
+        "dataservice_publisher.resources.catalogs.fetch_deltas",
+        return_value=[(v, Delta(added={str(v)})) for v in range(11, 21)],
+    )
+
+    response = await client.get("/catalogs/1/changes", params={"since": "1"})
+
+    assert 410 == response.status
+
+
+@pytest.mark.integration
+async def test_catalog_changes_bad_request(
+    client: _TestClient, mocker: MockFixture
+) -> None:
+    """Should return 400 when since is not a version, 404 for unknown catalogs."""
+    mocker.patch(
+        "dataservice_publisher.resources.catalogs.fetch_catalog_summary",
+        return_value=None,
+    )
+
+    assert 400 == (await client.get("/catalogs/1/changes")).status
+    assert 400 == (await client.get("/catalogs/1/changes?since=x")).status
+    assert 404 == (await client.get("/catalogs/1/changes?since=1")).status
+
+
 @pytest.mark.integration
 async def test_delete_catalog(client: _TestClient, mocker: MockFixture) -> None:
     """Should return 204 No Content."""
     # Set up the mock
     mocker.patch(
         "SPARQLWrapper.SPARQLWrapper.queryAndConvert",
-        return_value=_mock_query_and_convert_result(),
+        return_value={"boolean": True},
     )
     mocker.patch("SPARQLWrapper.SPARQLWrapper.query", return_value=_mock_query_result())
     mocker.patch("jwt.decode", return_value={"sub": "123"})
@@ -151,7 +475,10 @@ async def test_delete_catalog_does_not_exist(
 ) -> None:
     """Should return 204 No Content."""
     # Set up the mock
-    mocker.patch("SPARQLWrapper.SPARQLWrapper.queryAndConvert", return_value="")
+    mocker.patch(
+        "SPARQLWrapper.SPARQLWrapper.queryAndConvert",
+        return_value={"boolean": False},
+    )
     mocker.patch("SPARQLWrapper.SPARQLWrapper.query", return_value=_mock_query_result())
     mocker.patch("jwt.decode", return_value={"sub": "123"})
     headers = MultiDict([(hdrs.AUTHORIZATION, "Bearer blablabla")])
@@ -169,7 +496,7 @@ async def test_delete_catalog_unsuccessful_result(
     # Set up the mock
     mocker.patch(
         "SPARQLWrapper.SPARQLWrapper.queryAndConvert",
-        return_value=_mock_query_and_convert_result(),
+        return_value={"boolean": True},
     )
     mocker.patch(
         "SPARQLWrapper.SPARQLWrapper.query",
@@ -191,7 +518,7 @@ async def test_delete_catalog_fails_with_exception(
     # Configure the mock to return a response with an OK status code.
     mocker.patch(
         "SPARQLWrapper.SPARQLWrapper.queryAndConvert",
-        return_value=_mock_query_and_convert_result(),
+        return_value={"boolean": True},
     )
     mocker.patch(
         "SPARQLWrapper.SPARQLWrapper.query",
@@ -205,6 +532,64 @@ async def test_delete_catalog_fails_with_exception(
     assert response.status == 500
 
 
+@pytest.mark.integration
+async def test_batch_delete_catalogs(client: _TestClient, mocker: MockFixture) -> None:
+    """Should return 200 and whether each catalog was deleted, in one update."""
+    url = env.get("DATASERVICE_PUBLISHER_URL")
+    mocker.patch(
+        "SPARQLWrapper.SPARQLWrapper.queryAndConvert",
+        return_value={
+            "results": {
+                "bindings": [
+                    {"g": {"type": "uri", "value": f"{url}/catalogs/1"}},
+                    {"g": {"type": "uri", "value": f"{url}/catalogs/3"}},
+                ]
+            }
+        },
+    )
+    query = mocker.patch(
+        "SPARQLWrapper.SPARQLWrapper.query", return_value=_mock_query_result()
+    )
+    set_query = mocker.spy(SPARQLWrapper, "setQuery")
+    mocker.patch("jwt.decode", return_value={"sub": "123"})
+    headers = MultiDict([(hdrs.AUTHORIZATION, "Bearer blablabla")])
+
+    response = await client.post(
+        "/catalogs/batch-delete", headers=headers, json={"ids": ["1", "2", "3", "1"]}
+    )
+
+    assert 200 == response.status
+    assert {
+        "results": [
+            {"id": "1", "status": 204},
+            {"id": "2", "status": 404},
+            {"id": "3", "status": 204},
+        ]
+    } == await response.json()
+    assert 1 == query.call_count
+    update = set_query.call_args.args[1]
+    assert f"DROP SILENT GRAPH <{url}/catalogs/1>" in update
+    assert f"DROP SILENT GRAPH <{url}/catalogs/3>" in update
+    assert f"<{url}/catalogs/2>" not in update
+
+
+@pytest.mark.integration
+async def test_batch_delete_catalogs_bad_request(
+    client: _TestClient, mocker: MockFixture
+) -> None:
+    """Should return 400 when no list of ids is given, and 401 if unauthenticated."""
+    mocker.patch("jwt.decode", return_value={"sub": "123"})
+    headers = MultiDict([(hdrs.AUTHORIZATION, "Bearer blablabla")])
+
+    response = await client.post(
+        "/catalogs/batch-delete", headers=headers, json={"ids": "1"}
+    )
+    assert 400 == response.status
+
+    response = await client.post("/catalogs/batch-delete", json={"ids": ["1"]})
+    assert 401 == response.status
+
+
 @pytest.mark.integration
 async def test_get_catalog_by_id_does_not_exist(
     client: _TestClient, mocker: MockFixture
@@ -265,13 +650,20 @@ async def test_delete_catalog_unauthenticated_fails(
 async def test_create_catalog_success(client: _TestClient, mocker: MockFixture) -> None:
     """Should return 201 and location header."""
     # Set up the mocks
-    mocker.patch("yaml.safe_load", return_value=_mock_yaml_load())
+    mocker.patch(
+        "dataservice_publisher.service.catalog_service.load_spec",
+        side_effect=_mock_load_spec,
+    )
     mocker.patch("SPARQLWrapper.SPARQLWrapper.query", return_value=True)
     mocker.patch("jwt.decode", return_value={"sub": "123"})
     mocker.patch(
         "SPARQLWrapper.SPARQLWrapper.queryAndConvert",
         return_value=_mock_full_query_result(),
     )
+    mocker.patch(
+        "dataservice_publisher.service.catalog_service.summary_published",
+        return_value=True,
+    )
     headers = MultiDict(
         [
             (hdrs.CONTENT_TYPE, "application/json"),
@@ -308,6 +700,96 @@ async def test_create_catalog_success(client: _TestClient, mocker: MockFixture)
     assert _isomorphic
 
 
+@pytest.mark.integration
+async def test_create_catalog_unchanged(
+    client: _TestClient, mocker: MockFixture
+) -> None:
+    """Should return the stored catalog without writing it, if it is unchanged."""
+    with open("./tests/files/catalog_1.json") as json_file:
+        data = json.load(json_file)
+    request = request_hash(data)
+    mocker.patch(
+        "dataservice_publisher.service.catalog_service.fetch_catalog_summary",
+        return_value=CatalogSummary(
+            data["identifier"],
+            version=2,
+            request_hash=request,
+            content_hash=content_hash(request, ['etag:"v1"'] * len(data["apis"])),
+            idempotency_key="key-1",
+        ),
+    )
+    mocker.patch(
+        "dataservice_publisher.service.catalog_service.fetch_spec_validator",
+        return_value='etag:"v1"',
+    )
+    load_spec = mocker.patch(
+        "dataservice_publisher.service.catalog_service.load_spec",
+        side_effect=_mock_load_spec,
+    )
+    query = mocker.patch("SPARQLWrapper.SPARQLWrapper.query", return_value=True)
+    mocker.patch("jwt.decode", return_value={"sub": "123"})
+    mocker.patch(
+        "SPARQLWrapper.SPARQLWrapper.queryAndConvert",
+        return_value=_mock_full_query_result(),
+    )
+    headers = MultiDict(
+        [
+            (hdrs.CONTENT_TYPE, "application/json"),
+            (hdrs.AUTHORIZATION, "Bearer blablabla"),
+        ]
+    )
+
+    response = await client.post("/catalogs", headers=headers, data=json.dumps(data))
+
+    assert response.status == 200
+    assert "unchanged" == response.headers["X-Publish-Result"]
+    g = Graph().parse(data=await response.text(), format="turtle")
+    assert isomorphic(g, Graph().parse(data=_mock_full_query_result()))
+    load_spec.assert_not_called()
+    query.assert_not_called()
+
+    headers.add("Idempotency-Key", "key-1")
+    data["title"] = {"en": "Another title"}
+    response = await client.post("/catalogs", headers=headers, data=json.dumps(data))
+
+    assert response.status == 422
+    query.assert_not_called()
+
+
+@pytest.mark.integration
+async def test_create_catalog_conflict(
+    client: _TestClient, mocker: MockFixture
+) -> None:
+    """Should return 409, if other publishes keep writing the catalog first."""
+    mocker.patch(
+        "dataservice_publisher.service.catalog_service.load_spec",
+        side_effect=_mock_load_spec,
+    )
+    mocker.patch("SPARQLWrapper.SPARQLWrapper.query", return_value=True)
+    mocker.patch("jwt.decode", return_value={"sub": "123"})
+    mocker.patch(
+        "SPARQLWrapper.SPARQLWrapper.queryAndConvert",
+        return_value=_mock_full_query_result(),
+    )
+    mocker.patch(
+        "dataservice_publisher.service.catalog_service.summary_published",
+        return_value=False,
+    )
+    headers = MultiDict(
+        [
+            (hdrs.CONTENT_TYPE, "application/json"),
+            (hdrs.AUTHORIZATION, "Bearer blablabla"),
+        ]
+    )
+    with open("./tests/files/catalog_1.json") as json_file:
+        data = json.load(json_file)
+
+    response = await client.post("/catalogs", headers=headers, data=json.dumps(data))
+
+    assert response.status == 409
+    assert "msg" in await response.json()
+
+
 @pytest.mark.integration
 async def test_create_catalog_unsupported_accept_header(
     client: _TestClient, mocker: MockFixture
@@ -443,10 +925,15 @@ async def test_create_catalog_fails_with_exception(
     """Should return 500."""
     # Configure the mock to return a response with an OK status code.
     mocker.patch("jwt.decode", return_value={"sub": "123"})
+    mocker.patch(
+        "dataservice_publisher.service.catalog_service.load_spec",
+        side_effect=_mock_load_spec,
+    )
     mocker.patch(
         "SPARQLWrapper.SPARQLWrapper.query",
         side_effect=SPARQLWrapperException(response=b"An error occurred"),
     )
+    mocker.patch("SPARQLWrapper.SPARQLWrapper.queryAndConvert", return_value="")
 
     headers = MultiDict(
         [
@@ -478,6 +965,12 @@ def _mock_query_and_convert_result() -> str:
     return result
 
 
+def _slow_query_and_convert_result() -> str:
+    """Create a mock catalog collection response, slowly."""
+    time.sleep(0.1)
+    return _mock_query_and_convert_result()
+
+
 def _mock_query_result() -> Any:
     """Create a mock query result."""
     response = type("response", (object,), {"status": 200})
@@ -499,6 +992,11 @@ def _mock_full_query_result() -> str:
     return data
 
 
+async def _mock_load_spec(session: Any, url: str) -> Tuple[Dict, SpecTiming]:
+    """Return the petstore openAPI-specification for every url."""
+    return _mock_yaml_load(), SpecTiming(url)
+
+
 def _mock_yaml_load() -> Dict[str, Any]:
     """Create a mock openAPI-specification dokument."""
     with open("./tests/files/petstore.yaml", "r") as file:
@@ -0,0 +1,40 @@
+"""Integration test cases for the changes route."""
+
+from typing import List
+
+from aiohttp import hdrs
+from aiohttp.test_utils import TestClient as _TestClient
+from multidict import MultiDict
+import pytest
+
+from dataservice_publisher.service.change_feed import CHANGE_FEED
+
+
+@pytest.mark.integration
+async def test_changes_resume_from_last_event_id(client: _TestClient) -> None:
+    """Should return 200 and the events after Last-Event-ID."""
+    log = client.app[CHANGE_FEED].log
+    seen = log.append("created", "http://localhost:8000/catalogs/1", 1, '"a"')
+    missed = log.append("updated", "http://localhost:8000/catalogs/1", 2, '"b"')
+    headers = MultiDict([("Last-Event-ID", str(seen.id))])
+
+    response = await client.get("/changes", headers=headers)
+
+    assert 200 == response.status
+    assert "text/event-stream" == response.headers[hdrs.CONTENT_TYPE]
+    lines: List[bytes] = []
+    while b"data: " not in b"".join(lines):
+        lines.append(await response.content.readline())
+    assert f"id: {missed.id}\n".encode() in lines
+    assert b"event: updated\n" in lines
+    response.close()
+
+
+@pytest.mark.integration
+async def test_changes_invalid_last_event_id(client: _TestClient) -> None:
+    """Should return 400."""
+    headers = MultiDict([("Last-Event-ID", "not-a-number")])
+
+    response = await client.get("/changes", headers=headers)
+
+    assert 400 == response.status
@@ -0,0 +1,96 @@
+"""Integration test cases for the dump route."""
+
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List
+
+from aiohttp import hdrs
+from aiohttp.test_utils import TestClient as _TestClient
+from multidict import MultiDict
+import pytest
+from pytest_mock import MockFixture
+from rdflib import Dataset
+
+from dataservice_publisher.service.catalog_dump import CATALOG_DUMP
+
+NQUADS = [
+    '<http://a/1> <http://p/title> "A"@en <http://localhost:8000/catalogs/1> .',
+    '<http://a/2> <http://p/title> "B"@en <http://localhost:8000/catalogs/2> .',
+]
+
+
+@pytest.fixture
+def fetches(client: _TestClient, tmp_path: Path, mocker: MockFixture) -> List[int]:
+    """Dump to a temporary directory, counting the reads from Fuseki."""
+    fetches: List[int] = []
+
+    async def _fetch_nquads() -> AsyncIterator[List[str]]:
+        fetches.append(1)
+        yield NQUADS
+
+    mocker.patch(
+        "dataservice_publisher.service.catalog_dump._fetch_nquads", _fetch_nquads
+    )
+    mocker.patch(
+        "SPARQLWrapper.SPARQLWrapper.queryAndConvert", return_value=_versions(1)
+    )
+    client.app[CATALOG_DUMP].directory = str(tmp_path)
+    return fetches
+
+
+def _versions(version: int) -> Dict[str, Any]:
+    binding = {
+        "catalog": {"type": "uri", "value": "http://localhost:8000/catalogs/1"},
+        "version": {"type": "literal", "value": str(version)},
+    }
+    return {"results": {"bindings": [binding]}}
+
+
+@pytest.mark.integration
+async def test_dump(
+    client: _TestClient, fetches: List[int], mocker: MockFixture
+) -> None:
+    """Should return 200 and all catalogs as N-Quads, made again only after a write."""
+    response = await client.get("/catalogs/dump")
+
+    assert 200 == response.status
+    assert "application/n-quads" in response.headers[hdrs.CONTENT_TYPE]
+    ds = Dataset()
+    ds.parse(data=await response.text(), format="nquads")
+    assert 2 == len(list(ds.quads()))
+
+    await client.get("/catalogs/dump")
+    assert 1 == len(fetches)
+
+    # Published again, through any host:
+    mocker.patch(
+        "SPARQLWrapper.SPARQLWrapper.queryAndConvert", return_value=_versions(2)
+    )
+    await client.get("/catalogs/dump")
+    assert 2 == len(fetches)
+
+
+@pytest.mark.integration
+async def test_dump_trig_gzip(client: _TestClient, fetches: List[int]) -> None:
+    """Should return 200 and all catalogs as gzip-compressed TriG."""
+    headers = MultiDict(
+        [(hdrs.ACCEPT, "application/trig"), (hdrs.ACCEPT_ENCODING, "gzip")]
+    )
+
+    response = await client.get("/catalogs/dump", headers=headers)
+
+    assert 200 == response.status
+    assert "application/trig" in response.headers[hdrs.CONTENT_TYPE]
+    assert "gzip" == response.headers[hdrs.CONTENT_ENCODING]
+    ds = Dataset()
+    ds.parse(data=await response.text(), format="trig")
+    assert 2 == len(list(ds.quads()))
+
+
+@pytest.mark.integration
+async def test_dump_not_acceptable(client: _TestClient, fetches: List[int]) -> None:
+    """Should return 406."""
+    headers = MultiDict([(hdrs.ACCEPT, "text/turtle")])
+
+    response = await client.get("/catalogs/dump", headers=headers)
+
+    assert 406 == response.status
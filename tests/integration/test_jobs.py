@@ -0,0 +1,150 @@
+"""Integration test cases for asynchronous publishing and the jobs route."""
+
+import asyncio
+import json
+from typing import Any, Tuple
+
+from aiohttp import hdrs
+from aiohttp.test_utils import TestClient as _TestClient
+from multidict import MultiDict
+import pytest
+from pytest_mock import MockFixture
+from rdflib import Graph
+
+from dataservice_publisher import create_app
+from dataservice_publisher.service.catalog_registry import CatalogSummary
+from dataservice_publisher.service.oas_loader import SpecTiming
+from dataservice_publisher.service.publish_jobs import (
+    JobQueueFullError,
+    JobStore,
+    PublishJobs,
+)
+
+
+@pytest.mark.integration
+async def test_create_catalog_async(
+    aiohttp_client: Any, tmp_path: Any, mocker: MockFixture
+) -> None:
+    """Should return 202 and a job that completes, followed on any worker."""
+    filename = str(tmp_path / "jobs.db")
+    mocker.patch(
+        "dataservice_publisher.app.PublishJobs",
+        lambda **kwargs: PublishJobs(**kwargs, store=JobStore(filename)),
+    )
+    client = await aiohttp_client(await create_app())
+    other_worker = await aiohttp_client(await create_app())
+    mocker.patch("jwt.decode", return_value={"sub": "123"})
+    mocker.patch(
+        "dataservice_publisher.service.publish_jobs.unchanged_catalog",
+        return_value=None,
+    )
+    mocker.patch(
+        "dataservice_publisher.service.publish_jobs.publish_catalog",
+        side_effect=_mock_publish_catalog,
+    )
+    headers = MultiDict(
+        [
+            (hdrs.CONTENT_TYPE, "application/json"),
+            (hdrs.AUTHORIZATION, "Bearer blablabla"),
+            ("Prefer", "respond-async"),
+        ]
+    )
+    with open("./tests/files/catalog_1.json") as json_file:
+        data = json.load(json_file)
+
+    response = await client.post("/catalogs", headers=headers, data=json.dumps(data))
+
+    assert response.status == 202
+    assert response.headers["Preference-Applied"] == "respond-async"
+    location = response.headers[hdrs.LOCATION]
+    job = await response.json()
+    assert location == f"/jobs/{job['id']}"
+    assert job["catalog"] == data["identifier"]
+
+    for _ in range(100):
+        response = await other_worker.get(location)
+        assert response.status == 200
+        job = await response.json()
+        if job["status"] == "completed":
+            break
+        await asyncio.sleep(0.01)
+
+    assert job["status"] == "completed"
+    assert job["triples"] == 1
+    assert job["progress"] == {"apis": 3, "done": 3}
+    assert [timing["seconds"] for timing in job["apiTimings"]] == [0.1, 0.1, 0.1]
+
+
+@pytest.mark.integration
+async def test_create_catalog_async_invalid_body(
+    client: _TestClient, mocker: MockFixture
+) -> None:
+    """Should return 400 without creating a job."""
+    mocker.patch("jwt.decode", return_value={"sub": "123"})
+    headers = MultiDict(
+        [
+            (hdrs.CONTENT_TYPE, "application/json"),
+            (hdrs.AUTHORIZATION, "Bearer blablabla"),
+            ("Prefer", "respond-async"),
+        ]
+    )
+    data = dict(identifier="http://localhost:8000/catalogs/1")
+
+    response = await client.post("/catalogs", headers=headers, data=json.dumps(data))
+
+    assert response.status == 400
+    data = await response.json()
+    assert data["msg"] == "KeyError when processing request body"
+
+
+@pytest.mark.integration
+async def test_create_catalog_async_queue_full(
+    client: _TestClient, mocker: MockFixture
+) -> None:
+    """Should return 503 and Retry-After when the job queue is full."""
+    mocker.patch("jwt.decode", return_value={"sub": "123"})
+    mocker.patch(
+        "dataservice_publisher.service.publish_jobs.PublishJobs.submit",
+        side_effect=JobQueueFullError(),
+    )
+    headers = MultiDict(
+        [
+            (hdrs.CONTENT_TYPE, "application/json"),
+            (hdrs.AUTHORIZATION, "Bearer blablabla"),
+            ("Prefer", "respond-async"),
+        ]
+    )
+    with open("./tests/files/catalog_1.json") as json_file:
+        data = json.load(json_file)
+
+    response = await client.post("/catalogs", headers=headers, data=json.dumps(data))
+
+    assert response.status == 503
+    assert response.headers[hdrs.RETRY_AFTER] == "10"
+    body = await response.json()
+    assert body["msg"] == "The publish job queue is full"
+
+
+@pytest.mark.integration
+async def test_job_does_not_exist(client: _TestClient) -> None:
+    """Should return 404."""
+    response = await client.get("/jobs/does_not_exist")
+
+    assert response.status == 404
+
+
+async def _mock_publish_catalog(
+    catalog: dict,
+    progress: Any,
+    idempotency_key: Any = None,
+    fetch_turn: Any = None,
+    batcher: Any = None,
+) -> Tuple[Graph, CatalogSummary]:
+    """Report progress for every api and return a graph and its summary."""
+    for api in catalog["apis"]:
+        progress(SpecTiming(api["url"], fetch_seconds=0.05, parse_seconds=0.05))
+    graph = Graph().parse(
+        data=f"<{catalog['identifier']}> a <http://www.w3.org/ns/dcat#Catalog> .",
+        format="turtle",
+    )
+    return graph, CatalogSummary(catalog["identifier"], version=1)
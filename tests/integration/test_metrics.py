@@ -0,0 +1,91 @@
+"""Integration test cases for the metrics route and admission control."""
+
+import asyncio
+from typing import Any
+
+from aiohttp import hdrs
+from aiohttp.test_utils import TestClient as _TestClient
+import pytest
+from pytest_mock import MockFixture
+from rdflib import Graph
+
+from dataservice_publisher import create_app
+from dataservice_publisher.service.admission import ADMISSION, Limiter
+from dataservice_publisher.service.memory_accounting import MemoryAccounts
+
+
+@pytest.mark.integration
+async def test_metrics(client: _TestClient) -> None:
+    """Should return 200 and the metrics of the worker."""
+    response = await client.get("/metrics")
+
+    assert 200 == response.status
+    assert "text/plain" in response.headers[hdrs.CONTENT_TYPE]
+    text = await response.text()
+    assert 'admission_active{class="writes"} 0' in text
+    assert "# TYPE dataservice_publisher_event_loop_lag_seconds gauge" in text
+
+
+@pytest.mark.integration
+async def test_memory_metrics(aiohttp_client: Any, mocker: MockFixture) -> None:
+    """Should account the memory of catalog requests, when enabled."""
+    mocker.patch(
+        "dataservice_publisher.app.MemoryAccounts", lambda: MemoryAccounts(True)
+    )
+    client = await aiohttp_client(await create_app())
+    mocker.patch(
+        "SPARQLWrapper.SPARQLWrapper.queryAndConvert",
+        return_value="<http://localhost:8000/catalogs/1> a <http://x/Catalog> .",
+    )
+
+    assert 200 == (await client.get("/catalogs/1")).status
+    await client.get("/ping")
+
+    metrics = await (await client.get("/metrics")).text()
+    assert "dataservice_publisher_request_memory_peak_bytes_count 1" in metrics
+    for stage in ("graph", "serialized"):
+        assert (
+            'dataservice_publisher_stage_memory_peak_bytes_count{stage="%s"} 1' % stage
+            in metrics
+        )
+
+
+@pytest.mark.integration
+async def test_metrics_first_response(client: _TestClient) -> None:
+    """Should return the time from the creation of the app to the first response."""
+    await client.get("/ping")
+
+    response = await client.get("/metrics")
+
+    assert "dataservice_publisher_worker_first_response_seconds " in (
+        await response.text()
+    )
+
+
+@pytest.mark.integration
+async def test_reads_are_shed(client: _TestClient, mocker: MockFixture) -> None:
+    """Should return 503 and Retry-After to reads beyond the limit and queue."""
+    client.app[ADMISSION].limiters["reads"] = Limiter("reads", 1, 0)
+    loading = asyncio.Event()
+    release = asyncio.Event()
+
+    async def _get_catalog_by_id(id: str) -> Graph:
+        loading.set()
+        await release.wait()
+        return Graph()
+
+    mocker.patch(
+        "dataservice_publisher.resources.catalogs.get_catalog_by_id",
+        _get_catalog_by_id,
+    )
+
+    first = asyncio.create_task(client.get("/catalogs/1"))
+    await loading.wait()
+    response = await client.get("/catalogs/2")
+    release.set()
+
+    assert 503 == response.status
+    assert "1" == response.headers[hdrs.RETRY_AFTER]
+    assert 404 == (await first).status
+    metrics = await (await client.get("/metrics")).text()
+    assert 'dataservice_publisher_admission_shed_total{class="reads"} 1' in metrics
@@ -0,0 +1,70 @@
+"""Integration test cases for profiling requests."""
+
+import asyncio
+import pstats
+from typing import Any
+
+from aiohttp import hdrs
+from multidict import MultiDict
+import pytest
+from pytest_mock import MockFixture
+
+from dataservice_publisher import create_app
+from dataservice_publisher.service.profiling import Profiles
+
+
+@pytest.mark.integration
+async def test_profile_request(
+    aiohttp_client: Any, mocker: MockFixture, tmp_path: Any
+) -> None:
+    """Should profile the request of an admin, and offer the profile for download."""
+    profiles = Profiles(str(tmp_path))
+    mocker.patch("dataservice_publisher.app.Profiles", lambda: profiles)
+    client = await aiohttp_client(await create_app())
+    mocker.patch(
+        "SPARQLWrapper.SPARQLWrapper.queryAndConvert",
+        return_value="<http://localhost:8000/catalogs/1> a <http://x/Catalog> .",
+    )
+    mocker.patch("jwt.decode", return_value={"sub": "123"})
+    to_thread = mocker.spy(asyncio, "to_thread")
+    admin = MultiDict([(hdrs.AUTHORIZATION, "Bearer blablabla")])
+
+    response = await client.get(
+        "/catalogs/1", headers=MultiDict(admin, **{"X-Profile": "1"})
+    )
+
+    assert 200 == response.status
+    assert any(call.args[0] == profiles.save for call in to_thread.call_args_list)
+    link = response.headers[hdrs.LINK]
+    assert link.startswith("</profiles/") and link.endswith('>; rel="profile"')
+    path = link[1 : link.index(">")]
+
+    response = await client.get(path, headers=admin)
+    assert 200 == response.status
+    speedscope = await response.json()
+    frames = [frame["name"] for frame in speedscope["shared"]["frames"]]
+    assert "get_catalog_by_id" in frames
+    assert (
+        speedscope["profiles"][0]["name"] == "Event loop while running GET /catalogs/1"
+    )
+    events = speedscope["profiles"][0]["events"]
+    assert len([e for e in events if e["type"] == "O"]) == len(
+        [e for e in events if e["type"] == "C"]
+    )
+
+    response = await client.get(path, params={"format": "pstats"}, headers=admin)
+    assert 200 == response.status
+    pstats_file = tmp_path / "downloaded.pstats"
+    pstats_file.write_bytes(await response.read())
+    stats = pstats.Stats(str(pstats_file))
+    assert any(name == "get_catalog_by_id" for _, _, name in stats.stats)  # type: ignore
+
+
+@pytest.mark.integration
+async def test_profile_request_unauthenticated(client: Any) -> None:
+    """Should not profile requests, or offer profiles, without an admin token."""
+    response = await client.get("/catalogs/1", headers={"X-Profile": "1"})
+    assert 401 == response.status
+
+    response = await client.get("/profiles/abc")
+    assert 401 == response.status
@@ -7,6 +7,8 @@ from aiohttp.test_utils import TestClient as _TestClient
 from aioresponses import aioresponses
 import pytest
 
+from dataservice_publisher.service.cache_warmup import WARMUP_STATE, WarmupState
+
 
 @pytest.fixture
 def mock_aioresponse() -> Any:
@@ -53,3 +55,15 @@ async def test_ready_raises_client_connection_error(
     response = await client.get("/ready")
 
     assert response.status == 500
+
+
+@pytest.mark.integration
+async def test_ready_warming_up(client: _TestClient) -> None:
+    """Should return 503 while the cache is warming up."""
+    client.app[WARMUP_STATE] = WarmupState(total=3, loaded=1, done=False)
+
+    response = await client.get("/ready")
+
+    assert response.status == 503
+    data = await response.text()
+    assert data == "Warming up cache: 1/3"
@@ -0,0 +1,123 @@
+"""Integration test cases for the search route."""
+
+import asyncio
+from typing import Any
+
+from aiohttp import hdrs
+from aiohttp.test_utils import TestClient as _TestClient
+from multidict import MultiDict
+import pytest
+from pytest_mock import MockFixture
+from rdflib import DCAT, Graph, RDF
+
+from dataservice_publisher import create_app
+from dataservice_publisher.service.catalog_registry import CATALOG_REGISTRY
+from dataservice_publisher.service.search_index import SEARCH_INDEX
+
+
+@pytest.mark.integration
+async def test_search(aiohttp_client: Any, mocker: MockFixture) -> None:
+    """Should return 200, a page of data services and a link to the next page."""
+    mocker.patch(
+        "SPARQLWrapper.SPARQLWrapper.queryAndConvert",
+        return_value=_mock_query_and_convert_result(),
+    )
+    client = await _indexed(aiohttp_client)
+
+    response = await client.get(
+        "/search", params={"q": "Petstore application/json", "limit": "4"}
+    )
+
+    assert 200 == response.status
+    assert "text/turtle; charset=utf-8" == response.headers[hdrs.CONTENT_TYPE]
+    assert "6" == response.headers["X-Total-Count"]
+    assert 'rel="next"' in response.headers[hdrs.LINK]
+    assert "offset=4" in response.headers[hdrs.LINK]
+    g = Graph().parse(data=await response.text(), format="turtle")
+    assert 4 == len(set(g.subjects(RDF.type, DCAT.DataService)))
+
+
+@pytest.mark.integration
+async def test_search_serializers(aiohttp_client: Any, mocker: MockFixture) -> None:
+    """Should return the hits in the negotiated format."""
+    mocker.patch(
+        "SPARQLWrapper.SPARQLWrapper.queryAndConvert",
+        return_value=_mock_query_and_convert_result(),
+    )
+    client = await _indexed(aiohttp_client)
+    headers = MultiDict([(hdrs.ACCEPT, "application/ld+json")])
+
+    response = await client.get("/search", params={"q": "testcatalog"}, headers=headers)
+
+    assert 200 == response.status
+    assert "application/ld+json" in response.headers[hdrs.CONTENT_TYPE]
+    g = Graph().parse(data=await response.text(), format="json-ld")
+    assert 1 == len(set(g.subjects(RDF.type, DCAT.Catalog)))
+
+
+@pytest.mark.integration
+async def test_search_without_query(client: _TestClient) -> None:
+    """Should return 400."""
+    response = await client.get("/search")
+
+    assert 400 == response.status
+
+
+@pytest.mark.integration
+async def test_search_without_words(client: _TestClient) -> None:
+    """Should return 400 for a q that has no words."""
+    response = await client.get("/search", params={"q": "!!!"})
+
+    assert 400 == response.status
+    assert "q has no words to search for" == (await response.json())["msg"]
+
+
+@pytest.mark.integration
+async def test_search_builds_index(client: _TestClient, mocker: MockFixture) -> None:
+    """Should build the index on the first search, and answer it."""
+    mocker.patch(
+        "SPARQLWrapper.SPARQLWrapper.queryAndConvert",
+        return_value=_mock_query_and_convert_result(),
+    )
+
+    response = await client.get("/search", params={"q": "testcatalog"})
+
+    assert 200 == response.status
+    assert "1" == response.headers["X-Total-Count"]
+
+
+@pytest.mark.integration
+async def test_search_before_indexed(client: _TestClient, mocker: MockFixture) -> None:
+    """Should return 503 when the index takes too long, and go on building it."""
+    mocker.patch("dataservice_publisher.resources.search.SEARCH_INDEX_BUILD_TIMEOUT", 0)
+    mocker.patch(
+        "SPARQLWrapper.SPARQLWrapper.queryAndConvert",
+        return_value=_mock_query_and_convert_result(),
+    )
+
+    response = await client.get("/search", params={"q": "testcatalog"})
+    assert 503 == response.status
+    assert "1" == response.headers[hdrs.RETRY_AFTER]
+
+    for _ in range(100):
+        response = await client.get("/search", params={"q": "testcatalog"})
+        if response.status != 503:
+            break
+        await asyncio.sleep(0.01)
+    assert 200 == response.status
+
+
+async def _indexed(aiohttp_client: Any) -> _TestClient:
+    """Return a client of an app whose search index has been built."""
+    client = await aiohttp_client(await create_app())
+    client.app[SEARCH_INDEX].start(client.app[CATALOG_REGISTRY])
+    for _ in range(100):
+        if client.app[SEARCH_INDEX].ready:
+            break
+        await asyncio.sleep(0.01)
+    return client
+
+
+def _mock_query_and_convert_result() -> bytes:
+    with open("tests/files/catalog_1.ttl") as ttl_file:
+        return ttl_file.read().encode()
@@ -0,0 +1,98 @@
+"""Unit test cases for the admission module."""
+
+import asyncio
+
+import pytest
+
+from dataservice_publisher.service.admission import (
+    Admission,
+    Limiter,
+    OverloadedError,
+)
+from dataservice_publisher.service.metrics import MetricsRegistry
+
+
+@pytest.mark.unit
+async def test_limiter_queues_then_sheds() -> None:
+    """Should run limit operations, queue queue_size more and shed the rest."""
+    limiter = Limiter("reads", limit=2, queue_size=1, queue_timeout=1)
+    release = asyncio.Event()
+    running = []
+
+    async def _operation() -> None:
+        async with limiter:
+            running.append(1)
+            await release.wait()
+
+    tasks = [asyncio.create_task(_operation()) for _ in range(3)]
+    await asyncio.sleep(0)
+    assert (2, 1) == (limiter.active, limiter.queued)
+
+    with pytest.raises(OverloadedError):
+        await limiter.acquire()
+    assert 1 == limiter.shed
+
+    release.set()
+    await asyncio.gather(*tasks)
+    assert 3 == len(running)
+    assert (0, 0, 3) == (limiter.active, limiter.queued, limiter.admitted)
+
+
+@pytest.mark.unit
+async def test_limiter_sheds_after_queue_timeout() -> None:
+    """Should shed an operation that waited too long, and not lose the turn."""
+    limiter = Limiter("writes", limit=1, queue_size=1, queue_timeout=0.01)
+    await limiter.acquire()
+
+    with pytest.raises(OverloadedError):
+        await limiter.acquire()
+
+    assert (1, 0, 1) == (limiter.active, limiter.queued, limiter.shed)
+    limiter.release()
+    await limiter.acquire()
+    assert 1 == limiter.active
+
+
+@pytest.mark.unit
+async def test_limiter_turn_without_shedding() -> None:
+    """Should let an operation that is not shed wait for its turn, however long."""
+    limiter = Limiter("oas_fetches", limit=1, queue_size=0, queue_timeout=0.01)
+    await limiter.acquire()
+
+    async def _operation() -> None:
+        async with limiter.turn(shed=False):
+            assert 1 == limiter.active
+
+    task = asyncio.create_task(_operation())
+    await asyncio.sleep(0.05)
+    assert (1, 0) == (limiter.queued, limiter.shed)
+    limiter.release()
+    await task
+    assert (0, 0) == (limiter.active, limiter.queued)
+
+
+@pytest.mark.unit
+async def test_admission_sheds_at_once_by_default() -> None:
+    """Should shed an operation beyond the limit without queueing it."""
+    limiter = Admission().limiters["writes"]
+    for _ in range(limiter.limit):
+        await limiter.acquire()
+
+    with pytest.raises(OverloadedError):
+        await asyncio.wait_for(limiter.acquire(), 0.1)
+    assert (0, 1) == (limiter.queued, limiter.shed)
+
+
+@pytest.mark.unit
+def test_admission_metrics() -> None:
+    """Should expose the admission metrics in the Prometheus text format."""
+    metrics = MetricsRegistry()
+    admission = Admission({"reads": Limiter("reads", 1, 1)})
+    admission.register(metrics)
+    admission.limiters["reads"].shed = 1234567
+
+    text = metrics.expose()
+
+    assert "# TYPE dataservice_publisher_admission_shed_total counter\n" in text
+    assert 'dataservice_publisher_admission_shed_total{class="reads"} 1234567\n' in text
+    assert 'dataservice_publisher_admission_queued{class="reads"} 0\n' in text
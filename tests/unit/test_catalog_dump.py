@@ -0,0 +1,173 @@
+"""Unit test cases for the catalog dump module."""
+
+import gzip
+import json
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Set
+
+import pytest
+from pytest_mock import MockFixture
+from rdflib import Dataset, DCAT, DCTERMS, Literal, RDF, URIRef
+from rdflib.compare import isomorphic
+from SPARQLWrapper import SPARQLWrapper
+
+from dataservice_publisher.service.catalog_dump import (
+    CatalogDump,
+    fetch_generation,
+    split_quad,
+)
+from dataservice_publisher.service.catalog_registry import DSP, METADATA_GRAPH
+
+NQUADS = [
+    '<http://a/1> <http://p/title> "A \\"quoted\\" title"@en <http://g/1> .',
+    "<http://a/1> <http://p/contact> _:b0 <http://g/1> .",
+    '_:b0 <http://p/email> "post@example.com" <http://g/1> .',
+    '<http://a/2> <http://p/title> "B"^^<http://x/string> <http://g/2> .',
+    '<http://a/1> <http://dsp/version> "3" <urn:dataservice-publisher:metadata> .',
+    '<http://a/3> <http://p/title> "In the default graph" .',
+    "",
+]
+
+
+def _dataset(data: str, format: str) -> Dataset:
+    ds = Dataset()
+    if format == "trig":
+        ds.parse(data, format=format)
+    else:
+        ds.parse(data=data, format=format)
+    return ds
+
+
+def _graphs(ds: Dataset) -> Set[str]:
+    return {str(g.identifier) for g in ds.contexts() if len(g)}
+
+
+@pytest.mark.unit
+def test_split_quad() -> None:
+    """Should split the triple from the graph."""
+    assert split_quad(NQUADS[0]) == (
+        '<http://a/1> <http://p/title> "A \\"quoted\\" title"@en',
+        "<http://g/1>",
+    )
+    assert split_quad(NQUADS[5]) == (
+        '<http://a/3> <http://p/title> "In the default graph"',
+        None,
+    )
+    assert split_quad("") is None
+
+
+@pytest.mark.unit
+async def test_make_dump(tmp_path: Path, mocker: MockFixture) -> None:
+    """Should write the catalog graphs as N-Quads and TriG, plain and compressed."""
+
+    async def _fetch_nquads() -> AsyncIterator[List[str]]:
+        yield NQUADS[:2]
+        yield NQUADS[2:]
+
+    mocker.patch(
+        "dataservice_publisher.service.catalog_dump._fetch_nquads", _fetch_nquads
+    )
+    dump = CatalogDump(str(tmp_path))
+
+    nq = await dump.get("1", "application/n-quads")
+    trig = await dump.get("1", "application/trig")
+
+    expected = _dataset("\n".join(NQUADS[:4]), "nquads")
+    for actual in [_dataset(Path(nq).read_text(), "nquads"), _dataset(trig, "trig")]:
+        assert _graphs(actual) == _graphs(expected)
+        for name in _graphs(expected):
+            assert isomorphic(actual.graph(name), expected.graph(name))
+    with gzip.open(f"{trig}.gz") as f:
+        assert f.read() == Path(trig).read_bytes()
+
+
+@pytest.mark.unit
+async def test_dump_is_made_once_per_generation(
+    tmp_path: Path, mocker: MockFixture
+) -> None:
+    """Should reuse the dump of the generation, and remove the others."""
+    calls = []
+
+    async def _fetch_nquads() -> AsyncIterator[List[str]]:
+        calls.append(1)
+        yield NQUADS
+
+    mocker.patch(
+        "dataservice_publisher.service.catalog_dump._fetch_nquads", _fetch_nquads
+    )
+    dump = CatalogDump(str(tmp_path))
+
+    await dump.get("1", "application/n-quads")
+    await dump.get("1", "application/trig")
+    assert 1 == len(calls)
+
+    await dump.get("2", "application/n-quads")
+    assert 2 == len(calls)
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "catalogs-2.nq",
+        "catalogs-2.nq.gz",
+        "catalogs-2.trig",
+        "catalogs-2.trig.gz",
+    ]
+
+
+def _versions(*rows: str) -> Dict[str, Any]:
+    bindings = []
+    for row in rows:
+        catalog, version, *etag = row.split()
+        binding = {
+            "catalog": {"type": "uri", "value": catalog},
+            "version": {"type": "literal", "value": version},
+        }
+        if etag:
+            binding["etag"] = {"type": "literal", "value": etag[0]}
+        bindings.append(binding)
+    return {"results": {"bindings": bindings}}
+
+
+@pytest.mark.unit
+async def test_fetch_generation(mocker: MockFixture) -> None:
+    """Should change with any publish or delete, on any dataset, and only then."""
+    mocker.patch("dataservice_publisher.service.shards.SHARDS.endpoints", ["a", "b"])
+    query = mocker.patch("SPARQLWrapper.SPARQLWrapper.queryAndConvert")
+
+    async def _generation(*shards: Dict[str, Any]) -> str:
+        query.side_effect = list(shards)
+        return await fetch_generation()
+
+    generation = await _generation(_versions("c1 1 e1", "c2 3"), _versions("c3 2"))
+
+    assert generation == await _generation(
+        _versions("c3 2"), _versions("c2 3", "c1 1 e1")
+    )
+    assert generation != await _generation(
+        _versions("c1 2 e2", "c2 3"), _versions("c3 2")
+    )
+    assert generation != await _generation(_versions("c1 1 e1"), _versions("c3 2"))
+    assert generation != await _generation(
+        _versions("c1 1 e1", "c2 3"), _versions("c3 2", "c4 1")
+    )
+
+
+@pytest.mark.unit
+async def test_fetch_generation_of_graphs(mocker: MockFixture) -> None:
+    """Should change with the catalog graphs too, whatever the metadata graph has."""
+    mocker.patch("dataservice_publisher.service.shards.SHARDS.endpoints", ["a"])
+    ds = Dataset()
+    ds.graph(METADATA_GRAPH).add((URIRef("urn:c1"), DSP.version, Literal(1)))
+    ds.graph(URIRef("urn:c1")).add((URIRef("urn:c1"), RDF.type, DCAT.Catalog))
+
+    def _query(self: SPARQLWrapper) -> Dict[str, Any]:
+        result = ds.query(self.queryString)
+        return json.loads(result.serialize(format="json"))  # type: ignore
+
+    mocker.patch("SPARQLWrapper.SPARQLWrapper.queryAndConvert", _query)
+    generation = await fetch_generation()
+
+    # A catalog without a summary, e.g. published before the registry:
+    ds.graph(URIRef("urn:c2")).add((URIRef("urn:c2"), RDF.type, DCAT.Catalog))
+    assert generation != await fetch_generation()
+    ds.remove_graph(ds.graph(URIRef("urn:c2")))
+    assert generation == await fetch_generation()
+    ds.graph(URIRef("urn:c1")).add((URIRef("urn:c1"), DCTERMS.title, Literal("C1")))
+    assert generation != await fetch_generation()
@@ -0,0 +1,192 @@
+"""Unit test cases for the catalog registry module."""
+
+from datetime import datetime, timezone
+from typing import List
+
+import pytest
+from pytest_mock import MockFixture
+from rdflib import Graph
+from rdflib.plugins.sparql import prepareUpdate
+
+from dataservice_publisher.service.catalog_registry import (
+    CatalogRegistry,
+    CatalogSummary,
+    fetch_catalog_summaries,
+    METADATA_GRAPH,
+    select_summaries,
+    summarize,
+    summary_update,
+)
+
+CATALOG = "http://localhost:8000/catalogs/1"
+PUBLISHER = "https://data.brreg.no/enhetsregisteret/api/enheter/961181399"
+
+
+@pytest.mark.unit
+def test_summarize() -> None:
+    """Should summarize the catalog in the graph."""
+    g = Graph().parse("tests/files/catalog_1.ttl", format="turtle")
+
+    summary = summarize(CATALOG, g)
+
+    assert summary.identifier == CATALOG
+    assert summary.title == {
+        "en": "Testcatalog",
+        "nb": "Testkatalog",
+        "nn": "Testkatalog",
+    }
+    assert summary.publisher == PUBLISHER
+    assert summary.services == 6
+    assert summary.modified is not None
+
+
+@pytest.mark.unit
+def test_summary_round_trip() -> None:
+    """Should read back the summary from its triples."""
+    summary = CatalogSummary(
+        identifier=CATALOG,
+        title={"en": "Testcatalog"},
+        publisher=PUBLISHER,
+        services=6,
+        modified=datetime(2026, 1, 1, tzinfo=timezone.utc),
+    )
+
+    assert summarize(CATALOG, summary.to_graph()) == summary
+
+
+@pytest.mark.unit
+def test_summary_private_facts() -> None:
+    """Should keep the hashes of the publish only in the private triples."""
+    summary = CatalogSummary(
+        identifier=CATALOG,
+        modified=datetime(2026, 1, 1, tzinfo=timezone.utc),
+        request_hash="abc",
+        content_hash="def",
+        idempotency_key="key-1",
+    )
+
+    assert summarize(CATALOG, summary.to_graph(private=True)) == summary
+    assert summarize(CATALOG, summary.to_graph()).content_hash is None
+
+
+@pytest.mark.unit
+def test_select_summaries() -> None:
+    """Should filter by publisher, sort and page the summaries."""
+    summaries = _summaries()
+
+    selected = select_summaries(summaries, publisher=PUBLISHER, sort="title")
+    assert [s.identifier for s in selected] == ["urn:c", "urn:a"]
+
+    selected = select_summaries(summaries, sort="services", descending=True)
+    assert [s.identifier for s in selected] == ["urn:b", "urn:a", "urn:c"]
+
+    selected = select_summaries(summaries, offset=1, limit=1)
+    assert [s.identifier for s in selected] == ["urn:b"]
+
+
+@pytest.mark.unit
+def test_select_summaries_unknown_sort() -> None:
+    """Should raise ValueError."""
+    with pytest.raises(ValueError):
+        select_summaries(_summaries(), sort="description")
+
+
+@pytest.mark.unit
+def test_summary_update_is_valid_sparql() -> None:
+    """Should return a parseable update on the metadata graph."""
+    query = summary_update(_summaries()[0])
+
+    prepareUpdate(query)
+    assert f"<{METADATA_GRAPH}>" in query
+
+
+@pytest.mark.unit
+async def test_fetch_catalog_summaries_rebuilds_empty_registry(
+    mocker: MockFixture,
+) -> None:
+    """Should summarize the catalogs and persist the summaries."""
+    with open("tests/files/catalog_1.ttl") as ttl_file:
+        catalog = ttl_file.read()
+    mocker.patch(
+        "SPARQLWrapper.SPARQLWrapper.queryAndConvert",
+        side_effect=[b"", catalog.encode()],
+    )
+    query = mocker.patch("SPARQLWrapper.SPARQLWrapper.query")
+
+    summaries = await fetch_catalog_summaries()
+
+    assert [s.identifier for s in summaries] == [CATALOG]
+    query.assert_called_once()
+
+
+@pytest.mark.unit
+async def test_fetch_catalog_summaries_of_every_shard(mocker: MockFixture) -> None:
+    """Should list the catalogs kept by every dataset."""
+    endpoints = ["http://fuseki-1:8080/fuseki/ds", "http://fuseki-2:8080/fuseki/ds"]
+    mocker.patch("dataservice_publisher.service.shards.SHARDS.endpoints", endpoints)
+    graphs = {
+        endpoint: CatalogSummary(f"urn:{i}", {"en": str(i)}).to_graph()
+        for i, endpoint in enumerate(endpoints)
+    }
+    asked: List[str] = []
+
+    async def _construct(endpoint: str, querystring: str) -> Graph:
+        asked.append(endpoint)
+        return graphs[endpoint]
+
+    mocker.patch(
+        "dataservice_publisher.service.catalog_registry._construct", _construct
+    )
+
+    summaries = await fetch_catalog_summaries()
+
+    assert sorted(asked) == endpoints
+    assert sorted(s.identifier for s in summaries) == ["urn:0", "urn:1"]
+
+
+@pytest.mark.unit
+async def test_registry_applies_local_writes(mocker: MockFixture) -> None:
+    """Should add and remove summaries without reloading them."""
+    fetch = mocker.patch(
+        "dataservice_publisher.service.catalog_registry.fetch_catalog_summaries",
+        return_value=_summaries(),
+    )
+    registry = CatalogRegistry(ttl=60)
+    assert len(await registry.summaries()) == 3
+
+    registry.put(summarize(CATALOG, Graph().parse("tests/files/catalog_1.ttl")))
+    registry.remove("urn:a")
+
+    identifiers = [s.identifier for s in await registry.summaries()]
+    assert sorted(identifiers) == sorted([CATALOG, "urn:b", "urn:c"])
+    fetch.assert_called_once()
+
+
+@pytest.mark.unit
+async def test_registry_reloads(mocker: MockFixture) -> None:
+    """Should reload when invalidated, or asked at another generation of the list."""
+    fetch = mocker.patch(
+        "dataservice_publisher.service.catalog_registry.fetch_catalog_summaries",
+        return_value=_summaries(),
+    )
+    registry = CatalogRegistry(ttl=60)
+
+    await registry.summaries(1)
+    await registry.summaries(1)
+    await registry.summaries()
+    assert fetch.call_count == 1
+
+    await registry.summaries(2)
+    assert fetch.call_count == 2
+
+    registry.invalidate()
+    await registry.summaries()
+    assert fetch.call_count == 3
+
+
+def _summaries() -> List[CatalogSummary]:
+    return [
+        CatalogSummary("urn:a", {"en": "Beta"}, PUBLISHER, 2),
+        CatalogSummary("urn:b", {"en": "alpha"}, "urn:other", 3),
+        CatalogSummary("urn:c", {"en": "Alpha"}, PUBLISHER, 1),
+    ]
@@ -1,27 +1,80 @@
 """Unit test cases for the catalog module."""
 
 import json
-from typing import Any, Dict
+from typing import Any, Dict, Tuple
 
+from aiohttp import web
 import pytest
 from pytest_mock import MockFixture
-from rdflib import Graph
+from rdflib import Dataset, DCAT, Graph, Literal, URIRef
 from rdflib.compare import graph_diff, isomorphic
 import yaml
 
+from dataservice_publisher.exceptions.exceptions import (
+    IdempotencyKeyError,
+    PublishConflictError,
+)
+from dataservice_publisher.service.catalog_registry import (
+    CatalogSummary,
+    DSP,
+    METADATA_GRAPH,
+    summary_update,
+    version_condition,
+)
 from dataservice_publisher.service.catalog_service import (
+    catalog_delete,
+    catalog_uri,
+    content_hash,
     create_catalog,
-    fetch_catalogs,
     get_catalog_by_id,
+    graph_replace,
+    PUBLISH_ATTEMPTS,
+    publish_catalog,
+    request_hash,
+    unchanged_catalog,
+)
+from dataservice_publisher.service.catalog_versions import (
+    Delta,
+    delta_update,
+    DELTAS_GRAPH,
+)
+from dataservice_publisher.service.oas_conversion import (
+    _get_pool,
+    CONVERSION_START_METHOD,
+    stop_conversion_pool,
 )
+from dataservice_publisher.service.oas_loader import SpecTiming
+
+
+@pytest.mark.unit
+def test_catalog_delete() -> None:
+    """Should remove the graph and the summary of the catalog only."""
+    ds = Dataset()
+    for id in ["1", "2"]:
+        ds.graph(catalog_uri(id)).add((catalog_uri(id), URIRef("urn:p"), Literal(id)))
+        ds.graph(METADATA_GRAPH).add((catalog_uri(id), URIRef("urn:p"), Literal(id)))
+
+    ds.update(" ;\n".join(catalog_delete(catalog_uri(id)) for id in ["1", "3"]))
+
+    assert 0 == len(ds.graph(catalog_uri("1")))
+    assert 1 == len(ds.graph(catalog_uri("2")))
+    assert {catalog_uri("2")} == set(ds.graph(METADATA_GRAPH).subjects())
 
 
 @pytest.mark.unit
 async def test_create_catalog(mocker: MockFixture) -> None:
     """Should return True when sucessful."""
     # Set up the mocks
-    mocker.patch("yaml.safe_load", return_value=_mock_yaml_load())
+    mocker.patch(
+        "dataservice_publisher.service.catalog_service.load_spec",
+        side_effect=_mock_load_spec,
+    )
     mocker.patch("SPARQLWrapper.SPARQLWrapper.query", return_value=True)
+    mocker.patch("SPARQLWrapper.SPARQLWrapper.queryAndConvert", return_value="")
+    mocker.patch(
+        "dataservice_publisher.service.catalog_service.summary_published",
+        return_value=True,
+    )
 
     with open("./tests/files/catalog_1.json") as json_file:
         catalog = json.load(json_file)
@@ -42,16 +95,240 @@ async def test_create_catalog(mocker: MockFixture) -> None:
 
 
 @pytest.mark.unit
-async def test_fetch_catalogs(mocker: MockFixture) -> None:
-    """Should return a Graph."""
-    # Set up the mock
+async def test_create_catalog_leaves_out_missing_api(mocker: MockFixture) -> None:
+    """Should publish the catalog without the apis whose documents are not found."""
+    with open("./tests/files/catalog_1.json") as json_file:
+        catalog = json.load(json_file)
+    missing = catalog["apis"][0]["url"] = "http://example.com/missing.yaml"
+
+    async def _load_spec(session: Any, url: str) -> Tuple[Any, SpecTiming]:
+        if url == missing:
+            return None, SpecTiming(url)
+        return await _mock_load_spec(session, url)
+
     mocker.patch(
-        "SPARQLWrapper.SPARQLWrapper.queryAndConvert", return_value=_mock_queryresult()
+        "dataservice_publisher.service.catalog_service.load_spec",
+        side_effect=_load_spec,
+    )
+    mocker.patch("SPARQLWrapper.SPARQLWrapper.query", return_value=True)
+    mocker.patch("SPARQLWrapper.SPARQLWrapper.queryAndConvert", return_value="")
+    mocker.patch(
+        "dataservice_publisher.service.catalog_service.summary_published",
+        return_value=True,
     )
 
-    g = await fetch_catalogs()
-    assert isinstance(g, Graph)
-    assert len(g) > 0
+    _, summary = await publish_catalog(catalog)
+
+    full = Graph().parse("tests/files/catalog_1.ttl", format="turtle")
+    assert summary.services == len(set(full.objects(None, DCAT.service))) * 2 // 3
+
+
+@pytest.mark.unit
+async def test_create_catalog_in_parallel(mocker: MockFixture) -> None:
+    """Should convert the apis in a process pool, to the same graph as serially."""
+    mocker.patch(
+        "dataservice_publisher.service.catalog_service.load_spec",
+        side_effect=_mock_load_spec,
+    )
+    mocker.patch("SPARQLWrapper.SPARQLWrapper.query", return_value=True)
+    mocker.patch("SPARQLWrapper.SPARQLWrapper.queryAndConvert", return_value="")
+    mocker.patch(
+        "dataservice_publisher.service.catalog_service.summary_published",
+        return_value=True,
+    )
+    mocker.patch(
+        "dataservice_publisher.service.oas_conversion.CONVERSION_PARALLEL_MIN_APIS", 1
+    )
+    with open("./tests/files/catalog_1.json") as json_file:
+        catalog = json.load(json_file)
+
+    mocker.patch("dataservice_publisher.service.oas_conversion.CONVERSION_WORKERS", 0)
+    serial = await create_catalog(catalog)
+    mocker.patch("dataservice_publisher.service.oas_conversion.CONVERSION_WORKERS", 2)
+    try:
+        parallel = await create_catalog(catalog)
+        # Not forked from the worker, which runs threads:
+        context = _get_pool()._mp_context  # type: ignore
+        assert context is not None
+        assert context.get_start_method() == CONVERSION_START_METHOD
+    finally:
+        await stop_conversion_pool(web.Application())
+
+    assert isomorphic(serial, parallel)
+    assert isomorphic(
+        parallel, Graph().parse("tests/files/catalog_1.ttl", format="turtle")
+    )
+
+
+@pytest.mark.unit
+def test_publish_is_conditional_on_version() -> None:
+    """Should not write a version, if another publish wrote it first."""
+    ds = Dataset()
+    context = catalog_uri("1")
+
+    def _publish(title: str, version: int, publication: str) -> None:
+        graph = Graph()
+        graph.add((context, URIRef("urn:title"), Literal(title)))
+        summary = CatalogSummary(str(context), version=version, publication=publication)
+        condition = version_condition(str(context), version - 1)
+        ds.update(
+            " ;\n".join(
+                [
+                    graph_replace(context, graph, condition),
+                    delta_update(str(context), version, Delta({title}), condition),
+                    summary_update(summary, condition),
+                ]
+            )
+        )
+
+    _publish("A", 1, "first")
+    _publish("B", 1, "second")
+
+    assert {Literal("A")} == set(ds.graph(context).objects())
+    assert {Literal("first")} == set(
+        ds.graph(METADATA_GRAPH).objects(None, DSP.publication)
+    )
+    assert 1 == len(set(ds.graph(DELTAS_GRAPH).subjects()))
+
+    _publish("B", 2, "second")
+
+    assert {Literal("B")} == set(ds.graph(context).objects())
+    assert {Literal(2)} == set(ds.graph(METADATA_GRAPH).objects(None, DSP.version))
+    assert 2 == len(set(ds.graph(DELTAS_GRAPH).subjects()))
+
+
+@pytest.mark.unit
+async def test_publish_catalog_retries(mocker: MockFixture) -> None:
+    """Should publish the next version again, when another publish was first."""
+    catalog: Dict[str, Any] = {
+        "identifier": str(catalog_uri("1")),
+        "title": {"en": "Catalog"},
+        "description": {"en": "Description"},
+        "publisher": "https://example.com/publisher",
+        "apis": [],
+    }
+    mocker.patch(
+        "dataservice_publisher.service.catalog_service.fetch_catalog_summary",
+        side_effect=[
+            CatalogSummary(catalog["identifier"], version=1),
+            CatalogSummary(catalog["identifier"], version=2),
+        ],
+    )
+    mocker.patch(
+        "dataservice_publisher.service.catalog_service.fetch_graph",
+        return_value=Graph(),
+    )
+    execute = mocker.patch(
+        "dataservice_publisher.service.catalog_service.execute_update"
+    )
+    mocker.patch(
+        "dataservice_publisher.service.catalog_service.summary_published",
+        side_effect=[False, True],
+    )
+
+    _, summary = await publish_catalog(catalog)
+
+    assert 3 == summary.version
+    assert 2 == execute.call_count
+    assert "FILTER (COALESCE(?current, 0) = 2)" in execute.call_args.args[1]
+
+
+@pytest.mark.unit
+async def test_publish_catalog_in_batch(mocker: MockFixture) -> None:
+    """Should send the update with the batcher of the app, when given one."""
+    catalog: Dict[str, Any] = {
+        "identifier": str(catalog_uri("1")),
+        "title": {"en": "Catalog"},
+        "description": {"en": "Description"},
+        "publisher": "https://example.com/publisher",
+        "apis": [],
+    }
+    mocker.patch(
+        "dataservice_publisher.service.catalog_service.fetch_catalog_summary",
+        return_value=None,
+    )
+    execute = mocker.patch(
+        "dataservice_publisher.service.catalog_service.execute_update"
+    )
+    mocker.patch(
+        "dataservice_publisher.service.catalog_service.summary_published",
+        return_value=True,
+    )
+    batcher = mocker.AsyncMock()
+
+    _, summary = await publish_catalog(catalog, batcher=batcher)
+
+    assert 1 == summary.version
+    assert 0 == execute.call_count
+    batcher.execute.assert_awaited_once()
+    assert catalog["identifier"] == batcher.execute.call_args.args[2]
+
+
+@pytest.mark.unit
+async def test_publish_catalog_conflict(mocker: MockFixture) -> None:
+    """Should give up publishing, when other publishes are first every time."""
+    catalog: Dict[str, Any] = {
+        "identifier": str(catalog_uri("1")),
+        "title": {"en": "Catalog"},
+        "description": {"en": "Description"},
+        "publisher": "https://example.com/publisher",
+        "apis": [],
+    }
+    mocker.patch(
+        "dataservice_publisher.service.catalog_service.fetch_catalog_summary",
+        return_value=None,
+    )
+    execute = mocker.patch(
+        "dataservice_publisher.service.catalog_service.execute_update"
+    )
+    mocker.patch(
+        "dataservice_publisher.service.catalog_service.summary_published",
+        return_value=False,
+    )
+
+    with pytest.raises(PublishConflictError):
+        await publish_catalog(catalog)
+    assert PUBLISH_ATTEMPTS == execute.call_count
+
+
+@pytest.mark.unit
+async def test_unchanged_catalog(mocker: MockFixture) -> None:
+    """Should return the stored catalog only if the body and the documents are same."""
+    with open("./tests/files/catalog_1.json") as json_file:
+        catalog = json.load(json_file)
+    request = request_hash(catalog)
+    validators = ['etag:"v1"'] * len(catalog["apis"])
+    summary = CatalogSummary(
+        catalog["identifier"],
+        version=3,
+        request_hash=request,
+        content_hash=content_hash(request, validators),
+        idempotency_key="key-1",
+    )
+    mocker.patch(
+        "dataservice_publisher.service.catalog_service.fetch_catalog_summary",
+        return_value=summary,
+    )
+    fetch_spec_validator = mocker.patch(
+        "dataservice_publisher.service.catalog_service.fetch_spec_validator",
+        return_value='etag:"v1"',
+    )
+    graph = Graph()
+    mocker.patch(
+        "dataservice_publisher.service.catalog_service.fetch_graph",
+        return_value=graph,
+    )
+
+    reordered = dict(reversed(list(catalog.items())))
+    assert await unchanged_catalog(reordered) == (graph, summary)
+    fetch_spec_validator.return_value = 'etag:"v2"'
+    assert await unchanged_catalog(catalog) is None
+    assert await unchanged_catalog({**catalog, "title": "Other"}) is None
+
+    # A retry with the key of the latest publish gets it, even if the documents changed:
+    assert await unchanged_catalog(catalog, "key-1") == (graph, summary)
+    with pytest.raises(IdempotencyKeyError):
+        await unchanged_catalog({**catalog, "title": "Other"}, "key-1")
 
 
 @pytest.mark.unit
@@ -77,6 +354,11 @@ async def test_get_catalog_by_id_failure(mocker: MockFixture) -> None:
 
 
 # --
+async def _mock_load_spec(session: Any, url: str) -> Tuple[Dict, SpecTiming]:
+    """Return the petstore openAPI-specification for every url."""
+    return _mock_yaml_load(), SpecTiming(url)
+
+
 def _mock_yaml_load() -> Dict[str, Any]:
     """Create a mock openAPI-specification dokument."""
     with open("./tests/files/petstore.yaml", "r") as file:
@@ -0,0 +1,103 @@
+"""Unit test cases for the catalog snapshots module."""
+
+import time
+from typing import Any
+
+import pytest
+from pytest_mock import MockFixture
+from rdflib import Graph, Literal, URIRef
+from SPARQLWrapper.SPARQLExceptions import QueryBadFormed, Unauthorized
+
+from dataservice_publisher.service.catalog_snapshots import (
+    CatalogSnapshots,
+    Circuit,
+    CircuitOpenError,
+    UNAVAILABLE_ERRORS,
+)
+
+
+def _graph(title: str) -> Graph:
+    g = Graph()
+    g.add((URIRef("http://a/1"), URIRef("http://p/title"), Literal(title)))
+    return g
+
+
+@pytest.mark.unit
+async def test_circuit(mocker: MockFixture) -> None:
+    """Should stop calling the backend after consecutive failures, for a while."""
+    snapshots = CatalogSnapshots("", Circuit(failure_threshold=2, open_seconds=30))
+    load = mocker.AsyncMock(side_effect=ConnectionRefusedError())
+
+    for _ in range(2):
+        with pytest.raises(ConnectionRefusedError):
+            await snapshots.call(load)
+    with pytest.raises(CircuitOpenError):
+        await snapshots.call(load)
+    assert load.await_count == 2
+
+    mocker.patch("time.monotonic", return_value=float("inf"))
+    load.side_effect = None
+    load.return_value = "ok"
+    assert await snapshots.call(load) == "ok"
+    assert not snapshots.circuit.open
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "error", [QueryBadFormed(b"Bad query"), Unauthorized(b"Wrong password")]
+)
+async def test_circuit_ignores_client_errors(
+    mocker: MockFixture, error: Exception
+) -> None:
+    """Should not count the errors of a bad request as the backend failing."""
+    snapshots = CatalogSnapshots("", Circuit(failure_threshold=1, open_seconds=30))
+    load = mocker.AsyncMock(side_effect=error)
+
+    for _ in range(2):
+        with pytest.raises(type(error)):
+            await snapshots.call(load)
+    assert not snapshots.circuit.open
+    assert not isinstance(error, UNAVAILABLE_ERRORS)
+
+
+@pytest.mark.unit
+async def test_snapshot_variants(tmp_path: Any) -> None:
+    """Should serialize the snapshot once, until it is replaced or removed."""
+    snapshots = CatalogSnapshots(str(tmp_path))
+    assert await snapshots.variant("/catalogs/1", "text/turtle", _serialize) is None
+
+    snapshots.write("/catalogs/1", _graph("A"))
+    path = await snapshots.variant("/catalogs/1", "text/turtle", _serialize)
+    assert path is not None
+    assert b'"A"' in open(path, "rb").read()
+    assert snapshots.age("/catalogs/1") >= 0
+
+    snapshots.write("/catalogs/1", _graph("C"))
+    path = await snapshots.variant("/catalogs/1", "text/turtle", _serialize)
+    assert path is not None
+    assert b'"C"' in open(path, "rb").read()
+
+    snapshots.remove("/catalogs/1")
+    assert await snapshots.variant("/catalogs/1", "text/turtle", _serialize) is None
+
+
+@pytest.mark.unit
+async def test_snapshot_refresh(tmp_path: Any, mocker: MockFixture) -> None:
+    """Should replace the snapshot with a loaded graph, unless it was just written."""
+    snapshots = CatalogSnapshots(str(tmp_path), refresh_interval=10)
+    snapshots.refresh("/catalogs/1", _graph("A"))
+    snapshots.refresh("/catalogs/1", _graph("B"))
+    path = await snapshots.variant("/catalogs/1", "text/turtle", _serialize)
+    assert path is not None
+    assert b'"A"' in open(path, "rb").read()
+
+    mocker.patch("time.time", return_value=time.time() + 10)
+    snapshots.refresh("/catalogs/1", _graph("B"))
+    await snapshots.flush()
+    path = await snapshots.variant("/catalogs/1", "text/turtle", _serialize)
+    assert path is not None
+    assert b'"B"' in open(path, "rb").read()
+
+
+def _serialize(graph: Graph) -> bytes:
+    return graph.serialize(format="turtle", encoding="utf-8")
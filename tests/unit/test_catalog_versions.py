@@ -0,0 +1,82 @@
+"""Unit test cases for the catalog versions module."""
+
+import pytest
+from rdflib import BNode, Dataset, Graph, Literal, Namespace, URIRef
+
+from dataservice_publisher.service.catalog_registry import DSP
+from dataservice_publisher.service.catalog_versions import (
+    Delta,
+    delta_between,
+    delta_update,
+    deltas_delete,
+    DELTAS_GRAPH,
+    parse_patch,
+    squash,
+)
+
+CATALOG = "http://localhost:8000/catalogs/1"
+EX = Namespace("http://example.com/")
+
+
+def _graph(*titles: str) -> Graph:
+    g = Graph()
+    for title in titles:
+        g.add((URIRef(CATALOG), EX.title, Literal(title, lang="en")))
+    contact = BNode()
+    g.add((URIRef(CATALOG), EX.contactPoint, contact))
+    g.add((contact, EX.email, Literal("post@example.com")))
+    return g
+
+
+@pytest.mark.unit
+def test_delta_between() -> None:
+    """Should find the changed triples, not the unchanged blank nodes."""
+    delta = delta_between(_graph("A", "B"), _graph("B", 'C\n"quoted"'))
+
+    assert delta.added == {f'<{CATALOG}> <{EX.title}> "C\\n\\"quoted\\""@en'}
+    assert delta.removed == {f'<{CATALOG}> <{EX.title}> "A"@en'}
+
+
+@pytest.mark.unit
+def test_patch_round_trip() -> None:
+    """Should read back the delta from its RDF Patch."""
+    delta = delta_between(Graph(), _graph("A", "B\nC"))
+
+    patch = delta.to_patch()
+
+    assert len(patch.splitlines()) == 4
+    assert all(row.startswith("A ") for row in patch.splitlines())
+    assert parse_patch(patch) == delta
+
+
+@pytest.mark.unit
+def test_squash() -> None:
+    """Should return the net delta of consecutive versions."""
+    v2 = Delta(added={"b", "c"}, removed={"a"})
+    v3 = Delta(added={"a"}, removed={"c", "d"})
+
+    assert squash([(2, v2), (3, v3)], 1) == Delta(added={"b"}, removed={"d"})
+    assert squash([(3, v3)], 2) == v3
+    assert squash([], 3) == Delta()
+
+
+@pytest.mark.unit
+def test_squash_missing_version() -> None:
+    """Should return None if a delta is no longer kept."""
+    assert squash([(3, Delta(added={"a"}))], 1) is None
+
+
+@pytest.mark.unit
+def test_delta_update_keeps_latest() -> None:
+    """Should keep the latest deltas of the catalog only."""
+    ds = Dataset()
+    for version in range(1, 13):
+        ds.update(delta_update(CATALOG, version, Delta(added={str(version)})))
+
+    versions = sorted(
+        int(str(v)) for v in ds.graph(DELTAS_GRAPH).objects(None, DSP.version)
+    )
+    assert versions == list(range(3, 13))
+
+    ds.update(deltas_delete(CATALOG))
+    assert len(ds.graph(DELTAS_GRAPH)) == 0
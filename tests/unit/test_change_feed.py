@@ -0,0 +1,76 @@
+"""Unit test cases for the change feed module."""
+
+import asyncio
+from typing import Any
+
+import pytest
+
+from dataservice_publisher.service.change_feed import ChangeFeed, ChangeLog
+
+
+@pytest.mark.unit
+def test_change_log(tmp_path: Any) -> None:
+    """Should append events, return them after an id and keep only the latest."""
+    log = ChangeLog(str(tmp_path / "changes.db"), retained=2)
+    assert log.last_id() == 0
+    assert log.first_id() is None
+
+    first = log.append("created", "urn:a", 1, '"etag"')
+    log.append("updated", "urn:a", 2)
+    last = log.append("deleted", "urn:a", 2)
+
+    assert [event.type for event in log.since(first.id)] == ["updated", "deleted"]
+    assert log.first_id() == first.id + 1
+    assert log.last_id() == last.id
+    assert last.to_sse().startswith(f"id: {last.id}\nevent: deleted\ndata: ".encode())
+
+    # Ids are never reused:
+    log.close()
+    log = ChangeLog(str(tmp_path / "changes.db"), retained=2)
+    assert log.append("created", "urn:b", 1).id == last.id + 1
+    log.close()
+
+
+@pytest.mark.unit
+async def test_change_feed_fans_out_events_of_all_workers(tmp_path: Any) -> None:
+    """Should send events appended by any worker to the subscribers."""
+    feed = ChangeFeed(ChangeLog(str(tmp_path / "changes.db")), poll_interval=0.01)
+    other_worker = ChangeLog(str(tmp_path / "changes.db"))
+    await feed.start()
+    queue = feed.subscribe()
+
+    feed.publish("created", "urn:a", 1)
+    await asyncio.sleep(0.01)
+    other_worker.append("updated", "urn:a", 2)
+
+    first = await asyncio.wait_for(queue.get(), 1)
+    second = await asyncio.wait_for(queue.get(), 1)
+    assert (first.type, second.type) == ("created", "updated")
+    assert second.id > first.id
+
+    await feed.stop()
+    assert await queue.get() is None
+    other_worker.close()
+
+
+@pytest.mark.unit
+async def test_change_feed_listeners(tmp_path: Any) -> None:
+    """Should call the listeners with the events of all workers, despite failures."""
+    feed = ChangeFeed(ChangeLog(str(tmp_path / "changes.db")), poll_interval=0.01)
+    other_worker = ChangeLog(str(tmp_path / "changes.db"))
+    catalogs = []
+
+    def _failing(event: Any) -> None:
+        raise ValueError("Listener failed")
+
+    feed.listeners.extend([_failing, lambda event: catalogs.append(event.catalog)])
+    await feed.start()
+    other_worker.append("deleted", "urn:a", 2)
+    for _ in range(100):
+        if catalogs:
+            break
+        await asyncio.sleep(0.01)
+
+    assert catalogs == ["urn:a"]
+    await feed.stop()
+    other_worker.close()
@@ -0,0 +1,121 @@
+"""Unit test cases for the gunicorn config module."""
+
+import logging
+from typing import Any, Iterator
+
+from gunicorn.config import Config
+import pytest
+from pytest_mock import MockFixture
+
+from dataservice_publisher.gunicorn_config import (
+    CustomGunicornLogger,
+    HealthRouteFilter,
+    SamplingFilter,
+)
+
+
+def _record(request_line: str = "", status: Any = None) -> logging.LogRecord:
+    record = logging.LogRecord("gunicorn.access", logging.INFO, "", 0, "", (), None)
+    if request_line:
+        record.first_request_line = request_line
+    if status is not None:
+        record.response_status = status
+    return record
+
+
+@pytest.fixture
+def loggers() -> Iterator[None]:
+    """Restore the handlers and filters the logger setup replaces."""
+    names = [
+        "",
+        "gunicorn",
+        "gunicorn.access",
+        "gunicorn.error",
+        "gunicorn.http",
+        "gunicorn.http.wsgi",
+    ]
+    saved = {
+        name: (
+            logging.getLogger(name).level,
+            list(logging.getLogger(name).handlers),
+            list(logging.getLogger(name).filters),
+        )
+        for name in names
+    }
+    yield
+    for name, (level, handlers, filters) in saved.items():
+        logger = logging.getLogger(name)
+        logger.setLevel(level)
+        logger.handlers = handlers
+        logger.filters = filters
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "request_line",
+    ["GET /ping HTTP/1.1", "GET /ready HTTP/1.1", "HEAD /ping?probe=1 HTTP/1.1"],
+)
+def test_health_route_filter_drops_health_routes(request_line: str) -> None:
+    """Should drop the requests to the health routes."""
+    assert not HealthRouteFilter().filter(_record(request_line))
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "request_line",
+    ["GET /catalogs HTTP/1.1", "GET /pings HTTP/1.1", "GET /catalogs/ping HTTP/1.1"],
+)
+def test_health_route_filter_keeps_other_routes(request_line: str) -> None:
+    """Should keep the requests to the other routes, even ones containing ping."""
+    assert HealthRouteFilter().filter(_record(request_line))
+
+
+@pytest.mark.unit
+def test_health_route_filter_keeps_other_records() -> None:
+    """Should keep records without a request line."""
+    assert HealthRouteFilter().filter(_record())
+    assert HealthRouteFilter().filter(_record("garbage"))
+
+
+@pytest.mark.unit
+def test_sampling_filter_keeps_all_at_full_rate() -> None:
+    """Should keep every record when the rate is 1."""
+    assert all(SamplingFilter(1.0).filter(_record(status=200)) for _ in range(100))
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("status", [200, 204, 304, "201"])
+def test_sampling_filter_samples_successful_requests(
+    mocker: MockFixture, status: Any
+) -> None:
+    """Should keep a successful request only if it falls within the rate."""
+    random = mocker.patch("dataservice_publisher.gunicorn_config.random.random")
+    sampling = SamplingFilter(0.25)
+
+    random.return_value = 0.2
+    assert sampling.filter(_record(status=status))
+    random.return_value = 0.3
+    assert not sampling.filter(_record(status=status))
+    assert not SamplingFilter(0.0).filter(_record(status=status))
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("status", [400, 404, 500, 503, None])
+def test_sampling_filter_keeps_failed_requests(status: Any) -> None:
+    """Should keep every request that did not succeed, whatever the rate."""
+    assert SamplingFilter(0.0).filter(_record(status=status))
+
+
+@pytest.mark.unit
+def test_logger_setup_is_repeatable(mocker: MockFixture, loggers: None) -> None:
+    """Should register the listener shutdown once, and not stack the filters."""
+    register = mocker.patch("dataservice_publisher.gunicorn_config.atexit.register")
+    logger = CustomGunicornLogger(Config())
+    logger.setup(Config())
+    logger.setup(Config())
+    logger.stop_queue_listener()
+
+    register.assert_called_once_with(logger.stop_queue_listener)
+    filters = logging.getLogger("gunicorn.access").filters
+    assert [type(f) for f in filters].count(HealthRouteFilter) == 1
+    assert [type(f) for f in filters].count(SamplingFilter) == 1
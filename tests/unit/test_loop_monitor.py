@@ -0,0 +1,38 @@
+"""Unit test cases for the loop monitor module."""
+
+import asyncio
+import time
+
+import pytest
+
+from dataservice_publisher.service.loop_monitor import LoopMonitor
+from dataservice_publisher.service.metrics import MetricsRegistry
+
+
+def _block(seconds: float) -> None:
+    time.sleep(seconds)
+
+
+@pytest.mark.unit
+async def test_loop_monitor(caplog: pytest.LogCaptureFixture) -> None:
+    """Should measure the lag, and log what blocks the loop."""
+    monitor = LoopMonitor(interval=0.01, slow_callback_threshold=0.05)
+    task = asyncio.create_task(monitor.run())
+    await asyncio.sleep(0.05)
+
+    _block(0.3)
+    await asyncio.sleep(0.05)
+    task.cancel()
+
+    assert monitor.max_lag >= 0.2
+    assert monitor.blocked == 1
+    assert "Event loop blocked for more than" in caplog.text
+    assert "_block" in caplog.text
+    metrics = MetricsRegistry()
+    monitor.register(metrics)
+    exposed = metrics.expose()
+    assert "dataservice_publisher_event_loop_blocked_total 1" in exposed
+    assert (
+        f"dataservice_publisher_event_loop_lag_observed_seconds_count "
+        f"{monitor.measurements}" in exposed
+    )
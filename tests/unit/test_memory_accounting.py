@@ -0,0 +1,67 @@
+"""Unit test cases for the memory accounting module."""
+
+import logging
+import tracemalloc
+
+import pytest
+
+from dataservice_publisher.service import memory_accounting
+from dataservice_publisher.service.memory_accounting import (
+    annotate,
+    measure,
+    MemoryAccount,
+    MemoryAccounts,
+    record,
+)
+from dataservice_publisher.service.metrics import MetricsRegistry
+
+
+@pytest.mark.unit
+def test_memory_account(caplog: pytest.LogCaptureFixture) -> None:
+    """Should account the peak memory of the request and of its stages."""
+    tracemalloc.start()
+    try:
+        account = MemoryAccount("POST /catalogs")
+        token = memory_accounting._account.set(account)
+        record("spec_text", 1000)
+        with measure("graph"):
+            data = bytearray(4_000_000)
+            del data
+        with measure("serialized"):
+            data = bytearray(2_000_000)
+        assert data
+        annotate("http://example.com/catalogs/1", 42)
+        memory_accounting._account.reset(token)
+        account.close()
+    finally:
+        tracemalloc.stop()
+
+    assert account.stages["spec_text"] == 1000
+    assert 3_900_000 <= account.stages["graph"] < 5_000_000
+    assert 1_900_000 <= account.stages["serialized"] < 3_000_000
+    assert account.peak >= 3_900_000
+
+    caplog.set_level(logging.INFO)
+    accounts = MemoryAccounts(enabled=True)
+    accounts.observe(account)
+    assert "catalog http://example.com/catalogs/1, 42 triples" in caplog.text
+    metrics = MetricsRegistry()
+    accounts.register(metrics)
+    exposed = metrics.expose()
+    assert "dataservice_publisher_request_memory_peak_bytes_count 1" in exposed
+    assert (
+        'dataservice_publisher_stage_memory_peak_bytes_bucket{stage="graph",le="1000000.0"} 0'
+        in exposed
+    )
+    assert (
+        'dataservice_publisher_stage_memory_peak_bytes_bucket{stage="graph",le="16000000.0"} 1'
+        in exposed
+    )
+
+
+@pytest.mark.unit
+def test_measure_without_account() -> None:
+    """Should do nothing outside of an accounted request."""
+    with measure("graph"):
+        record("spec_text", 1000)
+        annotate("1", 1)
@@ -0,0 +1,147 @@
+"""Unit test cases for the oas loader module."""
+
+import asyncio
+import json
+from typing import Any
+
+from aiohttp import ClientSession, web
+import pytest
+from pytest_mock import MockFixture
+
+from dataservice_publisher.exceptions.exceptions import OASLoadError
+from dataservice_publisher.service.oas_loader import (
+    fetch_spec_validator,
+    load_spec,
+    parse_spec,
+)
+
+
+@pytest.mark.unit
+def test_parse_spec_json_and_yaml() -> None:
+    """Should parse JSON with the JSON parser and anything else as YAML."""
+    with open("./tests/files/petstore.yaml", "rb") as file:
+        body = file.read()
+
+    oas, format = parse_spec(body)
+    assert format == "yaml"
+    assert oas["info"]["title"] == "Swagger Petstore"
+
+    oas_json, format = parse_spec(json.dumps(oas).encode())
+    assert format == "json"
+    assert oas_json == oas
+
+    _, format = parse_spec(b"openapi: 3.0.0", "application/json")
+    assert format == "yaml"
+
+
+@pytest.mark.unit
+async def test_load_spec(aiohttp_server: Any, mocker: MockFixture) -> None:
+    """Should fetch and parse the document, in a thread when it is large."""
+    mocker.patch("dataservice_publisher.service.oas_loader.OAS_OFFLOAD_BYTES", 10)
+    to_thread = mocker.spy(asyncio, "to_thread")
+    server = await aiohttp_server(_app())
+
+    async with ClientSession() as session:
+        oas, timing = await load_spec(session, str(server.make_url("/petstore.json")))
+
+    assert oas is not None
+    assert oas["info"]["title"] == "Swagger Petstore"
+    assert timing.format == "json"
+    assert timing.bytes > 10
+    assert timing.to_dict()["seconds"] >= 0
+    to_thread.assert_called_once()
+
+
+@pytest.mark.unit
+async def test_load_spec_too_large(aiohttp_server: Any, mocker: MockFixture) -> None:
+    """Should raise OASLoadError."""
+    mocker.patch("dataservice_publisher.service.oas_loader.OAS_MAX_BYTES", 100)
+    server = await aiohttp_server(_app())
+
+    async with ClientSession() as session:
+        with pytest.raises(OASLoadError):
+            await load_spec(session, str(server.make_url("/petstore.json")))
+
+
+@pytest.mark.unit
+async def test_load_spec_timeout(aiohttp_server: Any, mocker: MockFixture) -> None:
+    """Should raise OASLoadError."""
+    mocker.patch("dataservice_publisher.service.oas_loader.OAS_READ_TIMEOUT", 0.1)
+    server = await aiohttp_server(_app())
+
+    async with ClientSession() as session:
+        with pytest.raises(OASLoadError):
+            await load_spec(session, str(server.make_url("/slow")))
+
+
+@pytest.mark.unit
+async def test_load_spec_trickled(aiohttp_server: Any, mocker: MockFixture) -> None:
+    """Should raise OASLoadError when the document takes too long in all."""
+    mocker.patch("dataservice_publisher.service.oas_loader.OAS_TOTAL_TIMEOUT", 0.2)
+    server = await aiohttp_server(_app())
+
+    async with ClientSession() as session:
+        with pytest.raises(OASLoadError):
+            await load_spec(session, str(server.make_url("/trickle")))
+
+
+@pytest.mark.unit
+async def test_load_spec_not_found(aiohttp_server: Any, mocker: MockFixture) -> None:
+    """Should return no document, or raise OASLoadError if strict."""
+    server = await aiohttp_server(_app())
+
+    async with ClientSession() as session:
+        oas, _ = await load_spec(session, str(server.make_url("/missing")))
+        assert oas is None
+
+        mocker.patch("dataservice_publisher.service.oas_loader.OAS_STRICT_STATUS", True)
+        with pytest.raises(OASLoadError):
+            await load_spec(session, str(server.make_url("/missing")))
+
+
+@pytest.mark.unit
+async def test_fetch_spec_validator(aiohttp_server: Any) -> None:
+    """Should ask for the validator with HEAD, or else digest the document."""
+    server = await aiohttp_server(_app())
+
+    async with ClientSession() as session:
+        url = str(server.make_url("/petstore.json"))
+        validator = await fetch_spec_validator(session, url)
+        _, timing = await load_spec(session, url)
+        assert validator.startswith("sha256:")
+        assert validator == timing.validator
+
+        url = str(server.make_url("/versioned.json"))
+        assert await fetch_spec_validator(session, url) == 'etag:"v1"'
+        _, timing = await load_spec(session, url)
+        assert timing.validator == 'etag:"v1"'
+
+
+def _app() -> web.Application:
+    async def petstore(request: web.Request) -> web.Response:
+        with open("./tests/files/petstore.yaml", "rb") as file:
+            oas, _ = parse_spec(file.read())
+        return web.json_response(oas)
+
+    async def slow(request: web.Request) -> web.Response:
+        await asyncio.sleep(1)
+        return web.json_response({})
+
+    async def trickle(request: web.Request) -> web.StreamResponse:
+        response = web.StreamResponse()
+        await response.prepare(request)
+        for _ in range(10):
+            await response.write(b" ")
+            await asyncio.sleep(0.05)
+        await response.write_eof()
+        return response
+
+    async def versioned(request: web.Request) -> web.Response:
+        return web.json_response({"openapi": "3.0.0"}, headers={"ETag": '"v1"'})
+
+    app = web.Application()
+    app.router.add_get("/petstore.json", petstore)
+    app.router.add_get("/versioned.json", versioned)
+    app.router.add_get("/slow", slow)
+    app.router.add_get("/trickle", trickle)
+    return app
@@ -0,0 +1,198 @@
+"""Unit test cases for the publish jobs module."""
+
+import asyncio
+import time
+from typing import Any, Dict
+
+import pytest
+from pytest_mock import MockFixture
+from rdflib import Graph, URIRef
+
+from dataservice_publisher.exceptions.exceptions import RequestBodyError
+from dataservice_publisher.service.admission import Limiter
+from dataservice_publisher.service.catalog_registry import CatalogSummary
+from dataservice_publisher.service.publish_jobs import (
+    JobQueueFullError,
+    JobStore,
+    PublishJob,
+    PublishJobs,
+)
+
+CATALOG: Dict[str, Any] = {"identifier": "http://localhost:8000/catalogs/1", "apis": []}
+
+
+async def _finished(jobs: PublishJobs, id: str) -> PublishJob:
+    """Wait for the job to finish, and return it."""
+    for _ in range(100):
+        job = await jobs.get(id)
+        if job is not None and job.finished is not None:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"Job {id} did not finish")
+
+
+@pytest.mark.unit
+async def test_publish_jobs_queue_full(tmp_path: Any) -> None:
+    """Should raise JobQueueFullError when the queue is full."""
+    jobs = PublishJobs(queue_size=1, store=JobStore(str(tmp_path / "jobs.db")))
+    job = await jobs.submit(CATALOG)
+
+    stored = await jobs.get(job.id)
+    assert stored is not None
+    assert stored.to_dict() == job.to_dict()
+    with pytest.raises(JobQueueFullError):
+        await jobs.submit(CATALOG)
+
+
+@pytest.mark.unit
+async def test_publish_job_failure(tmp_path: Any, mocker: MockFixture) -> None:
+    """Should mark the job as failed with the error message."""
+    mocker.patch(
+        "dataservice_publisher.service.publish_jobs.unchanged_catalog",
+        return_value=None,
+    )
+    mocker.patch(
+        "dataservice_publisher.service.publish_jobs.publish_catalog",
+        side_effect=RequestBodyError("KeyError when processing request body"),
+    )
+    jobs = PublishJobs(workers=1, store=JobStore(str(tmp_path / "jobs.db")))
+    job = await jobs.submit(CATALOG)
+
+    await jobs.start()
+    job = await _finished(jobs, job.id)
+    await jobs.stop()
+
+    assert job.status == "failed"
+    assert job.error == "KeyError when processing request body"
+
+
+@pytest.mark.unit
+async def test_publish_job_unchanged(tmp_path: Any, mocker: MockFixture) -> None:
+    """Should complete the job without publishing an unchanged catalog."""
+    graph = Graph()
+    graph.add((URIRef(str(CATALOG["identifier"])), URIRef("urn:p"), URIRef("urn:o")))
+    unchanged_catalog = mocker.patch(
+        "dataservice_publisher.service.publish_jobs.unchanged_catalog",
+        return_value=(graph, CatalogSummary(str(CATALOG["identifier"]), version=2)),
+    )
+    publish_catalog = mocker.patch(
+        "dataservice_publisher.service.publish_jobs.publish_catalog"
+    )
+    jobs = PublishJobs(workers=1, store=JobStore(str(tmp_path / "jobs.db")))
+    job = await jobs.submit(CATALOG, "key-1")
+
+    await jobs.start()
+    job = await _finished(jobs, job.id)
+    await jobs.stop()
+
+    unchanged_catalog.assert_called_once()
+    assert unchanged_catalog.call_args.args[:2] == (CATALOG, "key-1")
+    publish_catalog.assert_not_called()
+    assert job.status == "completed"
+    assert job.to_dict()["unchanged"] is True
+    assert job.triples == 1
+
+
+@pytest.mark.unit
+async def test_publish_job_waits_for_fetches(
+    tmp_path: Any, mocker: MockFixture
+) -> None:
+    """Should wait for a turn to fetch documents, rather than be shed."""
+    fetches = Limiter("oas_fetches", limit=1, queue_size=0)
+
+    async def _unchanged_catalog(catalog: Any, key: Any, fetch_turn: Any) -> Any:
+        async with fetch_turn():
+            return Graph(), CatalogSummary(str(CATALOG["identifier"]))
+
+    mocker.patch(
+        "dataservice_publisher.service.publish_jobs.unchanged_catalog",
+        side_effect=_unchanged_catalog,
+    )
+    jobs = PublishJobs(
+        workers=1, store=JobStore(str(tmp_path / "jobs.db")), fetches=fetches
+    )
+    job = await jobs.submit(CATALOG)
+    await fetches.acquire()
+
+    await jobs.start()
+    await asyncio.sleep(0.05)
+    assert (1, 0) == (fetches.queued, fetches.shed)
+    fetches.release()
+    job = await _finished(jobs, job.id)
+    await jobs.stop()
+
+    assert job.status == "completed"
+
+
+@pytest.mark.unit
+async def test_publish_jobs_shared_by_workers(
+    tmp_path: Any, mocker: MockFixture
+) -> None:
+    """Should let any worker run a job and tell its status."""
+    mocker.patch(
+        "dataservice_publisher.service.publish_jobs.unchanged_catalog",
+        return_value=(Graph(), CatalogSummary(str(CATALOG["identifier"]))),
+    )
+    filename = str(tmp_path / "jobs.db")
+    worker_1 = PublishJobs(workers=1, store=JobStore(filename), poll_interval=0.01)
+    worker_2 = PublishJobs(workers=1, store=JobStore(filename), poll_interval=0.01)
+    job = await worker_1.submit(CATALOG)
+
+    await worker_2.start()
+    job = await _finished(worker_1, job.id)
+    await worker_2.stop()
+
+    assert job.status == "completed"
+
+
+@pytest.mark.unit
+async def test_publish_jobs_survive_restart(tmp_path: Any, mocker: MockFixture) -> None:
+    """Should run again the jobs of a stopped worker, or of one whose lease ran out."""
+    started = asyncio.Event()
+
+    async def _slow_unchanged_catalog(*args: Any) -> None:
+        started.set()
+        await asyncio.sleep(10)
+
+    mocker.patch(
+        "dataservice_publisher.service.publish_jobs.unchanged_catalog",
+        side_effect=_slow_unchanged_catalog,
+    )
+    filename = str(tmp_path / "jobs.db")
+    jobs = PublishJobs(workers=1, store=JobStore(filename))
+    job = await jobs.submit(CATALOG)
+    await jobs.start()
+    await asyncio.wait_for(started.wait(), 1)
+    await jobs.stop()
+
+    store = JobStore(filename)
+    stored = store.get(job.id)
+    assert stored is not None and stored.status == "pending"
+
+    # A worker dying does not put the job back, its lease runs out:
+    claimed = store.claim(lease=60)
+    assert claimed is not None and claimed.id == job.id
+    assert store.claim(lease=60) is None
+    mocker.patch("time.time", return_value=time.time() + 61)
+    claimed = store.claim(lease=60)
+    assert claimed is not None and claimed.id == job.id
+    store.close()
+
+
+@pytest.mark.unit
+def test_job_store_retains_finished_jobs(tmp_path: Any) -> None:
+    """Should forget the oldest finished jobs beyond the retained number."""
+    store = JobStore(str(tmp_path / "jobs.db"))
+    ids = []
+    for i in range(3):
+        job = PublishJob(CATALOG)
+        store.add(job, queue_size=10, retained=1)
+        claimed = store.claim(lease=60)
+        assert claimed is not None
+        claimed.status, claimed.finished = "completed", float(i)
+        store.save(claimed)
+        ids.append(job.id)
+    store.add(PublishJob(CATALOG), queue_size=10, retained=1)
+
+    assert [store.get(id) is not None for id in ids] == [False, False, True]
+    store.close()
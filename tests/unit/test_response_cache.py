@@ -0,0 +1,275 @@
+"""Unit test cases for the response cache and the cache warm-up."""
+
+from typing import Any
+
+from aiohttp import web
+import pytest
+from pytest_mock import MockFixture
+
+from dataservice_publisher.service.cache_warmup import (
+    start_cache_warmup,
+    warm_up,
+    WARMUP_STATE,
+    WARMUP_TASK,
+    WarmupState,
+)
+from dataservice_publisher.service.catalog_registry import (
+    CATALOG_REGISTRY,
+    CatalogRegistry,
+)
+from dataservice_publisher.service.response_cache import RESPONSE_CACHE, ResponseCache
+from dataservice_publisher.service.shared_cache import SharedCache
+
+
+@pytest.mark.unit
+def test_response_cache_put_and_get() -> None:
+    """Should return the cached body for path and content type."""
+    cache = ResponseCache(ttl=60, max_entries=10)
+    cache.put("/catalogs/1", "text/turtle", b"body")
+
+    assert cache.get("/catalogs/1", "text/turtle") == b"body"
+    assert cache.get("/catalogs/1", "application/ld+json") is None
+    assert cache.most_requested(1) == ["/catalogs/1"]
+
+
+@pytest.mark.unit
+def test_response_cache_evicts_least_recently_used() -> None:
+    """Should evict the least recently used entry when full."""
+    cache = ResponseCache(ttl=60, max_entries=2)
+    cache.put("/catalogs/1", "text/turtle", b"1")
+    cache.put("/catalogs/2", "text/turtle", b"2")
+    cache.get("/catalogs/1", "text/turtle")
+    cache.put("/catalogs/3", "text/turtle", b"3")
+
+    assert cache.get("/catalogs/1", "text/turtle") == b"1"
+    assert cache.get("/catalogs/2", "text/turtle") is None
+    assert cache.get("/catalogs/3", "text/turtle") == b"3"
+
+
+@pytest.mark.unit
+def test_response_cache_expiry_and_invalidation(mocker: MockFixture) -> None:
+    """Should not return expired or invalidated entries."""
+    cache = ResponseCache(ttl=60, max_entries=10)
+    cache.put("/catalogs", "text/turtle", b"list")
+    cache.put("/catalogs/1", "text/turtle", b"1")
+
+    cache.invalidate("/catalogs")
+    assert cache.get("/catalogs", "text/turtle") is None
+    assert cache.get("/catalogs/1", "text/turtle") == b"1"
+
+    mocker.patch("time.monotonic", return_value=float("inf"))
+    assert cache.get("/catalogs/1", "text/turtle") is None
+
+
+@pytest.mark.unit
+def test_response_cache_stale_while_revalidate(mocker: MockFixture) -> None:
+    """Should return an expired entry as stale within the grace window only."""
+    monotonic = mocker.patch("time.monotonic", return_value=0)
+    cache = ResponseCache(ttl=60, max_entries=10, stale_while_revalidate=30)
+    cache.put("/catalogs/1", "text/turtle", b"1")
+
+    monotonic.return_value = 70
+    assert cache.get("/catalogs/1", "text/turtle") is None
+    assert cache.get_stale("/catalogs/1", "text/turtle") == b"1"
+
+    monotonic.return_value = 100
+    assert cache.get_stale("/catalogs/1", "text/turtle") is None
+
+
+@pytest.mark.unit
+def test_response_cache_disabled() -> None:
+    """Should not store anything when ttl is 0."""
+    cache = ResponseCache(ttl=0, max_entries=10)
+    cache.put("/catalogs/1", "text/turtle", b"1")
+
+    assert cache.get("/catalogs/1", "text/turtle") is None
+
+
+@pytest.mark.unit
+def test_response_cache_snapshot(tmp_path: Any) -> None:
+    """Should restore entries and request counts from a snapshot."""
+    filename = str(tmp_path / "snapshot.json")
+    cache = ResponseCache(ttl=60, max_entries=10)
+    cache.put("/catalogs/1", "text/turtle", b"1")
+    cache.save(filename)
+
+    restored = ResponseCache(ttl=60, max_entries=10)
+    assert restored.load(filename) == 1
+    assert restored.get("/catalogs/1", "text/turtle") == b"1"
+    assert restored.most_requested(1) == ["/catalogs/1"]
+    assert ResponseCache().load(str(tmp_path / "missing.json")) == 0
+
+
+@pytest.mark.unit
+def test_response_cache_snapshot_expiry(tmp_path: Any, mocker: MockFixture) -> None:
+    """Should keep the age of entries in a snapshot, dropping the expired ones."""
+    filename = str(tmp_path / "snapshot.json")
+    wall_clock = mocker.patch("time.time", return_value=1000.0)
+    monotonic = mocker.patch("time.monotonic", return_value=0.0)
+    cache = ResponseCache(ttl=60, max_entries=10, shared_dir="")
+    cache.put("/catalogs/1", "text/turtle", b"1")
+    wall_clock.return_value, monotonic.return_value = 1040.0, 40.0
+    cache.put("/catalogs/2", "text/turtle", b"2")
+    cache.save(filename)
+
+    # In a new process, with another monotonic clock:
+    wall_clock.return_value, monotonic.return_value = 1070.0, 5.0
+    restored = ResponseCache(ttl=60, max_entries=10, shared_dir="")
+    assert restored.load(filename) == 1
+    assert restored.get("/catalogs/1", "text/turtle") is None
+    assert restored.get("/catalogs/2", "text/turtle") == b"2"
+
+    # The rest of its time to live, not a new one:
+    monotonic.return_value = 36.0
+    assert restored.get("/catalogs/2", "text/turtle") is None
+
+
+@pytest.mark.unit
+def test_response_cache_forget() -> None:
+    """Should remove the entries of a catalog changed by another worker."""
+    cache = ResponseCache(ttl=60, max_entries=10, shared_dir="")
+    cache.put("/catalogs", "text/turtle", b"list")
+    cache.put("/catalogs/1", "text/turtle", b"1")
+    cache.put("/catalogs/2", "text/turtle", b"2")
+
+    cache.forget("1")
+
+    assert cache.get("/catalogs", "text/turtle") is None
+    assert cache.get("/catalogs/1", "text/turtle") is None
+    assert cache.get("/catalogs/2", "text/turtle") == b"2"
+
+
+@pytest.mark.unit
+def test_shared_cache_across_workers(tmp_path: Any) -> None:
+    """Should share entries, and their invalidation, between workers of a host."""
+    worker_1 = ResponseCache(ttl=60, max_entries=10, shared_dir=str(tmp_path))
+    worker_2 = ResponseCache(ttl=60, max_entries=10, shared_dir=str(tmp_path))
+    worker_1.put("/catalogs", "text/turtle", b"list")
+    worker_1.put("/catalogs/1", "text/turtle", b"1")
+
+    body = worker_2.get("/catalogs/1", "text/turtle")
+    assert isinstance(body, memoryview)
+    assert body == b"1"
+
+    worker_2.invalidate_catalog("1")
+    assert worker_1.get("/catalogs/1", "text/turtle") is None
+    assert worker_1.get("/catalogs", "text/turtle") is None
+
+    worker_2.put("/catalogs/1", "text/turtle", b"2")
+    assert worker_1.get("/catalogs/1", "text/turtle") == b"2"
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("shared", [False, True])
+def test_response_cache_put_after_invalidation(tmp_path: Any, shared: bool) -> None:
+    """Should not store a body loaded before its path was invalidated."""
+    shared_dir = str(tmp_path) if shared else ""
+    cache = ResponseCache(ttl=60, max_entries=10, shared_dir=shared_dir)
+    other = ResponseCache(ttl=60, max_entries=10, shared_dir=shared_dir)
+
+    generation = cache.generation("/catalogs/1")
+    # Changed by this worker, or by another one as the change feed tells:
+    if shared:
+        other.invalidate_catalog("1")
+    else:
+        cache.forget("1")
+    cache.put("/catalogs/1", "text/turtle", b"old", generation=generation)
+
+    assert cache.get("/catalogs/1", "text/turtle") is None
+    generation = cache.generation("/catalogs/1")
+    cache.put("/catalogs/1", "text/turtle", b"new", generation=generation)
+    assert cache.get("/catalogs/1", "text/turtle") == b"new"
+
+
+@pytest.mark.unit
+def test_shared_cache_expiry_and_sweep(tmp_path: Any, mocker: MockFixture) -> None:
+    """Should not return expired entries, and sweep the oldest ones."""
+    cache = SharedCache(str(tmp_path), ttl=60, max_entries=2)
+    for id in range(3):
+        cache.put(f"/catalogs/{id}", "text/turtle", b"")
+    assert cache.get("/catalogs/0", "text/turtle") == b""
+
+    cache.sweep()
+    assert (
+        sum(cache.get(f"/catalogs/{id}", "text/turtle") is not None for id in range(3))
+        == 2
+    )
+
+    mocker.patch("time.time", return_value=float("inf"))
+    assert cache.get("/catalogs/2", "text/turtle") is None
+
+
+@pytest.mark.unit
+def test_shared_cache_snapshot(tmp_path: Any) -> None:
+    """Should keep only the request counts in the snapshot of a shared cache."""
+    filename = str(tmp_path / "snapshot.json")
+    shared_dir = str(tmp_path / "shared")
+    cache = ResponseCache(ttl=60, max_entries=10, shared_dir=shared_dir)
+    cache.put("/catalogs/1", "text/turtle", b"1")
+    cache.save(filename)
+
+    restored = ResponseCache(ttl=60, max_entries=10, shared_dir=shared_dir)
+    assert restored.load(filename) == 0
+    assert restored.most_requested(1) == ["/catalogs/1"]
+    assert restored.get("/catalogs/1", "text/turtle") == b"1"
+
+
+@pytest.mark.unit
+async def test_start_cache_warmup_disabled_cache(mocker: MockFixture) -> None:
+    """Should not warm up a disabled cache, nor hold the worker as not ready."""
+    mocker.patch("dataservice_publisher.service.cache_warmup.CACHE_WARMUP", True)
+    app = web.Application()
+    app[RESPONSE_CACHE] = ResponseCache(ttl=0)
+    app[CATALOG_REGISTRY] = CatalogRegistry()
+    app[WARMUP_STATE] = WarmupState()
+
+    await start_cache_warmup(app)
+
+    assert app[WARMUP_STATE].done
+    assert WARMUP_TASK not in app
+
+
+@pytest.mark.unit
+async def test_warm_up(mocker: MockFixture) -> None:
+    """Should preload the catalog list and the catalogs in it."""
+    mocker.patch("dataservice_publisher.service.cache_warmup.CACHE_WARMUP_JITTER", 0)
+    mocker.patch(
+        "dataservice_publisher.service.cache_warmup.DATASERVICE_PUBLISHER_URL",
+        "http://localhost:8000",
+    )
+    mocker.patch(
+        "SPARQLWrapper.SPARQLWrapper.queryAndConvert", return_value=_mock_queryresult()
+    )
+    cache = ResponseCache(ttl=60, max_entries=10)
+    state = WarmupState()
+
+    await warm_up(cache, CatalogRegistry(), state)
+
+    assert state.done
+    assert (state.loaded, state.total) == (1, 1)
+    assert cache.get("/catalogs", "text/turtle")
+    assert cache.get("/catalogs/1", "text/turtle")
+
+
+@pytest.mark.unit
+async def test_warm_up_failure(mocker: MockFixture) -> None:
+    """Should be done, with nothing loaded, when the backend fails."""
+    mocker.patch("dataservice_publisher.service.cache_warmup.CACHE_WARMUP_JITTER", 0)
+    mocker.patch(
+        "SPARQLWrapper.SPARQLWrapper.queryAndConvert", side_effect=Exception("down")
+    )
+    state = WarmupState()
+
+    await warm_up(ResponseCache(ttl=60, max_entries=10), CatalogRegistry(), state)
+
+    assert state.done
+    assert state.loaded == 0
+
+
+def _mock_queryresult() -> str:
+    """Create a mock catalog collection response."""
+    return """
+    @prefix dcat: <http://www.w3.org/ns/dcat#> .
+
+    <http://localhost:8000/catalogs/1> a dcat:Catalog .
+    """
@@ -0,0 +1,136 @@
+"""Unit test cases for the search index module."""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from pytest_mock import MockFixture
+from rdflib import DCAT, Graph, URIRef
+
+from dataservice_publisher.service.catalog_registry import (
+    CatalogRegistry,
+    CatalogSummary,
+)
+from dataservice_publisher.service.search_index import SearchIndex, tokenize
+
+CATALOG = "http://localhost:8000/catalogs/1"
+PUBLISHER = "https://data.brreg.no/enhetsregisteret/api/enheter/961181399"
+
+
+@pytest.mark.unit
+def test_tokenize() -> None:
+    """Should split text and urls into lower case words."""
+    assert tokenize("Swagger Petstore") == ["swagger", "petstore"]
+    assert tokenize("http://petstore.swagger.io/v1") == [
+        "http",
+        "petstore",
+        "swagger",
+        "io",
+        "v1",
+    ]
+
+
+@pytest.mark.unit
+def test_search() -> None:
+    """Should find the data services having all the words."""
+    index = SearchIndex()
+    index.add_catalog(CATALOG, _catalog())
+
+    total, hits = index.search("petstore test.petstore.swagger.io")
+    assert total == 3
+    assert all("1d5f3751" in str(hit) for hit in hits)
+
+    total, hits = index.search("testcatalog")
+    assert hits == [URIRef(CATALOG)]
+
+    total, _ = index.search("application/json")
+    assert total == 6
+
+    total, _ = index.search("unknown petstore")
+    assert total == 0
+    assert index.search("!!!") == (0, [])
+    assert index.search("!!!", publisher=PUBLISHER) == (0, [])
+
+
+@pytest.mark.unit
+def test_search_by_publisher_and_page() -> None:
+    """Should filter on publisher, inherited from the catalog, and page the hits."""
+    index = SearchIndex()
+    index.add_catalog(CATALOG, _catalog())
+
+    total, hits = index.search(publisher=PUBLISHER, offset=2, limit=3)
+    assert total == 7
+    assert len(hits) == 3
+    assert index.search(publisher="urn:other") == (0, [])
+
+    g = index.graph(hits)
+    for hit in hits:
+        assert (URIRef(CATALOG), DCAT.service, hit) in g
+
+
+@pytest.mark.unit
+def test_remove_catalog() -> None:
+    """Should not find anything from a removed catalog."""
+    index = SearchIndex()
+    index.add_catalog(CATALOG, _catalog())
+
+    index.remove_catalog(CATALOG)
+
+    assert len(index) == 0
+    assert index.search("petstore") == (0, [])
+
+
+@pytest.mark.unit
+async def test_refresh(mocker: MockFixture) -> None:
+    """Should index new and changed catalogs, and drop deleted ones."""
+    get_catalog_by_id = mocker.patch(
+        "dataservice_publisher.service.search_index.get_catalog_by_id",
+        return_value=_catalog(),
+    )
+    index = SearchIndex()
+    index.add_catalog("urn:deleted", Graph())
+    summary = CatalogSummary(CATALOG, modified=datetime.now(timezone.utc))
+
+    await index.refresh([summary])
+    assert index.search("testcatalog")[0] == 1
+    get_catalog_by_id.assert_called_once_with("1")
+
+    await index.refresh([summary])
+    get_catalog_by_id.assert_called_once()
+
+    summary.modified = datetime.now(timezone.utc) + timedelta(seconds=1)
+    await index.refresh([summary])
+    assert get_catalog_by_id.call_count == 2
+
+
+@pytest.mark.unit
+async def test_run(mocker: MockFixture) -> None:
+    """Should build the index in the background, and refresh it when woken."""
+    mocker.patch(
+        "dataservice_publisher.service.search_index.get_catalog_by_id",
+        return_value=_catalog(),
+    )
+    registry = CatalogRegistry()
+    summaries = mocker.patch.object(
+        registry, "summaries", return_value=[CatalogSummary(CATALOG)]
+    )
+    index = SearchIndex()
+    task = asyncio.create_task(index.run(registry, interval=60))
+    for _ in range(100):
+        if index.ready:
+            break
+        await asyncio.sleep(0.01)
+    assert index.search("testcatalog")[0] == 1
+
+    index.wake()
+    for _ in range(100):
+        if summaries.call_count == 2:
+            break
+        await asyncio.sleep(0.01)
+    assert summaries.call_count == 2
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+def _catalog() -> Graph:
+    return Graph().parse("tests/files/catalog_1.ttl", format="turtle")
@@ -0,0 +1,104 @@
+"""Unit test cases for the serializers module."""
+
+import json
+from pathlib import Path
+
+import pytest
+from rdflib import BNode, Graph, Literal, Namespace, RDF, URIRef, XSD
+from rdflib.compare import isomorphic
+
+from dataservice_publisher.resources import serializers
+from dataservice_publisher.resources.serializers import (
+    JSON_LD_COMPACTED_CONTENT_TYPE,
+    SERIALIZERS,
+)
+
+DCAT = Namespace("http://www.w3.org/ns/dcat#")
+DCT = Namespace("http://purl.org/dc/terms/")
+EX = Namespace("http://example.com/")
+
+
+def _graph() -> Graph:
+    g = Graph()
+    g.parse(Path("tests/files/catalog_1.ttl"), format="turtle")
+    catalog = URIRef("http://localhost:8000/catalogs/1")
+    contact = BNode()
+    g.add((catalog, DCAT.contactPoint, contact))
+    g.add((contact, EX["has-email"], URIRef("mailto:post@example.com")))
+    g.add((contact, RDF.type, Literal("not a class")))
+    g.add((catalog, DCT.description, Literal('A "quoted"\nline\\', lang="nb")))
+    g.add((catalog, DCT.modified, Literal("2021-01-01", datatype=XSD.date)))
+    g.add((catalog, EX["count"], Literal(3)))
+    return g
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "media_type,rdflib_format",
+    [
+        ("application/n-triples", "nt"),
+        ("text/turtle", "turtle"),
+        ("application/ld+json", "json-ld"),
+        (JSON_LD_COMPACTED_CONTENT_TYPE, "json-ld"),
+    ],
+)
+def test_isomorphic_to_rdflib(media_type: str, rdflib_format: str) -> None:
+    """Should parse to the same graph as what rdflib serializes."""
+    g = _graph()
+    expected = Graph().parse(
+        data=g.serialize(format=rdflib_format), format=rdflib_format
+    )
+
+    data = "".join(SERIALIZERS[media_type](g))
+
+    assert isomorphic(Graph().parse(data=data, format=rdflib_format), expected)
+
+
+@pytest.mark.unit
+def test_json_ld_compaction() -> None:
+    """Should compact the JSON-LD only when the compacted profile is asked for."""
+    g = _graph()
+
+    expanded = json.loads("".join(SERIALIZERS["application/ld+json"](g)))
+    compacted = json.loads("".join(SERIALIZERS[JSON_LD_COMPACTED_CONTENT_TYPE](g)))
+
+    assert isinstance(expanded, list)
+    assert any(str(DCT.description) in node for node in expanded)
+    assert "@context" in compacted
+    assert any("dct:description" in node for node in compacted["@graph"])
+
+
+@pytest.mark.unit
+def test_nt_literals() -> None:
+    """Should write literals with line breaks on one line, as N-Triples asks."""
+    g = _graph()
+
+    data = "".join(SERIALIZERS["application/n-triples"](g))
+
+    assert '"A \\"quoted\\"\\nline\\\\"@nb' in data
+    assert len(data.splitlines()) == len(g)
+
+
+@pytest.mark.unit
+def test_chunks(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Should yield the serialization in several chunks."""
+    monkeypatch.setattr(serializers, "CHUNK_SIZE", 100)
+    g = _graph()
+
+    chunks = list(SERIALIZERS["text/turtle"](g))
+
+    assert len(chunks) > 1
+    assert isomorphic(Graph().parse(data="".join(chunks), format="turtle"), g)
+
+
+@pytest.mark.unit
+def test_empty_graph() -> None:
+    """Should serialize an empty graph."""
+    for media_type, rdflib_format in [
+        ("application/n-triples", "nt"),
+        ("text/turtle", "turtle"),
+        ("application/ld+json", "json-ld"),
+        (JSON_LD_COMPACTED_CONTENT_TYPE, "json-ld"),
+    ]:
+        data = "".join(SERIALIZERS[media_type](Graph()))
+        assert len(Graph().parse(data=data, format=rdflib_format)) == 0
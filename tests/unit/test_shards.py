@@ -0,0 +1,128 @@
+"""Unit test cases for the shards and shard rebalancing modules."""
+
+from typing import Dict, List
+
+import pytest
+from pytest_mock import MockFixture
+from rdflib import Dataset, DCAT, Graph, Literal, RDF, URIRef
+
+from dataservice_publisher.service.catalog_registry import DSP, METADATA_GRAPH
+from dataservice_publisher.service.catalog_versions import DELTAS_GRAPH
+from dataservice_publisher.service.shard_rebalancing import rebalance
+from dataservice_publisher.service.shards import parse_shards, ping_url, ShardMap
+
+OLD = ["http://fuseki-1:8080/fuseki/ds", "http://fuseki-2:8080/fuseki/ds"]
+NEW = OLD + ["http://fuseki-3:8080/fuseki/ds"]
+IDS = [str(i) for i in range(1000)]
+
+
+@pytest.mark.unit
+def test_shard_map() -> None:
+    """Should spread the catalogs evenly, and move only those of an added dataset."""
+    old, new = ShardMap(OLD), ShardMap(list(reversed(NEW)))
+
+    counts = {endpoint: len(ids) for endpoint, ids in new.group(IDS).items()}
+    assert set(counts) == set(NEW)
+    assert all(200 < count < 467 for count in counts.values())
+    assert new.endpoint("http://localhost:8000/catalogs/7") == new.endpoint("7")
+    moved = [id for id in IDS if old.endpoint(id) != new.endpoint(id)]
+    assert {new.endpoint(id) for id in moved} == {NEW[2]}
+    assert len(moved) == counts[NEW[2]]
+
+
+@pytest.mark.unit
+def test_parse_shards() -> None:
+    """Should default to the single dataset, and find the servers to ping."""
+    assert parse_shards(" http://a/fuseki/ds/ ,http://b/fuseki/ds") == [
+        "http://a/fuseki/ds",
+        "http://b/fuseki/ds",
+    ]
+    assert len(parse_shards("")) == 1
+    assert ping_url("http://a:8080/fuseki/ds") == "http://a:8080/fuseki/$/ping"
+
+
+@pytest.mark.unit
+async def test_rebalance(mocker: MockFixture) -> None:
+    """Should move the graph, summary and deltas of the catalogs of other datasets."""
+    datasets: Dict[str, Dataset] = {endpoint: Dataset() for endpoint in NEW}
+    old = ShardMap(OLD)
+    for id in IDS[:30]:
+        catalog = URIRef(f"http://localhost:8000/catalogs/{id}")
+        ds = datasets[old.endpoint(id)]
+        ds.graph(catalog).add((catalog, RDF.type, DCAT.Catalog))
+        ds.graph(METADATA_GRAPH).add((catalog, DSP.version, Literal(2)))
+        delta = URIRef(f"{catalog}#version-2")
+        ds.graph(DELTAS_GRAPH).add((delta, DSP.catalog, catalog))
+
+    _fuseki(mocker, datasets)
+    new = ShardMap(NEW)
+
+    assert await rebalance(new, dry_run=True)
+    moves = await rebalance(new)
+
+    assert moves and all(target == NEW[2] for _, _, target in moves)
+    assert await rebalance(new) == []
+    for id in IDS[:30]:
+        catalog = URIRef(f"http://localhost:8000/catalogs/{id}")
+        for endpoint, ds in datasets.items():
+            kept = endpoint == new.endpoint(id)
+            assert ((catalog, RDF.type, DCAT.Catalog) in ds.graph(catalog)) is kept
+            assert ((catalog, None, None) in ds.graph(METADATA_GRAPH)) is kept
+            assert ((None, DSP.catalog, catalog) in ds.graph(DELTAS_GRAPH)) is kept
+
+
+@pytest.mark.unit
+async def test_rebalance_moves_catalog(mocker: MockFixture) -> None:
+    """Should move a catalog by its graph name, with its summary and deltas."""
+    shards = ShardMap(OLD)
+    id = next(id for id in IDS if shards.endpoint(id) == OLD[1])
+    context = URIRef(f"http://localhost:8000/catalogs/{id}")
+    datasets: Dict[str, Dataset] = {endpoint: Dataset() for endpoint in OLD}
+    source, target = datasets[OLD[0]], datasets[OLD[1]]
+    # Its graph does not say that the catalog is named by the graph:
+    source.graph(context).add((URIRef("http://example.com/1"), RDF.type, DCAT.Catalog))
+    source.graph(METADATA_GRAPH).add((context, DSP.version, Literal(2)))
+    for version in [1, 2]:
+        delta = URIRef(f"{context}#version-{version}")
+        source.graph(DELTAS_GRAPH).add((delta, DSP.catalog, context))
+        source.graph(DELTAS_GRAPH).add((delta, DSP.version, Literal(version)))
+    _fuseki(mocker, datasets)
+
+    moves = await rebalance(shards)
+
+    assert moves == [(str(context), OLD[0], OLD[1])]
+    assert len(source.graph(context)) == 0
+    assert len(source.graph(METADATA_GRAPH)) == 0
+    assert len(source.graph(DELTAS_GRAPH)) == 0
+    assert len(target.graph(context)) == 1
+    assert {Literal(2)} == set(
+        target.graph(METADATA_GRAPH).objects(context, DSP.version)
+    )
+    assert {Literal(1), Literal(2)} == set(
+        target.graph(DELTAS_GRAPH).objects(None, DSP.version)
+    )
+    assert await rebalance(shards) == []
+
+
+def _fuseki(mocker: MockFixture, datasets: Dict[str, Dataset]) -> None:
+    """Run the queries and updates of the rebalancer on the datasets."""
+
+    async def _select(endpoint: str, querystring: str) -> List[Dict[str, str]]:
+        return [
+            {str(name): str(value) for name, value in row.asdict().items()}  # type: ignore
+            for row in datasets[endpoint].query(querystring)
+        ]
+
+    async def _construct(endpoint: str, querystring: str) -> Graph:
+        graph = Graph()
+        for triple in datasets[endpoint].query(querystring):
+            graph.add(triple)  # type: ignore
+        return graph
+
+    async def _update(endpoint: str, update: str) -> None:
+        datasets[endpoint].update(update)
+
+    module = "dataservice_publisher.service.shard_rebalancing"
+    mocker.patch(f"{module}._select", _select)
+    mocker.patch(f"{module}._construct", _construct)
+    mocker.patch(f"{module}._update", _update)
@@ -0,0 +1,60 @@
+"""Unit test cases for the single flight module."""
+
+import asyncio
+
+import pytest
+
+from dataservice_publisher.service.single_flight import SingleFlight
+
+
+@pytest.mark.unit
+async def test_single_flight_coalesces_concurrent_calls() -> None:
+    """Should run one call for concurrent callers with the same key."""
+    group = SingleFlight()
+    calls = []
+
+    async def _call() -> str:
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    results = await asyncio.gather(*[group.do("key", _call) for _ in range(10)])
+
+    assert results == ["result"] * 10
+    assert len(calls) == 1
+    assert group.in_flight() == 0
+
+
+@pytest.mark.unit
+async def test_single_flight_cancelled_caller() -> None:
+    """Should not cancel the shared call when one caller is cancelled."""
+    group = SingleFlight()
+
+    async def _call() -> str:
+        await asyncio.sleep(0.01)
+        return "result"
+
+    first = asyncio.create_task(group.do("key", _call))
+    second = asyncio.create_task(group.do("key", _call))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert await second == "result"
+    assert first.cancelled()
+
+
+@pytest.mark.unit
+async def test_single_flight_exception() -> None:
+    """Should raise the exception of the shared call to every caller."""
+    group = SingleFlight()
+
+    async def _call() -> str:
+        await asyncio.sleep(0.01)
+        raise ValueError("failed")
+
+    results = await asyncio.gather(
+        group.do("key", _call), group.do("key", _call), return_exceptions=True
+    )
+
+    assert all(isinstance(result, ValueError) for result in results)
+    assert group.in_flight() == 0
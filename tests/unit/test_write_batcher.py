@@ -0,0 +1,129 @@
+"""Unit test cases for the write batcher module."""
+
+import asyncio
+from typing import List, Optional, Tuple
+
+import pytest
+from pytest_mock import MockFixture
+from SPARQLWrapper.SPARQLExceptions import QueryBadFormed
+
+from dataservice_publisher.service.write_batcher import WriteBatcher
+
+
+def _record(
+    mocker: MockFixture, fail: str = "", error: Optional[Exception] = None
+) -> List[Tuple[str, str]]:
+    sent: List[Tuple[str, str]] = []
+
+    async def _execute(endpoint: str, update: str) -> None:
+        sent.append((endpoint, update))
+        if fail and fail in update:
+            raise error or QueryBadFormed(b"Bad update")
+
+    mocker.patch("dataservice_publisher.service.write_batcher.execute_update", _execute)
+    return sent
+
+
+@pytest.mark.unit
+async def test_write_batcher_coalesces_updates(mocker: MockFixture) -> None:
+    """Should send the concurrent updates to a dataset in one request."""
+    sent = _record(mocker)
+    batcher = WriteBatcher(window=0.01)
+
+    await asyncio.gather(
+        batcher.execute("http://a", "U1", "1"),
+        batcher.execute("http://a", "U2", "2"),
+        batcher.execute("http://b", "U3", "3"),
+    )
+
+    assert sorted(sent) == [("http://a", "U1 ;\nU2"), ("http://b", "U3")]
+    assert batcher.batches == 2
+    assert batcher.batched_updates == 3
+
+
+@pytest.mark.unit
+async def test_write_batcher_limits(mocker: MockFixture) -> None:
+    """Should send a full batch at once, and a catalog's updates in order."""
+    sent = _record(mocker)
+    batcher = WriteBatcher(window=10, max_updates=2)
+
+    await asyncio.wait_for(
+        asyncio.gather(
+            batcher.execute("http://a", "U1", "1"),
+            batcher.execute("http://a", "U2", "1"),
+            batcher.execute("http://a", "U3", "2"),
+        ),
+        timeout=1,
+    )
+
+    assert sent == [("http://a", "U1"), ("http://a", "U2 ;\nU3")]
+
+
+@pytest.mark.unit
+async def test_write_batcher_failure(mocker: MockFixture) -> None:
+    """Should give every caller the outcome of its own update."""
+    sent = _record(mocker, fail="BAD")
+    batcher = WriteBatcher(window=0.01)
+
+    results: List[Optional[BaseException]] = list(
+        await asyncio.gather(
+            batcher.execute("http://a", "U1", "1"),
+            batcher.execute("http://a", "BAD", "2"),
+            batcher.execute("http://a", "U3", "3"),
+            return_exceptions=True,
+        )
+    )
+
+    assert results[0] is None and results[2] is None
+    assert isinstance(results[1], QueryBadFormed)
+    assert sent[0] == ("http://a", "U1 ;\nBAD ;\nU3")
+    assert sent[1:] == [("http://a", "U1"), ("http://a", "BAD"), ("http://a", "U3")]
+    assert batcher.retried_updates == 3
+
+
+@pytest.mark.unit
+async def test_write_batcher_transport_failure(mocker: MockFixture) -> None:
+    """Should fail every caller, without retrying, when Fuseki cannot be reached."""
+    sent = _record(mocker, fail="U", error=ConnectionResetError("Connection reset"))
+    batcher = WriteBatcher(window=0.01)
+
+    results: List[Optional[BaseException]] = list(
+        await asyncio.gather(
+            batcher.execute("http://a", "U1", "1"),
+            batcher.execute("http://a", "U2", "2"),
+            return_exceptions=True,
+        )
+    )
+
+    assert all(isinstance(result, ConnectionResetError) for result in results)
+    assert sent == [("http://a", "U1 ;\nU2")]
+    assert batcher.retried_updates == 0
+
+
+@pytest.mark.unit
+async def test_write_batcher_flush(mocker: MockFixture) -> None:
+    """Should send the waiting updates when flushed, e.g. on shutdown."""
+    sent = _record(mocker)
+    batcher = WriteBatcher(window=10)
+
+    pending = asyncio.create_task(batcher.execute("http://a", "U1", "1"))
+    await asyncio.sleep(0)
+    await batcher.flush()
+
+    assert sent == [("http://a", "U1")]
+    await pending
+
+
+@pytest.mark.unit
+async def test_write_batcher_disabled(mocker: MockFixture) -> None:
+    """Should send every update on its own when the window is 0."""
+    sent = _record(mocker)
+    batcher = WriteBatcher(window=0)
+
+    await asyncio.gather(
+        batcher.execute("http://a", "U1", "1"),
+        batcher.execute("http://a", "U2", "2"),
+    )
+
+    assert sent == [("http://a", "U1"), ("http://a", "U2")]
+    assert batcher.batches == 0